@@ -0,0 +1,70 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Simulación de la elección adaptativa del decodificador
+# License: MIT
+#--------------------------------------------------
+
+# Reproduce varias veces una lista de archivos con el reproductor sustituto de
+# benchmarks/stubs (que pierde cuadros según el códec, la resolución y las
+# opciones de decodificación) y muestra cómo el historial sube el nivel de
+# cada archivo hasta que deja de perder cuadros. Al final, un archivo nuevo
+# de un códec ya visto empieza directamente en el nivel aprendido.
+# Uso: python3 benchmarks/bench_adaptive_decode.py [rondas]
+
+import os
+import sys
+import tempfile
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, os.path.join(BENCH_DIR, "stubs"))
+
+import vlc
+import playback
+import playback_telemetry
+
+FILES = {
+    '/media/usb/serie_h264_720.mp4': ('h264', 720),
+    '/media/usb/concierto_h264_1080.mp4': ('h264', 1080),
+    '/media/usb/pelicula_hevc_1080.mkv': ('hevc', 1080),
+    '/media/usb/demo_hevc_2160.mkv': ('hevc', 2160),
+}
+NEW_FILE = ('/media/usb/otra_pelicula_hevc_1080.mkv', ('hevc', 1080))
+SAMPLES_PER_PLAY = 10
+
+def play_once(engine, history, path, codec, height):
+    engine.play([path])
+    engine._on_next_item(None) # El sustituto no emite eventos: empezar el elemento a mano
+    for _ in range(SAMPLES_PER_PLAY):
+        engine.sample_stats()
+    engine.stop()
+    (_, level, stats), = engine.take_finished()
+    next_level = history.record(path, level, stats, codec=codec, height=height)
+    return level, playback_telemetry.drop_ratio(stats), next_level
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    with tempfile.TemporaryDirectory() as workdir:
+        history = playback_telemetry.PlaybackTelemetry(os.path.join(workdir, "telemetria.json"))
+        known = dict(FILES)
+        known[NEW_FILE[0]] = NEW_FILE[1]
+
+        def options_for(path):
+            codec, height = known[path]
+            return history.options_for(path, codec=codec, height=height)
+        engine = playback.PlaybackEngine(vlc, lambda kind, **data: None, options_for=options_for)
+
+        print(f"{'ronda':<6} {'archivo':<28} {'nivel':>5} {'perdidos':>9} {'siguiente':>9}")
+        for round_number in range(1, rounds + 1):
+            for path, (codec, height) in FILES.items():
+                level, ratio, next_level = play_once(engine, history, path, codec, height)
+                print(f"{round_number:<6} {os.path.basename(path):<28} {level:>5} {ratio * 100:>8.1f}% {next_level:>9}")
+        path, (codec, height) = NEW_FILE
+        level, ratio, next_level = play_once(engine, history, path, codec, height)
+        print(f"{'nuevo':<6} {os.path.basename(path):<28} {level:>5} {ratio * 100:>8.1f}% {next_level:>9}")
+        print(f"\nNiveles por códec: {history.summary()}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Benchmark de uso de CPU de la GUI en reposo
+# License: MIT
+#--------------------------------------------------
+
+# Ejecuta main_loop sin pantalla (SDL_VIDEODRIVER=dummy) durante unos segundos
+# en cada estado y reporta el porcentaje de CPU usado por el proceso de la GUI.
+# Uso: python3 benchmarks/bench_idle_cpu.py [segundos]
+
+import os
+import sys
+import json
+import subprocess
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_child(state_name, seconds):
+    """Corre main_loop en este proceso y escribe el resultado como JSON."""
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.chdir(SRC_DIR)
+    sys.path.insert(0, SRC_DIR)
+    import threading
+    import time
+    import pygame
+    import proyecto1
+
+    # Sin hilo de USB ni verificación de red: solo se mide el bucle de la GUI
+    proyecto1.usb_thread = threading.Thread()
+    proyecto1.is_connected_to_internet = lambda: True
+    proyecto1.current_state = getattr(proyecto1, state_name)
+    pygame.time.set_timer(pygame.QUIT, int(seconds * 1000), 1)
+
+    start_wall = time.monotonic()
+    start_cpu = time.process_time()
+    try:
+        proyecto1.main_loop()
+    except SystemExit:
+        pass
+    elapsed = time.monotonic() - start_wall
+    cpu = time.process_time() - start_cpu
+    print(json.dumps({'state': state_name, 'seconds': elapsed, 'cpu_seconds': cpu,
+                      'cpu_percent': 100 * cpu / elapsed}))
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    for state_name in ('STATE_MAIN_MENU', 'STATE_USB_SUBMENU', 'STATE_PLAYING_MEDIA'):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child', state_name, str(seconds)],
+                                capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(f"{state_name:<22} CPU: {result['cpu_percent']:5.1f}%  ({result['cpu_seconds']:.2f} s en {result['seconds']:.1f} s)")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        run_child(sys.argv[2], float(sys.argv[3]))
+    else:
+        main()
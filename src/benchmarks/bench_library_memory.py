@@ -0,0 +1,124 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Benchmark de memoria de la biblioteca USB (listas vs. estructura compacta)
+# License: MIT
+#--------------------------------------------------
+
+# Llena la biblioteca con lotes como los del escaneo (dos memorias, rutas de
+# varios niveles) y mide con tracemalloc la memoria que queda retenida:
+#   listas:    la forma anterior, con listas de rutas por memoria, la vista
+#              combinada y una tupla (tamaño, mtime) por video
+#   compacta:  media_library.MediaLibrary (carpetas internadas, nombres en un
+#              búfer y arreglos de índices)
+# También mide el tiempo de llenado, de recorrer todas las rutas y de armar
+# rutas sueltas (lo que hacen las pantallas al dibujar renglones).
+# Uso: python3 benchmarks/bench_library_memory.py [entradas]
+
+import os
+import sys
+import time
+import random
+import tracemalloc
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+import media_library
+
+ENTRIES = 100000
+BATCH = 200
+DEVICES = (('/dev/sda1', '/media/pi/USB_FOTOS'), ('/dev/sdb1', '/media/pi/Disco Series'))
+WORDS = ("Vacaciones", "Playa", "Familia", "Cumpleaños", "Navidad", "Concierto", "Temporada",
+         "Episodio", "Película", "Canción", "Álbum", "Viaje", "Montaña", "Ciudad", "Boda")
+KINDS = (('photos', '.jpg'), ('photos', '.png'), ('music', '.mp3'), ('videos', '.mp4'), ('videos', '.mkv'))
+
+class ListLibrary:
+    """La representación anterior: listas de rutas por memoria y una vista combinada que las comparte."""
+
+    def __init__(self):
+        self.devices = {}
+        self.photos = []
+        self.music = []
+        self.videos = []
+        self.video_info = []
+
+    def add_device(self, device, mount_point):
+        self.devices[device] = {'photos': [], 'music': [], 'videos': [], 'video_info': []}
+
+    def extend(self, device, batch):
+        library = self.devices[device]
+        for kind in ('photos', 'music', 'videos', 'video_info'):
+            library[kind].extend(batch[kind])
+            getattr(self, kind).extend(batch[kind])
+
+def batches(entries):
+    """Lotes del escaneo: ~40 archivos por carpeta, tres niveles, repartidos entre las dos memorias."""
+    per_device = entries // len(DEVICES)
+    for device, mount_point in DEVICES:
+        batch = {'photos': [], 'music': [], 'videos': [], 'video_info': []}
+        for i in range(per_device):
+            folder = i // 40
+            directory = (f"{mount_point}/{WORDS[folder % 15]} {2010 + folder % 14}/"
+                         f"{WORDS[folder * 7 % 15]}/Carpeta {folder:05d}")
+            kind, extension = KINDS[i % len(KINDS)]
+            path = f"{directory}/{WORDS[i % 15]} {WORDS[i * 3 % 15].lower()} {i:06d}{extension}"
+            batch[kind].append(path)
+            if kind == 'videos':
+                batch['video_info'].append((700000000 + i, 1700000000.0 + i))
+            if i % BATCH == BATCH - 1:
+                yield device, mount_point, batch
+                batch = {'photos': [], 'music': [], 'videos': [], 'video_info': []}
+        yield device, mount_point, batch
+
+def fill(library, entries):
+    for device, mount_point in DEVICES:
+        library.add_device(device, mount_point)
+    for device, _, batch in batches(entries):
+        library.extend(device, batch)
+    return library
+
+def measure(factory, entries):
+    tracemalloc.start()
+    start = time.perf_counter()
+    library = fill(factory(), entries)
+    fill_s = time.perf_counter() - start
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    views = (library.photos, library.music, library.videos)
+    start = time.perf_counter()
+    total = sum(len(path) for view in views for path in view)
+    iterate_s = time.perf_counter() - start
+
+    rows = random.Random(1).sample(range(len(library.videos)), 1000)
+    start = time.perf_counter()
+    for row in rows:
+        library.videos[row]
+    lookup_us = (time.perf_counter() - start) * 1e6 / len(rows)
+    return {'retained': retained, 'fill_s': fill_s, 'iterate_s': iterate_s, 'lookup_us': lookup_us,
+            'chars': total, 'library': library}
+
+def main():
+    entries = int(sys.argv[1]) if len(sys.argv) > 1 else ENTRIES
+    results = {
+        'listas': measure(ListLibrary, entries),
+        'compacta': measure(media_library.MediaLibrary, entries),
+    }
+    if results['listas']['chars'] != results['compacta']['chars']:
+        print("Las dos representaciones no tienen las mismas rutas")
+        return 1
+    scale = 100000 / entries
+    print(f"{entries} entradas ({results['listas']['chars'] / entries:.0f} caracteres por ruta en promedio)")
+    print(f"{'':10} {'MB/100k':>9} {'B/entrada':>10} {'llenado s':>10} {'recorrido s':>12} {'ruta µs':>8}")
+    for name, result in results.items():
+        print(f"{name:10} {result['retained'] * scale / (1024 * 1024):9.1f} {result['retained'] / entries:10.0f} "
+              f"{result['fill_s']:10.3f} {result['iterate_s']:12.3f} {result['lookup_us']:8.2f}")
+    compact = results['compacta']['library']
+    print(f"Estimado interno de la compacta: {compact.nbytes() / (1024 * 1024):.1f} MB, "
+          f"{sum(len(library.dirs.prefixes) for library in compact.devices.values())} carpetas internadas")
+    print(f"Reducción: {results['listas']['retained'] / results['compacta']['retained']:.1f}x")
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,108 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Benchmark de atascos con y sin lectura anticipada
+# License: MIT
+#--------------------------------------------------
+
+# Simula una memoria USB lenta (latencia al abrir cada archivo y ancho de banda
+# limitado, compartido entre el reproductor y la lectura anticipada) y un
+# reproductor que consume una lista de archivos a una tasa de bits fija.
+# Cuenta los atascos (bloques que llegan después de su momento de
+# reproducción) sin y con prefetch.ReadAheadPrefetcher.
+# Uso: python3 benchmarks/bench_prefetch.py [MB/s del dispositivo] [MB/s del video]
+
+import os
+import sys
+import time
+import tempfile
+import threading
+
+SRC_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SRC_DIR)
+import prefetch
+
+CHUNK = 512 * 1024
+ITEMS = 4
+ITEM_SECONDS = 5.0
+OPEN_LATENCY_S = 0.4   # Búsqueda en la FAT y arranque del dispositivo por archivo nuevo
+SLACK_S = 0.25         # Búfer del reproductor antes de que un retraso se note
+
+class SlowDevice:
+    """Modelo del dispositivo: los bloques no leídos antes cuestan tiempo; los leídos quedan en caché."""
+
+    def __init__(self, bytes_per_second):
+        self.bytes_per_second = bytes_per_second
+        self.lock = threading.Lock() # Un solo bus: las lecturas se atienden de una en una
+        self.cached = set()
+        self.opened = set()
+
+    def read(self, path, offset, length):
+        if path not in self.opened:
+            time.sleep(OPEN_LATENCY_S)
+            self.opened.add(path)
+        with self.lock:
+            for block in range(offset // CHUNK, (offset + length - 1) // CHUNK + 1):
+                if (path, block) not in self.cached:
+                    time.sleep(CHUNK / self.bytes_per_second)
+                    self.cached.add((path, block))
+        return length
+
+class SlowDevicePrefetcher(prefetch.ReadAheadPrefetcher):
+    """El prefetcher real, pero leyendo a través del dispositivo simulado."""
+
+    def __init__(self, device, paths, **kwargs):
+        super().__init__(chunk_size=CHUNK, **kwargs)
+        self.device = device
+        self.fd_paths = paths
+
+    def read_chunk(self, fd, offset, length):
+        return self.device.read(self.fd_paths[os.fstat(fd).st_ino], offset, length)
+
+def play(device, paths, bitrate, prefetcher=None):
+    """Reproduce la lista y regresa el número de atascos."""
+    stalls = 0
+    for index, path in enumerate(paths):
+        if prefetcher is not None and index + 1 < len(paths):
+            prefetcher.prefetch(paths[index + 1], delay=0.5)
+        item_bytes = int(bitrate * ITEM_SECONDS)
+        start = time.monotonic()
+        for offset in range(0, item_bytes, CHUNK):
+            due = start + offset / bitrate
+            wait = due - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            device.read(path, offset, CHUNK)
+            late = time.monotonic() - (due + SLACK_S)
+            if late > 0:
+                stalls += 1
+                start += late # El reproductor se detiene a rellenar el búfer
+    return stalls
+
+def main():
+    device_mbps = float(sys.argv[1]) if len(sys.argv) > 1 else 6.0
+    video_mbps = float(sys.argv[2]) if len(sys.argv) > 2 else 4.0
+    bitrate = video_mbps * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for i in range(ITEMS):
+            path = os.path.join(tmp, f"video_{i}.mkv")
+            with open(path, 'wb') as f:
+                f.truncate(int(bitrate * ITEM_SECONDS))
+            paths.append(path)
+        inodes = {os.stat(path).st_ino: path for path in paths}
+
+        baseline = play(SlowDevice(device_mbps * 1024 * 1024), paths, bitrate)
+
+        device = SlowDevice(device_mbps * 1024 * 1024)
+        prefetcher = SlowDevicePrefetcher(device, inodes)
+        prefetcher.start()
+        with_prefetch = play(device, paths, bitrate, prefetcher)
+
+    print(f"Dispositivo {device_mbps:.1f} MB/s, video {video_mbps:.1f} MB/s, {ITEMS} archivos de {ITEM_SECONDS:.0f} s")
+    print(f"Atascos sin lectura anticipada: {baseline}")
+    print(f"Atascos con lectura anticipada: {with_prefetch}  ({prefetcher.stats()})")
+
+if __name__ == "__main__":
+    main()
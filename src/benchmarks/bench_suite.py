@@ -0,0 +1,388 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Suite de benchmarks sin pantalla (render, escaneo, listas y eventos USB)
+# License: MIT
+#--------------------------------------------------
+
+# Corre la aplicación con SDL_VIDEODRIVER=dummy y con los sustitutos de vlc y
+# pyudev de benchmarks/stubs, en un HOME temporal para no tocar las cachés reales.
+# Mide:
+#   - screen:*     costo por cuadro de cada pantalla (incluye la selección de
+#                  videos con 10, 1k y 50k elementos: cuadro sin cambios y desplazamiento)
+#   - scan:*       get_media_files sobre árboles sintéticos (profundo, ancho,
+#                  100k archivos), en frío (sin índice) y con el índice persistente
+#   - playlist:*   iniciar la lista de reproducción de libvlc, cada parte que se le agrega
+#                  después y el orden de videos
+#   - usb_event:*  de la inserción (escaneo en su hilo) a la biblioteca actualizada en la GUI
+#   - search:*     índice de búsqueda con 100k nombres: construcción por lotes, cada tecla
+#                  de varias consultas (incluida una con error de dedo) y memoria del índice
+#
+# Uso:
+#   python3 benchmarks/bench_suite.py [--quick] [--only screen,scan,search] [--output resultados.json]
+#                                     [--baseline base.json] [--threshold 0.15] [--min-delta-ms 0.05]
+# Con --baseline se marcan como regresión los casos cuyo promedio empeora más
+# que el umbral y el proceso termina con código 1.
+
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import threading
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.dirname(BENCH_DIR)
+STUBS_DIR = os.path.join(BENCH_DIR, "stubs")
+
+VIDEO_LIST_SIZES = (10, 1000, 50000)
+PLAYLIST_SIZES = (10, 1000, 50000)
+SEARCH_SIZE = 100000
+SEARCH_QUERIES = ("vacaciones playa", "cancion 2019", "episodio", "vacasiones")
+
+def summarize(samples):
+    """Resumen en milisegundos de una lista de duraciones en segundos."""
+    ordered = sorted(samples)
+    count = len(ordered)
+    return {
+        'runs': count,
+        'mean_ms': 1000 * sum(ordered) / count,
+        'p50_ms': 1000 * ordered[count // 2],
+        'p95_ms': 1000 * ordered[min(count - 1, int(count * 0.95))],
+        'max_ms': 1000 * ordered[-1],
+    }
+
+def measure(func, runs, warmup=1, setup=None):
+    """Corre func varias veces (con setup opcional antes de cada una, fuera de la medición)."""
+    for _ in range(warmup):
+        if setup:
+            setup()
+        func()
+    samples = []
+    for _ in range(runs):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+def load_app(home):
+    """Importa proyecto1 sin pantalla, con los sustitutos y un HOME temporal."""
+    os.environ["SDL_VIDEODRIVER"] = "dummy"
+    os.environ["SDL_AUDIODRIVER"] = "dummy"
+    os.environ["HOME"] = home
+    sys.path.insert(0, SRC_DIR)
+    sys.path.insert(0, STUBS_DIR)
+    os.chdir(SRC_DIR)
+    import proyecto1
+    return proyecto1
+
+def synthetic_paths(count, root="/media/bench/USB"):
+    """Rutas de video repartidas en carpetas de 100 archivos."""
+    return [f"{root}/carpeta_{i // 100:04d}/video_{i:06d}.mp4" for i in range(count)]
+
+def load_library(app, videos):
+    """Reemplaza la biblioteca de la aplicación con una memoria sintética ya escaneada."""
+    import media_library
+    app.usb_library = media_library.MediaLibrary()
+    app.usb_library.add_device('/dev/bench1', '/media/bench/USB', 'BENCH', 'bench')
+    info = [(i * 7919 % 1000003, i * 104729 % 1000003) for i in range(len(videos))]
+    app.usb_library.extend('/dev/bench1', {'photos': [], 'music': [], 'videos': videos, 'video_info': info})
+    app.usb_library.finish('/dev/bench1')
+
+# --- Pantallas ---
+def bench_screens(app, runs):
+    import pygame
+    import ui_scene
+    results = {}
+    screens = [
+        ('main_menu', app.STATE_MAIN_MENU, app.main_menu_screen),
+        ('wifi_setup', app.STATE_WIFI_SETUP, app.wifi_setup_screen),
+        ('usb_submenu', app.STATE_USB_SUBMENU, app.usb_submenu_screen),
+        ('usb_loading', app.STATE_USB_LOADING, app.usb_loading_screen),
+        ('usb_no_media', app.STATE_USB_NO_MEDIA, app.usb_no_media_screen),
+        ('playing_media', app.STATE_PLAYING_MEDIA, app.playing_media_screen),
+    ]
+    load_library(app, [])
+    for name, state, screen_func in screens:
+        app.current_state = state
+        # Primer cuadro: la escena se dibuja completa
+        results[f'screen:{name}:full'] = measure(screen_func, runs, setup=ui_scene.invalidate_all)
+        # Cuadros siguientes: sin cambios, solo se revisan los widgets
+        results[f'screen:{name}:idle'] = measure(screen_func, runs)
+        ui_scene.take_dirty_rects()
+
+    down = pygame.event.Event(pygame.KEYDOWN, key=pygame.K_DOWN, mod=0, unicode='', scancode=0)
+    for count in VIDEO_LIST_SIZES:
+        load_library(app, synthetic_paths(count))
+        app.ui_scenes.pop(app.STATE_USB_VIDEO_SELECTION, None)
+        app.video_view = 'list'
+        app.video_sort_key = 'scan'
+        app.current_state = app.STATE_USB_VIDEO_SELECTION
+        app.usb_video_selection_screen()
+        results[f'screen:usb_video_selection:{count}:full'] = measure(app.usb_video_selection_screen, runs, setup=ui_scene.invalidate_all)
+        results[f'screen:usb_video_selection:{count}:idle'] = measure(app.usb_video_selection_screen, runs)
+
+        def scroll():
+            ui_scene.active_scene.handle_event(down)
+            app.usb_video_selection_screen()
+        results[f'screen:usb_video_selection:{count}:scroll'] = measure(scroll, runs)
+
+        # Primer cuadro con orden por nombre: copia la vista y lanza el cálculo de los órdenes en su hilo
+        def reset_orders():
+            library = app.usb_library
+            # Esperar a que termine el cálculo anterior para medir un solo hilo a la vez
+            while library._orders_stamp is not None and \
+                    (library._ready_orders is None or library._ready_orders[0] != library._orders_stamp):
+                time.sleep(0.001)
+            library._video_orders = {}
+            library._orders_stamp = None
+            library._ready_orders = None
+
+        def sort_by_name():
+            app.video_sort_key = 'name'
+            app.usb_video_selection_screen()
+        results[f'screen:usb_video_selection:{count}:sort_name'] = measure(sort_by_name, max(3, runs // 10), setup=reset_orders)
+
+        # Hasta que el hilo entrega los órdenes (la GUI sigue respondiendo mientras tanto)
+        def sort_ready():
+            sort_by_name()
+            while app.video_order() is None:
+                time.sleep(0.001)
+        results[f'screen:usb_video_selection:{count}:sort_ready'] = measure(sort_ready, max(3, runs // 10), setup=reset_orders)
+        app.video_sort_key = 'scan'
+        ui_scene.take_dirty_rects()
+    return results
+
+# --- Escaneo ---
+def make_tree(root, dirs, files_per_dir, depth=1):
+    """Crea un árbol sintético: `dirs` carpetas (anidadas `depth` niveles) con archivos vacíos."""
+    extensions = ('.mp4', '.mkv', '.jpg', '.png', '.mp3', '.flac', '.txt')
+    created = 0
+    for d in range(dirs):
+        parts = [f"d{d:05d}"] + [f"n{level}" for level in range(depth - 1)]
+        path = os.path.join(root, *parts)
+        os.makedirs(path, exist_ok=True)
+        for f in range(files_per_dir):
+            open(os.path.join(path, f"archivo_{f:04d}{extensions[f % len(extensions)]}"), 'w').close()
+            created += 1
+    return created
+
+def bench_scan(app, workdir, quick):
+    results = {}
+    trees = {
+        'deep': (20, 10, 40),      # 20 ramas de 40 niveles
+        'wide': (2000, 5, 1),      # 2000 carpetas hermanas
+        '100k': (1000, 100, 1),    # 100k archivos
+    }
+    if quick:
+        trees['100k'] = (100, 100, 1)
+    runs = 2 if quick else 3
+    for name, (dirs, files_per_dir, depth) in trees.items():
+        root = os.path.join(workdir, "scan_" + name)
+        count = make_tree(root, dirs, files_per_dir, depth)
+        index_file = os.path.join(app.USB_INDEX_DIR, f"bench-{name}.json")
+
+        def remove_index():
+            if os.path.exists(index_file):
+                os.remove(index_file)
+        cold = measure(lambda: app.get_media_files(root, f"bench-{name}"), runs, setup=remove_index)
+        cold['files'] = count
+        results[f'scan:{name}:cold'] = cold
+        warm = measure(lambda: app.get_media_files(root, f"bench-{name}"), runs)
+        warm['files'] = count
+        results[f'scan:{name}:warm'] = warm
+        shutil.rmtree(root, ignore_errors=True)
+    return results
+
+# --- Listas de reproducción ---
+def bench_playlist(app, runs):
+    results = {}
+    engine = app.get_playback_engine()
+    for count in PLAYLIST_SIZES:
+        paths = synthetic_paths(count)
+        results[f'playlist:libvlc:{count}'] = measure(lambda: engine.play(paths, loop=True), max(3, runs // 10))
+        # El resto de la lista se agrega por partes, una en cada vuelta del bucle principal
+        results[f'playlist:libvlc_chunk:{count}'] = measure(engine.append_available, max(3, runs // 10),
+                                                            setup=lambda: engine.play(paths, loop=True))
+        engine.stop()
+        load_library(app, paths)
+        app.video_sort_key = 'size'
+        app.usb_library.video_order('size')
+        results[f'playlist:sorted_videos:{count}'] = measure(app.sorted_videos, max(3, runs // 10))
+        app.video_sort_key = 'scan'
+    return results
+
+# --- Eventos de USB ---
+def bench_usb_events(app, workdir, quick):
+    """Escaneo real de un árbol sintético en su hilo, con los lotes aplicados por process_usb_events."""
+    import pygame
+    import usb_events
+    import media_library
+    import pyudev
+    results = {}
+    root = os.path.join(workdir, "usb")
+    count = make_tree(root, 100 if quick else 500, 40, 1)
+    # La partición sintética "ya está montada" en el árbol generado
+    app.get_mount_point = lambda device_path: root
+    first_batch = []
+    complete = []
+    for run in range(2 if quick else 3):
+        app.usb_library = media_library.MediaLibrary()
+        device = pyudev.Device(f'/dev/bench{run}', {'ID_FS_UUID': f'bench-usb-{run}', 'ID_FS_LABEL': 'BENCH'})
+        token = usb_events.ScanToken(device.device_node)
+        pygame.event.clear()
+        start = time.perf_counter()
+        threading.Thread(target=app.scan_usb_partition, args=(device, token), daemon=True).start()
+        seen_first = False
+        while True:
+            pygame.event.wait(100)
+            app.process_usb_events(app.STATE_MAIN_MENU)
+            library = app.usb_library.devices.get(device.device_node)
+            if library is None:
+                continue
+            if not seen_first and (library.photos or library.music or library.videos):
+                first_batch.append(time.perf_counter() - start)
+                seen_first = True
+            if not library.scanning:
+                complete.append(time.perf_counter() - start)
+                break
+    results['usb_event:first_batch'] = summarize(first_batch)
+    results['usb_event:complete'] = summarize(complete)
+    results['usb_event:complete']['files'] = count
+    shutil.rmtree(root, ignore_errors=True)
+    return results
+
+# --- Búsqueda ---
+def search_names(count):
+    """Nombres sintéticos con palabras repetidas, acentos y números, en carpetas de 100."""
+    words = ("vacaciones", "playa", "familia", "cumpleaños", "navidad", "concierto", "serie",
+             "capítulo", "temporada", "episodio", "película", "canción", "álbum", "viaje",
+             "montaña", "ciudad", "boda", "graduación", "partido", "final")
+    extensions = ('.mp4', '.mkv', '.jpg', '.mp3')
+    return [f"/media/bench/USB/carpeta_{i // 100:04d}/"
+            f"{words[i % 20]} {words[i * 7 % 19]} {words[i * 13 % 17]} {2000 + i % 25} {i:06d}{extensions[i % 4]}"
+            for i in range(count)]
+
+def bench_search(runs, quick):
+    import media_search
+    results = {}
+    count = SEARCH_SIZE // 10 if quick else SEARCH_SIZE
+    paths = search_names(count)
+
+    def build():
+        index = media_search.SearchIndex()
+        for start in range(0, count, 200): # Lotes del tamaño de los del escaneo
+            index.add(paths[start:start + 200])
+        return index
+    results[f'search:build:{count}'] = measure(build, 2 if quick else 3, warmup=0)
+    index = build()
+    results[f'search:build:{count}']['memory_mb'] = index.memory_bytes() / (1024 * 1024)
+
+    # Cada tecla: consultar con el prefijo escrito hasta ese momento
+    samples = []
+    for query in SEARCH_QUERIES:
+        for end in range(1, len(query) + 1):
+            for _ in range(max(1, runs // 20)):
+                start = time.perf_counter()
+                index.search(query[:end])
+                samples.append(time.perf_counter() - start)
+    results[f'search:keystroke:{count}'] = summarize(samples)
+
+    # Lo que le cuesta a la GUI cada lote cuando el índice se construye en el hilo indexador
+    handoff = []
+    for _ in range(2 if quick else 3):
+        indexer = media_search.SearchIndexer()
+        for start in range(0, count, 200):
+            begin = time.perf_counter()
+            indexer.add(paths[start:start + 200])
+            handoff.append(time.perf_counter() - begin)
+        while indexer.pending():
+            time.sleep(0.01)
+    results[f'search:gui_batch:{count}'] = summarize(handoff)
+    return results
+
+# --- Comparación con una línea base ---
+def compare(results, baseline, threshold, min_delta_ms):
+    """Imprime la comparación de promedios y regresa la lista de regresiones.
+
+    Una diferencia menor que min_delta_ms no cuenta como regresión: en casos de
+    microsegundos el ruido del sistema supera cualquier umbral relativo.
+    """
+    regressions = []
+    print(f"\n{'caso':<48} {'base ms':>10} {'actual ms':>10} {'cambio':>8}")
+    for name in sorted(results):
+        if name not in baseline:
+            continue
+        old = baseline[name]['mean_ms']
+        new = results[name]['mean_ms']
+        change = (new - old) / old if old > 0 else 0.0
+        flag = ""
+        if change > threshold and new - old > min_delta_ms:
+            flag = "  REGRESIÓN"
+            regressions.append(name)
+        print(f"{name:<48} {old:>10.3f} {new:>10.3f} {change * 100:>7.1f}%{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks sin pantalla del Centro Multimedia")
+    parser.add_argument('--quick', action='store_true', help="árboles y repeticiones reducidos")
+    parser.add_argument('--only', default='screen,scan,playlist,usb_event,search',
+                        help="grupos a correr, separados por coma")
+    parser.add_argument('--runs', type=int, default=None, help="repeticiones por caso")
+    parser.add_argument('--output', help="archivo JSON de resultados")
+    parser.add_argument('--baseline', help="resultados anteriores para comparar")
+    parser.add_argument('--threshold', type=float, default=0.15, help="empeoramiento tolerado (0.15 = 15%%)")
+    parser.add_argument('--min-delta-ms', type=float, default=0.05, help="diferencia absoluta mínima para marcar regresión")
+    args = parser.parse_args()
+    groups = set(args.only.split(','))
+    runs = args.runs or (20 if args.quick else 100)
+
+    workdir = tempfile.mkdtemp(prefix="bench_centro_")
+    try:
+        app = load_app(os.path.join(workdir, "home"))
+        results = {}
+        if 'screen' in groups:
+            results.update(bench_screens(app, runs))
+        if 'scan' in groups:
+            results.update(bench_scan(app, workdir, args.quick))
+        if 'playlist' in groups:
+            results.update(bench_playlist(app, runs))
+        if 'usb_event' in groups:
+            results.update(bench_usb_events(app, workdir, args.quick))
+        if 'search' in groups:
+            results.update(bench_search(runs, args.quick))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'caso':<48} {'prom ms':>10} {'p95 ms':>10} {'máx ms':>10}")
+    for name, result in sorted(results.items()):
+        print(f"{name:<48} {result['mean_ms']:>10.3f} {result['p95_ms']:>10.3f} {result['max_ms']:>10.3f}")
+
+    report = {
+        'meta': {'python': platform.python_version(), 'machine': platform.machine(),
+                 'platform': platform.platform(), 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'quick': args.quick, 'runs': runs},
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\nResultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+        if regressions:
+            print(f"\n{len(regressions)} caso(s) más lentos que la línea base por más de {args.threshold * 100:.0f}%")
+            sys.exit(1)
+        print("\nSin regresiones respecto a la línea base.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,32 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Sustituto mínimo de pyudev para los benchmarks sin pantalla
+# License: MIT
+#--------------------------------------------------
+
+# Sin dispositivos: los benchmarks inyectan los eventos de USB directamente en el bus.
+
+class Device(dict):
+    """Dispositivo de bloque falso con propiedades de udev."""
+
+    def __init__(self, device_node, properties=None, device_type='partition'):
+        super().__init__(properties or {})
+        self.device_node = device_node
+        self.device_type = device_type
+
+class Context:
+    def list_devices(self, **filters):
+        return []
+
+class Monitor:
+    @classmethod
+    def from_netlink(cls, context):
+        return cls()
+
+    def filter_by(self, **filters):
+        pass
+
+    def __iter__(self):
+        return iter(())
@@ -0,0 +1,179 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Sustituto mínimo de python-vlc para los benchmarks sin pantalla
+# License: MIT
+#--------------------------------------------------
+
+# Implementa solo lo que usan playback.py y media_metadata.py; no reproduce ni
+# analiza nada, así que los benchmarks miden el costo de la aplicación y no el de libvlc.
+#
+# Media.get_stats simula un decodificador: el costo de decodificar sale del
+# nombre del archivo (códec y altura, p. ej. 'pelicula_hevc_1080.mkv') y la
+# capacidad, de las opciones agregadas al medio. Cada lectura equivale a
+# SECONDS_PER_SAMPLE segundos de reproducción; los cuadros que no alcanzan a
+# decodificarse a tiempo se cuentan como perdidos.
+
+SECONDS_PER_SAMPLE = 2
+FPS = 30
+# Costo relativo de decodificar en software (1.0 = justo al límite del equipo)
+DECODE_COST = {'h264': {480: 0.3, 720: 0.6, 1080: 1.1, 2160: 4.0},
+               'hevc': {480: 0.6, 720: 1.3, 1080: 2.5, 2160: 6.0}}
+# Cuánto multiplica la capacidad cada opción
+OPTION_SPEEDUP = {':avcodec-hw=any': 2.0, ':avcodec-skiploopfilter=4': 1.3,
+                  ':avcodec-skip-frame=1': 1.3, ':deinterlace-mode=discard': 1.05}
+
+class _EventTypes:
+    def __getattr__(self, name):
+        return name
+
+EventType = _EventTypes()
+
+class PlaybackMode:
+    default = 'default'
+    loop = 'loop'
+
+class MediaParseFlag:
+    local = 0
+
+class MediaParsedStatus:
+    skipped = 1
+    failed = 2
+    timeout = 3
+    done = 4
+
+class TrackType:
+    audio = 0
+    video = 1
+
+class Meta:
+    Title = 0
+    Artist = 1
+    Album = 4
+
+class MediaStats:
+    def __init__(self):
+        for name in ('read_bytes', 'input_bitrate', 'demux_read_bytes', 'demux_bitrate', 'demux_corrupted',
+                     'demux_discontinuity', 'decoded_video', 'decoded_audio', 'displayed_pictures',
+                     'lost_pictures', 'played_abuffers', 'lost_abuffers', 'sent_packets', 'sent_bytes',
+                     'send_bitrate'):
+            setattr(self, name, 0)
+
+def decode_cost(path):
+    """Costo simulado según el códec y la altura que aparecen en el nombre del archivo."""
+    name = path.lower()
+    codec = 'hevc' if ('hevc' in name or 'h265' in name) else 'h264'
+    height = 720
+    for candidate in (2160, 1080, 720, 480):
+        if str(candidate) in name:
+            height = candidate
+            break
+    return DECODE_COST[codec][height]
+
+class EventManager:
+    def __init__(self):
+        self.callbacks = {}
+
+    def event_attach(self, event_type, callback):
+        self.callbacks[event_type] = callback
+
+class Media:
+    def __init__(self, path):
+        self.path = path
+        self.options = []
+        self.samples = 0
+
+    def add_option(self, option):
+        self.options.append(option)
+
+    def parse_with_options(self, flags, timeout):
+        return 0
+
+    def get_parsed_status(self):
+        return MediaParsedStatus.failed
+
+    def release(self):
+        pass
+
+    def get_stats(self, stats):
+        self.samples += 1
+        capacity = 1.0
+        for option in self.options:
+            capacity *= OPTION_SPEEDUP.get(option, 1.0)
+        load = decode_cost(self.path) / capacity
+        decoded = self.samples * SECONDS_PER_SAMPLE * FPS
+        lost = int(decoded * max(0.0, load - 1.0) / load) if load > 1.0 else 0
+        stats.decoded_video = decoded
+        stats.displayed_pictures = decoded - lost
+        stats.lost_pictures = lost
+        stats.input_bitrate = stats.demux_bitrate = 0.5
+        return True
+
+class MediaList(list):
+    def add_media(self, media):
+        self.append(media)
+
+    def lock(self):
+        pass
+
+    def unlock(self):
+        pass
+
+class MediaPlayer:
+    def __init__(self):
+        self.events = EventManager()
+
+    def set_xwindow(self, window_id):
+        pass
+
+    def video_set_key_input(self, enabled):
+        pass
+
+    def video_set_mouse_input(self, enabled):
+        pass
+
+    def event_manager(self):
+        return self.events
+
+    def has_vout(self):
+        return 0
+
+class MediaListPlayer:
+    def __init__(self):
+        self.events = EventManager()
+        self.media_list = None
+
+    def set_media_player(self, player):
+        self.player = player
+
+    def event_manager(self):
+        return self.events
+
+    def set_media_list(self, media_list):
+        self.media_list = media_list
+
+    def set_playback_mode(self, mode):
+        self.mode = mode
+
+    def play_item_at_index(self, index):
+        pass
+
+    def stop(self):
+        pass
+
+class Instance:
+    def __init__(self, *args):
+        pass
+
+    def media_player_new(self):
+        return MediaPlayer()
+
+    def media_list_player_new(self):
+        return MediaListPlayer()
+
+    def media_list_new(self):
+        return MediaList()
+
+    def media_new_path(self, path):
+        return Media(path)
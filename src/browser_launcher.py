@@ -0,0 +1,390 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Chromium precalentado y reutilizable para los servicios de streaming
+# License: MIT
+#--------------------------------------------------
+
+import os
+import json
+import time
+import fcntl
+import select
+import sys
+import threading
+import subprocess
+import metrics
+
+PREWARM_DELAY_S = 5.0     # Esperar a que la GUI termine de arrancar antes de precalentar
+READY_TIMEOUT_S = 30.0
+CALL_TIMEOUT_S = 10.0
+MEMORY_CAP_MB = 450       # Se reinicia el navegador (en reposo) si su árbol de procesos pasa de esto
+SUPERVISE_INTERVAL_S = 10.0
+RESTART_BACKOFF_S = (1, 2, 5, 15, 30)
+SAME_URL_DEBOUNCE_S = 3.0
+FOCUS_GRACE_S = 3.0
+CHILD_FD_MIN = 10         # Los extremos del hijo se mueven arriba de 3 y 4 antes de redirigirlos
+# Arranque del hijo: coloca las tuberías en 3 y 4 (donde Chromium las espera) y se
+# reemplaza por el navegador. No se usa preexec_fn (inseguro con hilos) ni /bin/sh
+# (dash no acepta descriptores de dos dígitos en las redirecciones).
+EXEC_WITH_PIPES = ("import os, sys; a, b = int(sys.argv[1]), int(sys.argv[2]); "
+                   "os.dup2(a, 3); os.dup2(b, 4); os.close(a); os.close(b); os.execvp(sys.argv[3], sys.argv[3:])")
+
+def process_tree_rss(root_pid):
+    """Memoria residente (bytes) de un proceso y todos sus descendientes, leída de /proc."""
+    children = {}
+    for name in os.listdir('/proc'):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f'/proc/{name}/stat') as f:
+                # El nombre del programa va entre paréntesis y puede tener espacios
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+    page_size = os.sysconf('SC_PAGE_SIZE')
+    total = 0
+    pending = [root_pid]
+    while pending:
+        pid = pending.pop()
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * page_size
+        except (OSError, IndexError, ValueError):
+            pass
+        pending.extend(children.get(pid, ()))
+    return total
+
+class PipeConnection:
+    """Canal DevTools de Chromium por tuberías (--remote-debugging-pipe).
+
+    Los mensajes son JSON terminados en NUL: Chromium lee los comandos del
+    descriptor 3 y escribe respuestas y eventos en el 4. A diferencia del
+    puerto de depuración, ningún otro proceso del sistema puede conectarse.
+    """
+
+    def __init__(self, write_fd, read_fd):
+        self.write_fd = write_fd
+        self.read_fd = read_fd
+        self.buffer = b""
+        self.next_id = 1
+
+    def close(self):
+        for fd in (self.write_fd, self.read_fd):
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+
+    def _read_message(self, deadline):
+        while b"\0" not in self.buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError("DevTools no respondió a tiempo")
+            ready, _, _ = select.select([self.read_fd], [], [], remaining)
+            if not ready:
+                continue
+            chunk = os.read(self.read_fd, 65536)
+            if not chunk:
+                raise ConnectionError("Chromium cerró el canal de DevTools")
+            self.buffer += chunk
+        message, self.buffer = self.buffer.split(b"\0", 1)
+        return json.loads(message.decode('utf-8'))
+
+    def call(self, method, params=None, session_id=None, timeout=CALL_TIMEOUT_S):
+        """Envía un comando (a una página si se da session_id) y regresa su 'result'; los eventos se ignoran."""
+        message_id = self.next_id
+        self.next_id += 1
+        message = {'id': message_id, 'method': method, 'params': params or {}}
+        if session_id is not None:
+            message['sessionId'] = session_id
+        data = json.dumps(message).encode('utf-8') + b"\0"
+        while data:
+            data = data[os.write(self.write_fd, data):]
+        deadline = time.monotonic() + timeout
+        while True:
+            reply = self._read_message(deadline)
+            if reply.get('id') != message_id:
+                continue
+            if 'error' in reply:
+                raise RuntimeError(f"{method}: {reply['error'].get('message')}")
+            return reply.get('result', {})
+
+def _child_fd(fd):
+    """Copia fd a un número >= CHILD_FD_MIN (al moverlo a 3 o 4 no pisa al otro)."""
+    high = fcntl.fcntl(fd, fcntl.F_DUPFD_CLOEXEC, CHILD_FD_MIN)
+    os.close(fd)
+    return high
+
+class BrowserLauncher:
+    """Mantiene una instancia de Chromium supervisada y la reutiliza para cada servicio.
+
+    El navegador se controla por DevTools a través de tuberías heredadas: no
+    abre ningún puerto, así que otros procesos no pueden manejar el perfil
+    con las sesiones de los servicios. open(url) navega a la página pedida y
+    pone la ventana en pantalla completa; hide() la devuelve a reposo,
+    minimizada en about:blank. Tras su primer arranque el navegador se queda
+    residente, así que solo la primera apertura espera a Chromium; con
+    prewarm ese primer arranque ocurre al iniciar la aplicación. Solo hay
+    una solicitud en curso: las que llegan mientras tanto reemplazan a la
+    pendiente y las repetidas de la misma URL se ignoran. Si el proceso muere
+    o no arranca se vuelve a lanzar con espera creciente; si se agotan los
+    reintentos o DevTools no responde, cada apertura usa un Chromium en modo
+    kiosco. En reposo se reinicia si su memoria pasa de memory_cap_mb.
+    on_exit() se llama cuando la ventana del navegador desaparece.
+    """
+
+    def __init__(self, binary='chromium-browser', profile_dir=None, memory_cap_mb=MEMORY_CAP_MB,
+                 prewarm=False, on_exit=None):
+        self.binary = binary
+        self.profile_dir = profile_dir
+        self.memory_cap = memory_cap_mb * 1024 * 1024
+        self.prewarm = prewarm
+        self.on_exit = on_exit
+        self.lock = threading.Condition()
+        self.process = None
+        self.connection = None
+        self.ready = False
+        self.visible = False
+        self.shown_at = 0.0
+        self.pending_url = None
+        self.last_request = (None, 0.0)
+        self.hide_requested = False
+        self.failures = 0
+        self.retried_url = None
+        self.fallback = False   # Sin DevTools: cada apertura lanza un Chromium en modo kiosco
+        self.resident = False   # Ya arrancó una vez: se mantiene (y se relanza) en reposo
+        self.thread = None
+        self.stopped = False
+        self.launches = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._supervise, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Cierra el navegador y termina la supervisión (al salir de la aplicación)."""
+        with self.lock:
+            self.stopped = True
+            self.lock.notify()
+        self._kill()
+
+    def open(self, url):
+        """Pide mostrar url. Regresa False si se ignoró (repetida o ya detenido)."""
+        now = time.monotonic()
+        with self.lock:
+            if self.stopped:
+                return False
+            last_url, last_time = self.last_request
+            if url == last_url and now - last_time < SAME_URL_DEBOUNCE_S:
+                return False
+            self.last_request = (url, now)
+            self.pending_url = url
+            self.hide_requested = False
+            self.lock.notify()
+        self.start()
+        return True
+
+    def hide(self):
+        """Regresa el navegador a reposo si está visible (en modo kiosco lo cierra)."""
+        with self.lock:
+            if not self.visible or time.monotonic() - self.shown_at < FOCUS_GRACE_S:
+                return
+            self.hide_requested = True
+            self.lock.notify()
+
+    # --- Proceso ---
+    def _command(self, url):
+        command = [self.binary, '--remote-debugging-pipe', '--no-first-run', '--noerrdialogs',
+                   '--disable-session-crashed-bubble', '--disable-infobars',
+                   '--autoplay-policy=no-user-gesture-required']
+        if self.profile_dir:
+            command.append(f'--user-data-dir={self.profile_dir}')
+        return command + [url]
+
+    def _launch(self):
+        self.launches += 1
+        start = time.monotonic()
+        to_browser, commands = os.pipe()
+        replies, from_browser = os.pipe()
+        to_browser = _child_fd(to_browser)
+        from_browser = _child_fd(from_browser)
+        try:
+            self.process = subprocess.Popen([sys.executable, '-c', EXEC_WITH_PIPES, str(to_browser), str(from_browser)]
+                                            + self._command('about:blank'),
+                                            pass_fds=(to_browser, from_browser),
+                                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            print(f"No se pudo iniciar {self.binary}: {e}")
+            self.process = None
+            os.close(commands)
+            os.close(replies)
+            return False
+        finally:
+            os.close(to_browser)
+            os.close(from_browser)
+        self.connection = PipeConnection(commands, replies)
+        try:
+            self.connection.call('Browser.getVersion', timeout=READY_TIMEOUT_S)
+            self.ready = True
+            self.resident = True
+            self._set_window_state('minimized')
+        except TimeoutError:
+            print("Chromium no respondió por DevTools; se usará el modo kiosco sin reutilizar.")
+            self._kill()
+            self.fallback = True
+            return False
+        except (OSError, ValueError, KeyError, RuntimeError, ConnectionError):
+            # Terminó antes de estar listo (p. ej. no existe el ejecutable) o se detuvo
+            self._kill()
+            return False
+        metrics.observe('launch_seconds', time.monotonic() - start, target='chromium_warmup')
+        return True
+
+    def _kill(self):
+        process = self.process
+        connection = self.connection
+        self.process = None
+        self.connection = None
+        self.ready = False
+        self.visible = False
+        if connection is not None:
+            connection.close()
+        if process is not None and process.poll() is None:
+            process.terminate()
+            try:
+                process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+    def running(self):
+        process = self.process
+        return process is not None and process.poll() is None
+
+    # --- DevTools ---
+    def _page_target(self):
+        for info in self.connection.call('Target.getTargets')['targetInfos']:
+            if info.get('type') == 'page':
+                return info['targetId']
+        # Sin pestañas (p. ej. se cerró la última): abrir una
+        return self.connection.call('Target.createTarget', {'url': 'about:blank'})['targetId']
+
+    def _set_window_state(self, state):
+        target_id = self._page_target()
+        window_id = self.connection.call('Browser.getWindowForTarget', {'targetId': target_id})['windowId']
+        if state == 'fullscreen':
+            # De minimizado no se puede pasar directo a pantalla completa
+            self.connection.call('Browser.setWindowBounds', {'windowId': window_id, 'bounds': {'windowState': 'normal'}})
+        self.connection.call('Browser.setWindowBounds', {'windowId': window_id, 'bounds': {'windowState': state}})
+        return target_id
+
+    def _navigate(self, target_id, url):
+        session_id = self.connection.call('Target.attachToTarget', {'targetId': target_id, 'flatten': True})['sessionId']
+        try:
+            self.connection.call('Page.navigate', {'url': url}, session_id=session_id)
+        finally:
+            self.connection.call('Target.detachFromTarget', {'sessionId': session_id})
+
+    def _show(self, url):
+        start = time.monotonic()
+        target_id = self._set_window_state('fullscreen')
+        self._navigate(target_id, url)
+        with self.lock:
+            self.visible = True
+            self.shown_at = time.monotonic()
+        metrics.observe('launch_seconds', self.shown_at - start, target='chromium')
+        print(f"Navegador reutilizado: {url} en {(self.shown_at - start) * 1000:.0f} ms")
+
+    def _rest(self):
+        self._navigate(self._page_target(), 'about:blank')
+        self._set_window_state('minimized')
+        with self.lock:
+            self.visible = False
+
+    # --- Supervisor ---
+    def _supervise(self):
+        if self.prewarm:
+            with self.lock:
+                self.lock.wait_for(lambda: self.pending_url is not None or self.stopped, PREWARM_DELAY_S)
+        next_check = 0.0
+        while not self.stopped:
+            if self.process is not None and not self.running():
+                # El navegador (o la ventana del kiosco) terminó por su cuenta
+                was_visible = self.visible
+                self._kill()
+                if was_visible and self.on_exit:
+                    self.on_exit()
+            if not self.fallback and not self.running() and (self.prewarm or self.resident or self.pending_url is not None):
+                if not self._launch() and not self.fallback and not self.stopped:
+                    if self.failures >= len(RESTART_BACKOFF_S):
+                        print("Chromium no arranca con DevTools; se usará el modo kiosco sin reutilizar.")
+                        self.fallback = True
+                        continue
+                    delay = RESTART_BACKOFF_S[self.failures]
+                    self.failures += 1
+                    print(f"Chromium no arrancó; reintento en {delay} s")
+                    with self.lock:
+                        self.lock.wait_for(lambda: self.stopped, delay)
+                    continue
+                self.failures = 0
+
+            with self.lock:
+                url = self.pending_url
+                self.pending_url = None
+                hide = self.hide_requested
+                self.hide_requested = False
+            try:
+                if url is not None:
+                    if self.fallback:
+                        self._open_kiosk(url)
+                    else:
+                        self._show(url)
+                    self.retried_url = None
+                elif hide and self.fallback:
+                    # La ventana del kiosco no se puede minimizar: se cierra
+                    self._kill()
+                elif hide and self.ready:
+                    self._rest()
+            except (OSError, ValueError, KeyError, RuntimeError, ConnectionError) as e:
+                print(f"Error al controlar Chromium por DevTools: {e}; se reinicia")
+                self._kill()
+                # La solicitud se reintenta una vez con el navegador nuevo
+                if url is not None and url != self.retried_url and not self.fallback:
+                    self.retried_url = url
+                    with self.lock:
+                        if self.pending_url is None:
+                            self.pending_url = url
+                continue
+
+            now = time.monotonic()
+            if now >= next_check and not self.fallback:
+                next_check = now + SUPERVISE_INTERVAL_S
+                process = self.process
+                if process is not None and process.poll() is None and not self.visible \
+                        and process_tree_rss(process.pid) > self.memory_cap:
+                    print(f"Chromium pasó de {self.memory_cap // (1024 * 1024)} MB en reposo; se reinicia")
+                    self._kill()
+                    continue
+
+            with self.lock:
+                if self.pending_url is None and not self.hide_requested and not self.stopped:
+                    self.lock.wait(1.0)
+
+    def _open_kiosk(self, url):
+        """Modo de respaldo: un Chromium en kiosco por apertura; el supervisor vigila que termine."""
+        self._kill() # Una apertura nueva reemplaza a la ventana anterior
+        self.launches += 1
+        try:
+            self.process = subprocess.Popen([self.binary, '--kiosk', url])
+        except OSError as e:
+            print(f"No se pudo iniciar {self.binary}: {e}")
+            self.process = None
+            return
+        metrics.inc('launches_total', target='chromium_kiosk')
+        with self.lock:
+            self.visible = True
+            self.shown_at = time.monotonic()
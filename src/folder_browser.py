@@ -0,0 +1,202 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Exploración de carpetas bajo demanda con listados en caché
+# License: MIT
+#--------------------------------------------------
+
+import os
+import threading
+from collections import OrderedDict, deque
+from media_index import classify_media
+
+CACHE_DIRS = 4096      # Listados guardados en memoria (los menos usados se descartan)
+PREFETCH_DEPTH = 1     # Niveles de subcarpetas que se listan por adelantado
+BUSY_POLL_S = 1.0
+
+class DirListing:
+    """Contenido multimedia de un directorio: subcarpetas y archivos, ordenados por nombre."""
+
+    __slots__ = ('path', 'mtime', 'dirs', 'files')
+
+    def __init__(self, path, mtime, dirs, files):
+        self.path = path
+        self.mtime = mtime
+        self.dirs = dirs     # Nombres de las subcarpetas
+        self.files = files   # (nombre, tipo de medio)
+
+    def count(self):
+        return len(self.dirs) + len(self.files)
+
+def list_dir(path, mtime=None):
+    """Lista un directorio con os.scandir; regresa un DirListing o None si no se puede leer."""
+    try:
+        if mtime is None:
+            mtime = os.stat(path).st_mtime
+        dirs = []
+        files = []
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.startswith('.'):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        dirs.append(entry.name)
+                        continue
+                except OSError:
+                    continue
+                kind = classify_media(entry.name)
+                if kind:
+                    files.append((entry.name, kind))
+    except OSError:
+        return None
+    dirs.sort(key=str.casefold)
+    files.sort(key=lambda item: item[0].casefold())
+    return DirListing(path, mtime, dirs, files)
+
+class FolderBrowser:
+    """Listados de carpetas bajo demanda para el modo de exploración.
+
+    request(path) pide el listado de una carpeta: un hilo la lee (o valida la
+    copia en caché con el mtime del directorio) y después lista por adelantado
+    sus subcarpetas, de modo que al abrir una ya esté lista. Cada solicitud
+    nueva descarta la lectura anticipada pendiente de la carpeta anterior.
+    walk(path) junta los medios de un subárbol, en el orden en que se muestran.
+    on_update(kind, path, result) se llama desde el hilo con kind 'listed'
+    (result es el DirListing) o 'walked' (result es {'photos', 'music', 'videos'}).
+    Mientras is_busy() regrese True no se hace lectura anticipada.
+    """
+
+    def __init__(self, on_update=None, is_busy=None, max_dirs=CACHE_DIRS, prefetch_depth=PREFETCH_DEPTH):
+        self.on_update = on_update
+        self.is_busy = is_busy or (lambda: False)
+        self.max_dirs = max_dirs
+        self.prefetch_depth = prefetch_depth
+        self.lock = threading.Condition()
+        self.cache = OrderedDict()  # ruta -> DirListing, del menos al más usado
+        self.jobs = deque()         # ('list' | 'walk', ruta)
+        self.prefetch = deque()     # (ruta, profundidad restante)
+        self.thread = None
+        self.listed = 0
+        self.prefetched = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def get(self, path):
+        """Listado en caché de una carpeta, o None si aún no se ha leído."""
+        with self.lock:
+            listing = self.cache.get(path)
+            if listing is not None:
+                self.cache.move_to_end(path)
+            return listing
+
+    def request(self, path):
+        """Pide (o revalida) el listado de una carpeta y la lectura anticipada de sus hijas."""
+        with self.lock:
+            self.prefetch.clear()
+            if ('list', path) not in self.jobs:
+                self.jobs.append(('list', path))
+            self.lock.notify()
+        self.start()
+
+    def walk(self, path):
+        """Pide los medios del subárbol de path; el resultado llega con on_update('walked', ...)."""
+        with self.lock:
+            self.jobs.append(('walk', path))
+            self.lock.notify()
+        self.start()
+
+    def forget(self, mount_point):
+        """Descarta los listados y trabajos de un volumen retirado."""
+        prefix = mount_point.rstrip(os.sep) + os.sep
+        def outside(path):
+            return path != mount_point and not path.startswith(prefix)
+        with self.lock:
+            for path in [path for path in self.cache if not outside(path)]:
+                del self.cache[path]
+            self.jobs = deque(job for job in self.jobs if outside(job[1]))
+            self.prefetch = deque(item for item in self.prefetch if outside(item[0]))
+
+    def _store(self, listing):
+        with self.lock:
+            self.cache[listing.path] = listing
+            self.cache.move_to_end(listing.path)
+            while len(self.cache) > self.max_dirs:
+                self.cache.popitem(last=False)
+
+    def _fresh_listing(self, path):
+        """Listado vigente de una carpeta: de la caché si su mtime no cambió, si no se vuelve a leer."""
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return None, False
+        with self.lock:
+            cached = self.cache.get(path)
+        if cached is not None and cached.mtime == mtime:
+            return cached, False
+        listing = list_dir(path, mtime)
+        if listing is not None:
+            self._store(listing)
+            self.listed += 1
+        return listing, True
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.jobs and not self.prefetch:
+                    self.lock.wait()
+                job = self.jobs.popleft() if self.jobs else None
+                item = None if job else self.prefetch.popleft()
+
+            if job is not None:
+                kind, path = job
+                if kind == 'list':
+                    listing, _ = self._fresh_listing(path)
+                    if listing is not None:
+                        with self.lock:
+                            self.prefetch.extend((os.path.join(path, name), self.prefetch_depth)
+                                                 for name in listing.dirs)
+                    if self.on_update:
+                        self.on_update('listed', path, listing)
+                else:
+                    media = self._walk(path)
+                    if self.on_update:
+                        self.on_update('walked', path, media)
+                continue
+
+            # Lectura anticipada: solo con el disco libre y sin solicitudes pendientes
+            if self.is_busy():
+                with self.lock:
+                    self.prefetch.appendleft(item)
+                    if not self.jobs:
+                        self.lock.wait(BUSY_POLL_S)
+                continue
+            path, depth = item
+            listing, read = self._fresh_listing(path)
+            if read and listing is not None:
+                self.prefetched += 1
+                # Los conteos de las subcarpetas en pantalla pueden cambiar
+                if self.on_update:
+                    self.on_update('listed', path, listing)
+            if listing is not None and depth > 1:
+                with self.lock:
+                    self.prefetch.extend((os.path.join(path, name), depth - 1) for name in listing.dirs)
+
+    def _walk(self, path):
+        """Recorre el subárbol en preorden reutilizando (y llenando) la caché de listados."""
+        media = {'photos': [], 'music': [], 'videos': []}
+        stack = [path]
+        while stack:
+            folder = stack.pop()
+            listing, _ = self._fresh_listing(folder)
+            if listing is None:
+                continue
+            prefix = os.path.join(folder, '')
+            for name, kind in listing.files:
+                media[kind].append(prefix + name)
+            stack.extend(os.path.join(folder, name) for name in reversed(listing.dirs))
+        return media
@@ -0,0 +1,81 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Atlas de iconos pre-escalados con caché en disco
+# License: MIT
+#--------------------------------------------------
+
+import os
+import json
+import hashlib
+
+import pygame
+
+ATLAS_VERSION = 1
+ATLAS_PADDING = 2
+
+def atlas_key(icon_dir, sizes, resolution):
+    """Clave del atlas: nombres, tamaños, resolución y tamaño/mtime de cada PNG fuente."""
+    parts = [str(ATLAS_VERSION), f"{resolution[0]}x{resolution[1]}"]
+    for name in sorted(sizes):
+        st = os.stat(os.path.join(icon_dir, name + '.png'))
+        parts.append(f"{name}:{sizes[name]}:{st.st_size}:{int(st.st_mtime)}")
+    return hashlib.sha1("\0".join(parts).encode('utf-8')).hexdigest()[:16]
+
+def _load_cached(image_path, rects_path):
+    try:
+        with open(rects_path) as f:
+            rects = json.load(f)
+        atlas = pygame.image.load(image_path).convert_alpha()
+    except (OSError, ValueError, pygame.error):
+        return None
+    return {name: atlas.subsurface(rect) for name, rect in rects.items()}
+
+def _build(icon_dir, sizes, image_path, rects_path):
+    """Carga y escala cada PNG y los acomoda en una sola fila dentro del atlas."""
+    scaled = {}
+    for name, size in sizes.items():
+        image = pygame.image.load(os.path.join(icon_dir, name + '.png')).convert_alpha()
+        scaled[name] = pygame.transform.scale(image, (size, size))
+
+    width = sum(image.get_width() + ATLAS_PADDING for image in scaled.values())
+    height = max(image.get_height() for image in scaled.values())
+    atlas = pygame.Surface((width, height), pygame.SRCALPHA)
+    rects = {}
+    x = 0
+    for name, image in scaled.items():
+        atlas.blit(image, (x, 0))
+        rects[name] = [x, 0, image.get_width(), image.get_height()]
+        x += image.get_width() + ATLAS_PADDING
+
+    try:
+        os.makedirs(os.path.dirname(image_path), exist_ok=True)
+        # pygame.image.save elige el formato por la extensión: el temporal termina en .png
+        tmp_image = image_path + ".tmp.png"
+        pygame.image.save(atlas, tmp_image)
+        tmp_rects = rects_path + ".tmp"
+        with open(tmp_rects, 'w') as f:
+            json.dump(rects, f)
+        os.replace(tmp_image, image_path)
+        os.replace(tmp_rects, rects_path)
+    except (OSError, pygame.error) as e:
+        print(f"No se pudo guardar el atlas de iconos: {e}")
+    return scaled
+
+def load_icons(icon_dir, sizes, cache_dir, resolution):
+    """Regresa {nombre: superficie} con los iconos ya escalados.
+
+    sizes indica el lado en píxeles de cada icono (nombre del PNG sin
+    extensión). Si existe un atlas en caché para esta resolución y estos
+    archivos, se carga una sola imagen pequeña; si no, se construye a partir
+    de los PNG originales y se guarda. Lanza pygame.error u OSError si falta
+    algún icono fuente.
+    """
+    key = atlas_key(icon_dir, sizes, resolution)
+    image_path = os.path.join(cache_dir, f"icons_{resolution[0]}x{resolution[1]}_{key}.png")
+    rects_path = image_path[:-4] + ".json"
+    icons = _load_cached(image_path, rects_path)
+    if icons is not None and set(icons) == set(sizes):
+        return icons
+    return _build(icon_dir, sizes, image_path, rects_path)
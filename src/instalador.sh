@@ -66,8 +66,9 @@ run_command "Instalar xserver-xorg, xinit, openbox, x11-xserver-utils, lxtermina
 run_command "Instalar libgtk-3-0 y libcanberra-gtk-module" \
     sudo apt install -y libgtk-3-0 libcanberra-gtk-module
 
-# --- Paso 5: Instalar VLC Media Player ---
+# --- Paso 5: Instalar VLC Media Player y ffmpeg (miniaturas de videos) ---
 run_command "Instalar VLC media player" sudo apt install -y vlc
+run_command "Instalar ffmpeg (cuadros de muestra para las miniaturas de videos)" sudo apt install -y ffmpeg
 
 # --- Paso 6: Instalar NetworkManager y sus herramientas (para configuración Wi-Fi) ---
 run_command "Instalar NetworkManager y network-manager-gnome (para nmcli y gestión de Wi-Fi)" \
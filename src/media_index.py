@@ -0,0 +1,240 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Índice persistente de medios por volumen USB
+# License: MIT
+#--------------------------------------------------
+
+import os
+import re
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Extensiones reconocidas por tipo de medio
+PHOTO_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.bmp')
+MUSIC_EXTENSIONS = ('.mp3', '.wav', '.flac', '.ogg')
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.webm')
+
+# Tabla precalculada extensión -> tipo de medio, para clasificar con una sola búsqueda
+MEDIA_KIND_BY_EXTENSION = {}
+for _ext in PHOTO_EXTENSIONS:
+    MEDIA_KIND_BY_EXTENSION[_ext] = 'photos'
+for _ext in MUSIC_EXTENSIONS:
+    MEDIA_KIND_BY_EXTENSION[_ext] = 'music'
+for _ext in VIDEO_EXTENSIONS:
+    MEDIA_KIND_BY_EXTENSION[_ext] = 'videos'
+
+# Número de hilos por defecto para listar directorios en paralelo
+DEFAULT_SCAN_WORKERS = 4
+
+# Versión del formato del índice en disco; si cambia, el índice se reconstruye
+INDEX_VERSION = 2
+
+def volume_key_from_udev(device):
+    """Obtiene una clave estable del volumen a partir de las propiedades de udev."""
+    uuid = device.get('ID_FS_UUID')
+    if uuid:
+        return "uuid-" + uuid
+    label = device.get('ID_FS_LABEL')
+    serial = device.get('ID_SERIAL_SHORT') or device.get('ID_SERIAL')
+    if label or serial:
+        return "label-" + (label or "") + "-" + (serial or "")
+    return None
+
+def classify_media(file_name):
+    """Regresa 'photos', 'music', 'videos' o None según la extensión del archivo."""
+    dot = file_name.rfind('.')
+    if dot < 0:
+        return None
+    return MEDIA_KIND_BY_EXTENSION.get(file_name[dot:].lower())
+
+def new_batch():
+    """Crea un lote vacío de resultados de escaneo."""
+    return {'photos': [], 'music': [], 'videos': [],
+            'info': {'photos': [], 'music': [], 'videos': []}}
+
+class MediaIndex:
+    """Índice de medios de un volumen, guardado en disco con el mtime de cada directorio.
+
+    Al reinsertar un volumen conocido solo se vuelven a listar los directorios
+    cuyo mtime cambió; el resto se reutiliza del índice. Nota: algunos sistemas
+    (p. ej. FAT escrito desde Windows) no actualizan el mtime de los directorios,
+    en ese caso basta con borrar el archivo del índice para forzar un escaneo completo.
+    """
+
+    def __init__(self, index_dir, volume_key):
+        self.index_dir = index_dir
+        self.volume_key = volume_key
+        self.index_file = None
+        if index_dir and volume_key:
+            safe_key = re.sub(r'[^A-Za-z0-9._-]', '_', volume_key)
+            self.index_file = os.path.join(index_dir, safe_key + ".json")
+        # Directorio relativo -> {'mtime', 'subdirs', 'files': [[nombre, tamaño, mtime], ...]}
+        self.dirs = {}
+        self.dirty = False
+        self.rescanned_dirs = 0
+
+    def load(self):
+        """Carga el índice desde disco. Regresa True si había un índice válido."""
+        self.dirs = {}
+        if not self.index_file:
+            return False
+        try:
+            with open(self.index_file, "r") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != INDEX_VERSION or data.get('volume') != self.volume_key:
+            return False
+        self.dirs = data.get('dirs', {})
+        return True
+
+    def save(self):
+        """Guarda el índice en disco de forma atómica si hubo cambios."""
+        if not self.index_file or not self.dirty:
+            return
+        try:
+            os.makedirs(self.index_dir, exist_ok=True)
+            tmp_file = self.index_file + ".tmp"
+            with open(tmp_file, "w") as f:
+                json.dump({'version': INDEX_VERSION, 'volume': self.volume_key, 'dirs': self.dirs},
+                          f, separators=(',', ':'))
+            os.replace(tmp_file, self.index_file)
+            self.dirty = False
+        except OSError as e:
+            print(f"No se pudo guardar el índice de medios {self.index_file}: {e}")
+
+    def _list_dir(self, abs_dir, mtime):
+        """Lista un directorio y conserva solo subdirectorios y archivos multimedia (con tamaño y mtime)."""
+        subdirs = []
+        files = []
+        try:
+            with os.scandir(abs_dir) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            subdirs.append(entry.name)
+                            continue
+                    except OSError:
+                        continue
+                    if classify_media(entry.name):
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        files.append([entry.name, st.st_size, int(st.st_mtime)])
+        except OSError:
+            return None
+        return {'mtime': mtime, 'subdirs': subdirs, 'files': files}
+
+    def _visit_dir(self, mount_point, rel_dir):
+        """Revisa un directorio (se ejecuta en un hilo del pool).
+
+        Regresa (rel_dir, entrada, listado) donde listado indica si hubo que
+        volver a leer el directorio porque su mtime cambió.
+        """
+        abs_dir = os.path.join(mount_point, rel_dir) if rel_dir else mount_point
+        # El mtime se lee antes de listar: si el directorio cambia durante el
+        # listado, el siguiente escaneo lo detectará
+        try:
+            mtime = os.stat(abs_dir).st_mtime
+        except OSError:
+            return rel_dir, None, False
+        entry = self.dirs.get(rel_dir)
+        if entry is not None and entry['mtime'] == mtime:
+            return rel_dir, entry, False
+        return rel_dir, self._list_dir(abs_dir, mtime), True
+
+    def iter_update(self, mount_point, batch_size=200, batch_interval=0.25, workers=DEFAULT_SCAN_WORKERS, cancel=None):
+        """Sincroniza el índice con el volumen y produce los medios por lotes.
+
+        Los directorios se revisan con un pool de `workers` hilos para mantener
+        varias lecturas pendientes en el dispositivo USB. Cada lote es un
+        diccionario {'photos', 'music', 'videos'} con las rutas absolutas
+        encontradas desde el lote anterior, en el orden en que terminan los
+        hilos; batch['info'][tipo] tiene los (tamaño, mtime) en paralelo. El
+        primer lote se entrega en cuanto aparece algún archivo; los siguientes
+        cuando se juntan batch_size archivos o pasan batch_interval segundos.
+        Si `cancel` (threading.Event) se activa, el recorrido se detiene y el
+        índice no se modifica.
+        """
+        new_dirs = {}
+        pending = ['']
+        in_flight = set()
+        self.rescanned_dirs = 0
+        batch = new_batch()
+        batch_count = 0
+        batches_sent = 0
+        last_batch_time = time.monotonic()
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            while pending or in_flight:
+                if cancel is not None and cancel.is_set():
+                    return
+                # Limitar las lecturas en curso para no acumular trabajo en el pool
+                while pending and len(in_flight) < 2 * max(1, workers):
+                    in_flight.add(pool.submit(self._visit_dir, mount_point, pending.pop()))
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    rel_dir, entry, listed = future.result()
+                    if entry is None:
+                        continue
+                    if listed:
+                        self.rescanned_dirs += 1
+                    new_dirs[rel_dir] = entry
+                    for sub in entry['subdirs']:
+                        pending.append(os.path.join(rel_dir, sub) if rel_dir else sub)
+
+                    prefix = os.path.join(mount_point, rel_dir, '')
+                    for file, size, file_mtime in entry['files']:
+                        kind = classify_media(file)
+                        if kind:
+                            batch[kind].append(prefix + file)
+                            batch['info'][kind].append((size, file_mtime))
+                            batch_count += 1
+
+                if batch_count and (batches_sent == 0 or batch_count >= batch_size
+                                    or time.monotonic() - last_batch_time >= batch_interval):
+                    yield batch
+                    batches_sent += 1
+                    batch = new_batch()
+                    batch_count = 0
+                    last_batch_time = time.monotonic()
+
+        if self.rescanned_dirs or len(new_dirs) != len(self.dirs):
+            self.dirty = True
+        self.dirs = self._preorder(new_dirs)
+        if batch_count:
+            yield batch
+
+    def _preorder(self, dirs):
+        """Ordena los directorios en preorden (como os.walk) para que el índice sea estable."""
+        ordered = {}
+        stack = ['']
+        while stack:
+            rel_dir = stack.pop()
+            entry = dirs.get(rel_dir)
+            if entry is None:
+                continue
+            ordered[rel_dir] = entry
+            for sub in reversed(entry['subdirs']):
+                stack.append(os.path.join(rel_dir, sub) if rel_dir else sub)
+        return ordered
+
+    def update(self, mount_point, workers=DEFAULT_SCAN_WORKERS):
+        """Sincroniza el índice con el volumen montado en mount_point."""
+        for _ in self.iter_update(mount_point, workers=workers):
+            pass
+
+    def media_files(self, mount_point):
+        """Regresa las listas (photos, music, videos) con rutas absolutas."""
+        media = {'photos': [], 'music': [], 'videos': []}
+        for rel_dir, entry in self.dirs.items():
+            prefix = os.path.join(mount_point, rel_dir, '')
+            for file, _, _ in entry['files']:
+                kind = classify_media(file)
+                if kind:
+                    media[kind].append(prefix + file)
+        return media['photos'], media['music'], media['videos']
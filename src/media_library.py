@@ -0,0 +1,404 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Biblioteca de medios por dispositivo USB con vista combinada
+# License: MIT
+#--------------------------------------------------
+
+import os
+import sys
+import heapq
+import threading
+from array import array
+from itertools import repeat
+from collections import OrderedDict
+from collections.abc import Sequence
+
+MEDIA_KINDS = ('photos', 'music', 'videos')
+
+SORT_RUN = 2048 # Elementos por tramo al ordenar en el hilo de cálculo
+
+def sorted_in_runs(count, key, reverse=False):
+    """Índices 0..count-1 ordenados por key, en tramos de SORT_RUN mezclados después.
+
+    sorted() con una clave en C no suelta el GIL hasta terminar (decenas de
+    ms con 50k elementos); por tramos, el hilo de la GUI vuelve a correr
+    entre uno y otro. El resultado es el mismo que con sorted() (estable).
+    """
+    runs = [sorted(range(start, min(count, start + SORT_RUN)), key=key, reverse=reverse)
+            for start in range(0, count, SORT_RUN)]
+    if len(runs) == 1:
+        return runs[0]
+    return list(heapq.merge(*runs, key=key, reverse=reverse))
+
+def compute_video_orders(videos, sizes, mtimes):
+    """Calcula los índices de la lista de videos por nombre, tamaño y fecha."""
+    names = [name.casefold() for name in videos.basenames()]
+    return {
+        'name': sorted_in_runs(len(names), names.__getitem__),
+        'size': sorted_in_runs(len(names), sizes.__getitem__, reverse=True),
+        'mtime': sorted_in_runs(len(names), mtimes.__getitem__, reverse=True),
+    }
+
+def is_under(path, mount_point):
+    """True si la ruta está dentro del punto de montaje."""
+    return path == mount_point or path.startswith(mount_point.rstrip(os.sep) + os.sep)
+
+class DirTable:
+    """Carpetas internadas: cada una se guarda una sola vez (con el separador final)."""
+
+    def __init__(self):
+        self.ids = {}
+        self.prefixes = []
+
+    def intern(self, directory):
+        prefix = os.path.join(directory, '')
+        dir_id = self.ids.get(prefix)
+        if dir_id is None:
+            dir_id = self.ids[prefix] = len(self.prefixes)
+            self.prefixes.append(prefix)
+        return dir_id
+
+    def ids_under(self, mount_point):
+        """Números de las carpetas dentro del punto de montaje."""
+        root = mount_point.rstrip(os.sep) + os.sep
+        return {dir_id for prefix, dir_id in self.ids.items() if prefix.startswith(root)}
+
+    def nbytes(self):
+        return (sys.getsizeof(self.ids) + sys.getsizeof(self.prefixes)
+                + sum(sys.getsizeof(prefix) for prefix in self.prefixes))
+
+class PathList(Sequence):
+    """Lista de rutas compacta: número de carpeta y nombre, con los nombres en un solo búfer.
+
+    Cada entrada ocupa 8 bytes de índices más los bytes de su nombre en
+    UTF-8, en lugar de un objeto str con la ruta completa. Las rutas se
+    arman solo al pedirlas (lista[i], iterar, basename(i)); solo se agregan
+    entradas al final, así que los índices ya entregados no cambian.
+    """
+
+    def __init__(self, dirs=None):
+        self.dirs = dirs if dirs is not None else DirTable()
+        self.dir_ids = array('I')
+        self.offsets = array('I', [0]) # Inicio del nombre i en names; el último es el final
+        self.names = bytearray()
+
+    def __len__(self):
+        return len(self.dir_ids)
+
+    def extend(self, paths):
+        intern = self.dirs.intern
+        dir_ids = self.dir_ids
+        offsets = self.offsets
+        names = self.names
+        for path in paths:
+            directory, name = os.path.split(path)
+            dir_ids.append(intern(directory))
+            # surrogateescape conserva nombres que no son UTF-8 válido (FAT con otra página de códigos)
+            names += name.encode('utf-8', 'surrogateescape')
+            offsets.append(len(names))
+
+    def basename(self, index):
+        if index < 0:
+            index += len(self)
+        return self.names[self.offsets[index]:self.offsets[index + 1]].decode('utf-8', 'surrogateescape')
+
+    def basenames(self):
+        names = self.names
+        offsets = self.offsets
+        for index in range(len(self)):
+            yield names[offsets[index]:offsets[index + 1]].decode('utf-8', 'surrogateescape')
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        return self.dirs.prefixes[self.dir_ids[index]] + self.basename(index)
+
+    def __iter__(self):
+        prefixes = self.dirs.prefixes
+        names = self.names
+        offsets = self.offsets
+        for index, dir_id in enumerate(self.dir_ids):
+            yield prefixes[dir_id] + names[offsets[index]:offsets[index + 1]].decode('utf-8', 'surrogateescape')
+
+    def indices_under(self, mount_point):
+        """Índices de las entradas dentro del punto de montaje, sin armar las rutas."""
+        inside = self.dirs.ids_under(mount_point)
+        return [index for index, dir_id in enumerate(self.dir_ids) if dir_id in inside]
+
+    def nbytes(self):
+        """Memoria de las entradas (la tabla de carpetas se comparte y se cuenta aparte)."""
+        return self.dir_ids.buffer_info()[1] * self.dir_ids.itemsize \
+            + self.offsets.buffer_info()[1] * self.offsets.itemsize + len(self.names)
+
+class MediaView(Sequence):
+    """Vista combinada de un tipo de medio: referencias (lista, índice) a las PathList de cada memoria.
+
+    Guarda 6 bytes por entrada; las rutas se arman desde la lista de origen al pedirlas.
+    """
+
+    def __init__(self):
+        self.lists = []          # PathList de origen por número de ranura
+        self.slot_ids = {}       # id(PathList) -> ranura
+        self.slots = array('H')
+        self.local = array('I')
+
+    def __len__(self):
+        return len(self.local)
+
+    def add_range(self, path_list, start, stop):
+        """Agrega a la vista las entradas [start, stop) de una PathList."""
+        slot = self.slot_ids.get(id(path_list))
+        if slot is None:
+            slot = self.slot_ids[id(path_list)] = len(self.lists)
+            self.lists.append(path_list)
+        self.slots.extend(repeat(slot, stop - start))
+        self.local.extend(range(start, stop))
+
+    def locate(self, index):
+        """Regresa (PathList de origen, índice en ella)."""
+        return self.lists[self.slots[index]], self.local[index]
+
+    def basename(self, index):
+        path_list, local = self.locate(index)
+        return path_list.basename(local)
+
+    def basenames(self):
+        lists = self.lists
+        for slot, local in zip(self.slots, self.local):
+            yield lists[slot].basename(local)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        path_list, local = self.locate(index)
+        return path_list[local]
+
+    def __iter__(self):
+        lists = self.lists
+        for slot, local in zip(self.slots, self.local):
+            yield lists[slot][local]
+
+    def copy(self):
+        """Copia de la vista con las entradas actuales (las listas de origen solo crecen al final)."""
+        view = MediaView()
+        view.lists = list(self.lists)
+        view.slot_ids = dict(self.slot_ids)
+        view.slots = array('H', self.slots)
+        view.local = array('I', self.local)
+        return view
+
+    def frozen(self):
+        """Vista con las entradas actuales que no crece con los lotes siguientes (para listas de reproducción)."""
+        return SubsetView(self, range(len(self)))
+
+    def nbytes(self):
+        return self.slots.buffer_info()[1] * self.slots.itemsize + self.local.buffer_info()[1] * self.local.itemsize
+
+class SubsetView(Sequence):
+    """Subconjunto reordenado de otra secuencia (p. ej. los videos en el orden elegido), sin copiar rutas."""
+
+    def __init__(self, base, indices):
+        self.base = base
+        self.indices = indices
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self.base[self.indices[index]]
+
+class DeviceLibrary:
+    """Contenido escaneado de una partición USB, en listas compactas que comparten la tabla de carpetas."""
+
+    def __init__(self, device, mount_point, label=None, volume=None):
+        self.device = device
+        self.mount_point = mount_point
+        self.label = label or os.path.basename(mount_point.rstrip(os.sep)) or device
+        # Clave estable del volumen (UUID o etiqueta+serie); sin ella se usa la etiqueta
+        self.volume = volume or "label-" + self.label
+        self.scanning = True
+        self.dirs = DirTable()
+        self.photos = PathList(self.dirs)
+        self.music = PathList(self.dirs)
+        self.videos = PathList(self.dirs)
+        self.video_sizes = array('q')  # Tamaño y mtime de cada video, en el mismo orden
+        self.video_mtimes = array('d')
+
+    def counts(self):
+        return {kind: len(getattr(self, kind)) for kind in MEDIA_KINDS}
+
+    def nbytes(self):
+        return (self.dirs.nbytes() + sum(getattr(self, kind).nbytes() for kind in MEDIA_KINDS)
+                + len(self.video_sizes) * self.video_sizes.itemsize + len(self.video_mtimes) * self.video_mtimes.itemsize)
+
+class MediaLibrary:
+    """Bibliotecas de todas las memorias conectadas y la vista que se muestra.
+
+    Cada dispositivo guarda sus propias listas compactas (PathList); la vista
+    combinada (photos, music, videos) es un MediaView que referencia las de
+    todos los dispositivos, o solo las de uno si hay un filtro de origen. Los
+    lotes de escaneo se agregan a la vista sin reconstruirla; retirar un
+    dispositivo o cambiar el filtro sí la reconstruye e incrementa `version`
+    para que las listas en pantalla se reinicien. Solo se usa desde el hilo
+    principal, salvo el cálculo de los órdenes de videos, que corre en un hilo
+    sobre una copia de la vista y avisa con on_orders_ready().
+    """
+
+    def __init__(self, on_orders_ready=None):
+        self.devices = OrderedDict() # Nodo del dispositivo -> DeviceLibrary, en orden de llegada
+        self.source_filter = None    # Nodo del dispositivo mostrado, o None para todos
+        self.version = 0
+        self.photos = MediaView()
+        self.music = MediaView()
+        self.videos = MediaView()
+        self.video_sizes = array('q')
+        self.video_mtimes = array('d')
+        self.on_orders_ready = on_orders_ready
+        self._video_orders = {}
+        self._videos_stamp = 0    # Cambia con cada cambio de la lista de videos de la vista
+        self._orders_stamp = None # Lista de videos para la que se calcularon (o calculan) los órdenes
+        self._ready_orders = None # (stamp, órdenes) entregados por el hilo de cálculo
+
+    def _included(self, device):
+        return self.source_filter is None or self.source_filter == device
+
+    def _rebuild(self):
+        self.photos = MediaView()
+        self.music = MediaView()
+        self.videos = MediaView()
+        self.video_sizes = array('q')
+        self.video_mtimes = array('d')
+        for library in self.devices.values():
+            if self._included(library.device):
+                for kind in MEDIA_KINDS:
+                    path_list = getattr(library, kind)
+                    getattr(self, kind).add_range(path_list, 0, len(path_list))
+                self.video_sizes.extend(library.video_sizes)
+                self.video_mtimes.extend(library.video_mtimes)
+        self._video_orders = {}
+        self._videos_stamp += 1
+        self.version += 1
+
+    def add_device(self, device, mount_point, label=None, volume=None):
+        """Registra un dispositivo cuyo escaneo comienza; un reescaneo reemplaza su contenido."""
+        replaced = self.devices.pop(device, None)
+        self.devices[device] = DeviceLibrary(device, mount_point, label, volume)
+        if replaced is not None:
+            self._rebuild()
+        return self.devices[device]
+
+    def extend(self, device, batch):
+        """Agrega un lote del escaneo de un dispositivo."""
+        library = self.devices.get(device)
+        if library is None:
+            return
+        included = self._included(device)
+        for kind in MEDIA_KINDS:
+            path_list = getattr(library, kind)
+            start = len(path_list)
+            path_list.extend(batch[kind])
+            if included:
+                getattr(self, kind).add_range(path_list, start, len(path_list))
+        sizes = [size for size, _ in batch['video_info']]
+        mtimes = [mtime for _, mtime in batch['video_info']]
+        library.video_sizes.extend(sizes)
+        library.video_mtimes.extend(mtimes)
+        if included:
+            self.video_sizes.extend(sizes)
+            self.video_mtimes.extend(mtimes)
+            if batch['videos']:
+                self._video_orders = {}
+                self._videos_stamp += 1
+
+    def finish(self, device):
+        """Marca como terminado el escaneo de un dispositivo. Regresa su biblioteca o None."""
+        library = self.devices.get(device)
+        if library is not None:
+            library.scanning = False
+        return library
+
+    def remove_device(self, device):
+        """Quita solo las entradas del dispositivo retirado. Regresa su biblioteca o None."""
+        library = self.devices.pop(device, None)
+        if library is None:
+            return None
+        if self.source_filter == device:
+            self.source_filter = None
+        self._rebuild()
+        return library
+
+    def set_filter(self, device):
+        """Muestra solo un dispositivo (o todos con None)."""
+        if device is not None and device not in self.devices:
+            device = None
+        if device != self.source_filter:
+            self.source_filter = device
+            self._rebuild()
+
+    def cycle_filter(self):
+        """Pasa al siguiente origen: todos, el primer dispositivo, el segundo, ..., todos."""
+        sources = [None] + list(self.devices)
+        position = sources.index(self.source_filter) if self.source_filter in sources else 0
+        self.set_filter(sources[(position + 1) % len(sources)])
+
+    def source_label(self):
+        if self.source_filter is None:
+            return "Todos"
+        return self.devices[self.source_filter].label
+
+    @property
+    def scanning(self):
+        """True mientras algún dispositivo de la vista se sigue escaneando."""
+        return any(library.scanning for library in self.devices.values() if self._included(library.device))
+
+    def video_order(self, key):
+        """Índices de self.videos en el orden pedido, o None para el orden de escaneo.
+
+        Los órdenes se calculan una vez que termina el escaneo de la vista, en
+        un hilo aparte para no detener la GUI; mientras tanto (y hasta que
+        on_orders_ready avise) se regresa None. Se guardan hasta que la vista
+        cambie.
+        """
+        if key == 'scan' or self.scanning:
+            return None
+        ready = self._ready_orders
+        if not self._video_orders and ready is not None and ready[0] == self._videos_stamp:
+            self._video_orders = ready[1]
+        if not self._video_orders and self._orders_stamp != self._videos_stamp:
+            self._start_orders()
+        return self._video_orders.get(key)
+
+    def _start_orders(self):
+        stamp = self._orders_stamp = self._videos_stamp
+        # Copias de los arreglos (en C): la vista puede crecer o reemplazarse mientras se ordena
+        videos = self.videos.copy()
+        sizes = array('q', self.video_sizes)
+        mtimes = array('d', self.video_mtimes)
+
+        def compute():
+            self._ready_orders = (stamp, compute_video_orders(videos, sizes, mtimes))
+            if self.on_orders_ready:
+                self.on_orders_ready()
+        threading.Thread(target=compute, daemon=True).start()
+
+    def device_for_path(self, path):
+        """Regresa el nodo del dispositivo que contiene la ruta, o None."""
+        for library in self.devices.values():
+            if is_under(path, library.mount_point):
+                return library.device
+        return None
+
+    def nbytes(self):
+        """Memoria de las listas compactas de todos los dispositivos y de la vista combinada."""
+        return (sum(library.nbytes() for library in self.devices.values())
+                + sum(getattr(self, kind).nbytes() for kind in MEDIA_KINDS)
+                + len(self.video_sizes) * self.video_sizes.itemsize
+                + len(self.video_mtimes) * self.video_mtimes.itemsize)
@@ -0,0 +1,309 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Extracción de metadatos de medios con libvlc y almacén SQLite
+# License: MIT
+#--------------------------------------------------
+
+import os
+import time
+import sqlite3
+import threading
+from collections import deque
+
+PARSE_TIMEOUT_MS = 5000
+# Fracción del tiempo que el extractor puede ocupar el disco: tras analizar
+# un archivo descansa lo necesario para no pasar de este ciclo de trabajo
+DUTY_CYCLE = 0.25
+BUSY_POLL_S = 1.0
+NOTIFY_INTERVAL_S = 0.5
+COMMIT_EVERY = 50
+
+SCHEMA_VERSION = 1
+FIELDS = ('duration', 'width', 'height', 'video_codec', 'audio_codec', 'bitrate', 'title', 'artist', 'album')
+
+def fourcc(codec):
+    """Convierte el código de códec de libvlc (fourcc en un entero) a texto, p. ej. 'h264'."""
+    try:
+        return codec.to_bytes(4, 'little').decode('ascii').strip(' \0') or None
+    except (AttributeError, OverflowError, UnicodeDecodeError):
+        return None
+
+def format_duration(seconds):
+    """Duración como m:ss o h:mm:ss."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{seconds:02d}"
+    return f"{minutes}:{seconds:02d}"
+
+def describe(metadata):
+    """Texto corto para las listas: duración y resolución (p. ej. '1:32:05  1080p')."""
+    parts = []
+    if metadata.get('duration'):
+        parts.append(format_duration(metadata['duration']))
+    if metadata.get('height'):
+        parts.append(f"{metadata['height']}p")
+    return "  ".join(parts)
+
+class MetadataStore:
+    """Metadatos en SQLite, con clave volumen + ruta relativa y validados por tamaño y mtime.
+
+    La conexión pertenece al hilo que la abre (el del extractor).
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.db = None
+        self.pending_writes = 0
+
+    def open(self):
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self.db = sqlite3.connect(self.db_path)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version != SCHEMA_VERSION:
+            self.db.execute("DROP TABLE IF EXISTS media")
+        self.db.execute("""CREATE TABLE IF NOT EXISTS media (
+            volume TEXT NOT NULL, path TEXT NOT NULL, size INTEGER, mtime REAL, failed INTEGER,
+            duration REAL, width INTEGER, height INTEGER, video_codec TEXT, audio_codec TEXT,
+            bitrate INTEGER, title TEXT, artist TEXT, album TEXT,
+            PRIMARY KEY (volume, path))""")
+        self.db.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self.db.commit()
+
+    def get(self, volume, path, size, mtime):
+        """Regresa los metadatos guardados si el archivo no cambió; {} si falló antes; None si no hay."""
+        row = self.db.execute(f"SELECT size, mtime, failed, {', '.join(FIELDS)} FROM media WHERE volume=? AND path=?",
+                              (volume, path)).fetchone()
+        if row is None or row[0] != size or row[1] != mtime:
+            return None
+        if row[2]:
+            return {}
+        return {name: value for name, value in zip(FIELDS, row[3:]) if value is not None}
+
+    def put(self, volume, path, size, mtime, metadata):
+        """Guarda el resultado; metadata vacío marca el archivo como no analizable."""
+        values = [metadata.get(name) for name in FIELDS]
+        self.db.execute(f"INSERT OR REPLACE INTO media (volume, path, size, mtime, failed, {', '.join(FIELDS)}) "
+                        f"VALUES (?, ?, ?, ?, ?{', ?' * len(FIELDS)})",
+                        [volume, path, size, mtime, 0 if metadata else 1] + values)
+        self.pending_writes += 1
+        if self.pending_writes >= COMMIT_EVERY:
+            self.commit()
+
+    def commit(self):
+        if self.db is not None and self.pending_writes:
+            self.db.commit()
+            self.pending_writes = 0
+
+    def close(self):
+        if self.db is not None:
+            self.commit()
+            self.db.close()
+            self.db = None
+
+class MetadataExtractor:
+    """Analiza archivos en un hilo de baja prioridad y guarda los resultados en el almacén.
+
+    is_busy() se consulta antes de cada archivo; mientras regrese True (por
+    ejemplo, durante una reproducción) el extractor no toca el disco. Los
+    resultados quedan en memoria para consultarlos con get(); on_update() se
+    llama, como mucho cada NOTIFY_INTERVAL_S, cuando hay resultados nuevos.
+    """
+
+    def __init__(self, vlc_module, store, on_update=None, is_busy=None, duty_cycle=DUTY_CYCLE):
+        self.vlc = vlc_module
+        self.store = store
+        self.on_update = on_update
+        self.is_busy = is_busy or (lambda: False)
+        self.duty_cycle = duty_cycle
+        self.lock = threading.Condition()
+        self.queue = deque()  # [volumen, punto de montaje, lista de rutas, siguiente índice]
+        self.results = {}     # ruta absoluta -> metadatos
+        self.thread = None
+        self.instance = None
+        self.last_notify = 0.0
+        self.notify_pending = False
+        self.parsed = 0
+        self.cached = 0
+        self.failed = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def enqueue(self, volume, mount_point, paths):
+        """Agrega los archivos de una lista de un volumen a la cola (los ya conocidos salen del almacén).
+
+        La cola guarda un cursor sobre la lista y no las rutas: cada ruta se
+        arma en el hilo del extractor al llegar su turno, así que `paths` debe
+        ser una secuencia a la que solo se agregan elementos al final
+        (p. ej. media_library.PathList).
+        """
+        with self.lock:
+            self.queue.append([volume, mount_point, paths, 0])
+            self.lock.notify()
+
+    def forget(self, mount_point):
+        """Descarta lo pendiente y los resultados en memoria de un volumen retirado."""
+        prefix = mount_point.rstrip(os.sep) + os.sep
+        with self.lock:
+            self.queue = deque(cursor for cursor in self.queue if cursor[1] != mount_point)
+            self.results = {path: data for path, data in self.results.items() if not path.startswith(prefix)}
+
+    def get(self, path):
+        """Metadatos de un archivo ya analizado, o None."""
+        return self.results.get(path)
+
+    def pending(self):
+        with self.lock:
+            return sum(len(paths) - index for _, _, paths, index in self.queue)
+
+    def _has_work(self):
+        # Llamar con el candado tomado; descarta los cursores que ya llegaron al final
+        while self.queue and self.queue[0][3] >= len(self.queue[0][2]):
+            self.queue.popleft()
+        return bool(self.queue)
+
+    def _take(self):
+        """Siguiente archivo sin resultado en memoria, o None (llamar con el candado tomado)."""
+        while self._has_work():
+            cursor = self.queue[0]
+            volume, mount_point, paths, index = cursor
+            cursor[3] = index + 1
+            path = paths[index]
+            if path not in self.results:
+                return volume, mount_point, path
+        return None
+
+    def _lower_priority(self):
+        # En Linux la prioridad se aplica por hilo; así el extractor cede CPU a la GUI y a VLC
+        try:
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), 19)
+        except (AttributeError, OSError):
+            pass
+
+    def _run(self):
+        self._lower_priority()
+        try:
+            self.store.open()
+        except (OSError, sqlite3.Error) as e:
+            print(f"No se pudo abrir la base de metadatos {self.store.db_path}: {e}")
+            return
+        while True:
+            with self.lock:
+                if not self._has_work():
+                    # Cola vacía: avisar de lo último y guardar antes de esperar más trabajo
+                    self._flush_notify(force=True)
+                    self.store.commit()
+                while not self._has_work():
+                    self.lock.wait()
+            while self.is_busy():
+                # Durante la reproducción el disco es de VLC
+                self.store.commit()
+                time.sleep(BUSY_POLL_S)
+            with self.lock:
+                job = self._take()
+            if job is None:
+                continue
+            volume, mount_point, path = job
+            started = time.monotonic()
+            metadata = self._process(volume, mount_point, path)
+            if metadata is not None:
+                with self.lock:
+                    self.results[path] = metadata
+                    self.notify_pending = True
+                    self._flush_notify()
+            # Ciclo de trabajo: descansar proporcionalmente a lo que tomó el análisis
+            elapsed = time.monotonic() - started
+            if self.duty_cycle < 1:
+                time.sleep(elapsed * (1 - self.duty_cycle) / self.duty_cycle)
+
+    def _flush_notify(self, force=False):
+        if not self.notify_pending:
+            return
+        now = time.monotonic()
+        if force or now - self.last_notify >= NOTIFY_INTERVAL_S:
+            self.notify_pending = False
+            self.last_notify = now
+            if self.on_update:
+                self.on_update()
+
+    def _process(self, volume, mount_point, path):
+        """Regresa los metadatos del archivo (del almacén o analizándolo), o None si ya no existe."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        rel_path = os.path.relpath(path, mount_point)
+        try:
+            metadata = self.store.get(volume, rel_path, st.st_size, st.st_mtime)
+        except sqlite3.Error:
+            metadata = None
+        if metadata is not None:
+            self.cached += 1
+            return metadata
+
+        metadata = self.parse(path, st.st_size)
+        if metadata:
+            self.parsed += 1
+        else:
+            self.failed += 1
+        try:
+            self.store.put(volume, rel_path, st.st_size, st.st_mtime, metadata)
+        except sqlite3.Error as e:
+            print(f"No se pudieron guardar los metadatos de {path}: {e}")
+        return metadata
+
+    def parse(self, path, size=None):
+        """Analiza un archivo con libvlc (sin decodificarlo). Regresa {} si no se pudo."""
+        vlc = self.vlc
+        if self.instance is None:
+            self.instance = vlc.Instance('--quiet', '--no-video-title-show')
+        media = self.instance.media_new_path(path)
+        try:
+            if hasattr(media, 'parse_with_options'):
+                media.parse_with_options(vlc.MediaParseFlag.local, PARSE_TIMEOUT_MS)
+                deadline = time.monotonic() + PARSE_TIMEOUT_MS / 1000 + 1
+                while media.get_parsed_status() == 0 and time.monotonic() < deadline:
+                    time.sleep(0.05)
+                if media.get_parsed_status() != vlc.MediaParsedStatus.done:
+                    return {}
+            else:
+                media.parse()
+            return self._read_media(media, size)
+        finally:
+            media.release()
+
+    def _read_media(self, media, size):
+        vlc = self.vlc
+        metadata = {}
+        duration_ms = media.get_duration()
+        if duration_ms and duration_ms > 0:
+            metadata['duration'] = duration_ms / 1000
+        bitrate = 0
+        for track in media.tracks_get() or ():
+            bitrate += track.bitrate or 0
+            if track.type == vlc.TrackType.video and 'video_codec' not in metadata:
+                metadata['video_codec'] = fourcc(track.codec)
+                video = track.video.contents
+                if video.width and video.height:
+                    metadata['width'] = video.width
+                    metadata['height'] = video.height
+            elif track.type == vlc.TrackType.audio and 'audio_codec' not in metadata:
+                metadata['audio_codec'] = fourcc(track.codec)
+        # Muchos contenedores no reportan el bitrate de sus pistas: estimarlo con el tamaño
+        if not bitrate and size and metadata.get('duration'):
+            bitrate = int(size * 8 / metadata['duration'])
+        if bitrate >= 1000:
+            metadata['bitrate'] = bitrate // 1000 # kbit/s
+        for name, key in (('title', vlc.Meta.Title), ('artist', vlc.Meta.Artist), ('album', vlc.Meta.Album)):
+            value = media.get_meta(key)
+            if value:
+                metadata[name] = value
+        return {name: value for name, value in metadata.items() if value is not None}
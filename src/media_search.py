@@ -0,0 +1,329 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Índice de búsqueda por nombre de archivo (trigramas y prefijos)
+# License: MIT
+#--------------------------------------------------
+
+import os
+import re
+import sys
+import heapq
+import threading
+import unicodedata
+from array import array
+from collections import Counter, deque
+from media_library import PathList
+
+RESULT_LIMIT = 200
+# Coincidencias exactas que se ordenan por consulta: más allá de esto (p. ej. una
+# sola letra en 100k nombres) se muestran las primeras y el total como "N+"
+MAX_RANKED = 2000
+# Búsqueda aproximada: palabras del vocabulario cuyo coeficiente de Dice de
+# trigramas con el término sea al menos este
+FUZZY_MIN_SIMILARITY = 0.6
+FUZZY_MIN_TERM = 4
+# Nombres que el hilo indexador agrega por cada vez que toma el candado del índice
+INDEX_CHUNK = 256
+
+_SEPARATORS = re.compile(r'[\W_]+')
+_EMPTY = array('I')
+
+def fold(text):
+    """Normaliza para buscar: sin acentos, minúsculas y separadores como un espacio."""
+    if not text.isascii():
+        text = ''.join(c for c in unicodedata.normalize('NFKD', text) if not unicodedata.combining(c))
+    return _SEPARATORS.sub(' ', text.casefold()).strip()
+
+def trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+class SearchIndex:
+    """Índice de nombres de archivo que se actualiza por lotes.
+
+    Cada nombre (sin carpeta ni extensión, normalizado con fold) aporta sus
+    trigramas, los prefijos de una y dos letras de cada palabra y sus palabras
+    completas; las listas de identificadores crecen en orden porque los
+    nombres solo se agregan al final. Aparte se guardan los trigramas de cada
+    palabra distinta (el vocabulario) para la búsqueda aproximada. Los
+    retirados se marcan como borrados y el índice se compacta cuando son
+    mayoría.
+    """
+
+    def __init__(self):
+        self.paths = PathList()   # Rutas compactas: carpeta internada y nombre
+        self.names = []           # ' ' + nombre normalizado (el espacio marca inicio de palabra)
+        self.alive = bytearray()
+        self.dead = 0
+        self.grams = {}           # trigrama -> array de identificadores
+        self.prefixes = {}        # prefijo de 1 o 2 letras de una palabra -> array de identificadores
+        self.words = {}           # palabra completa -> array de identificadores
+        self.word_grams = {}      # trigrama -> palabras del vocabulario que lo contienen
+
+    def __len__(self):
+        return len(self.paths) - self.dead
+
+    def add(self, paths):
+        """Agrega rutas al índice (un lote del escaneo)."""
+        grams = self.grams
+        prefixes = self.prefixes
+        words = self.words
+        paths = list(paths)
+        start = len(self.paths)
+        self.paths.extend(paths)
+        for index, path in enumerate(paths, start):
+            name = fold(os.path.splitext(os.path.basename(path))[0])
+            self.names.append(' ' + name)
+            self.alive.append(1)
+            keys = set()
+            short = set()
+            for word in set(name.split()):
+                word_keys = trigrams(word)
+                keys |= word_keys
+                short.add(word[:1])
+                short.add(word[:2])
+                if word.isdigit():
+                    # Números (episodios, fechas, contadores): no tiene caso buscarlos aproximados
+                    continue
+                posting = words.get(word)
+                if posting is None:
+                    posting = words[word] = array('I')
+                    for key in word_keys:
+                        self.word_grams.setdefault(key, []).append(word)
+                posting.append(index)
+            for key in keys:
+                posting = grams.get(key)
+                if posting is None:
+                    posting = grams[key] = array('I')
+                posting.append(index)
+            for key in short:
+                posting = prefixes.get(key)
+                if posting is None:
+                    posting = prefixes[key] = array('I')
+                posting.append(index)
+
+    def remove_under(self, mount_point, compact=True):
+        """Marca como borradas las rutas de un volumen retirado."""
+        for index in self.paths.indices_under(mount_point):
+            if self.alive[index]:
+                self.alive[index] = 0
+                self.dead += 1
+        if compact and self.needs_compaction():
+            self._compact()
+
+    def needs_compaction(self):
+        return self.dead > 0 and self.dead >= len(self)
+
+    def alive_paths(self):
+        return [path for index, path in enumerate(self.paths) if self.alive[index]]
+
+    def _compact(self):
+        paths = self.alive_paths()
+        self.__init__()
+        self.add(paths)
+
+    def _posting(self, term):
+        """Lista más corta de candidatos para un término (siempre es un superconjunto)."""
+        if len(term) < 3:
+            return self.prefixes.get(term, _EMPTY)
+        best = None
+        for key in trigrams(term):
+            posting = self.grams.get(key, _EMPTY)
+            if best is None or len(posting) < len(best):
+                best = posting
+        return best
+
+    def search(self, query, limit=RESULT_LIMIT):
+        """Regresa (rutas ordenadas por relevancia, total de coincidencias, True si el total es 'o más').
+
+        Un término de una o dos letras debe ser inicio de palabra; los más largos
+        pueden aparecer en cualquier parte. Si hay pocas coincidencias exactas se
+        completan con nombres que tienen palabras parecidas a los términos
+        (errores de dedo).
+        """
+        terms = fold(query).split()
+        if not terms:
+            return [], 0, False
+        needles = [' ' + term if len(term) < 3 else term for term in terms]
+        postings = sorted((self._posting(term) for term in terms), key=len)
+        candidates = postings[0]
+        if len(postings) > 1 and len(candidates) > MAX_RANKED:
+            # Varias palabras comunes: intersecar las dos listas más cortas (en C) antes de verificar
+            candidates = sorted(set(candidates).intersection(postings[1]))
+
+        names = self.names
+        alive = self.alive
+        matches = []
+        more = False
+        for index in candidates:
+            name = names[index]
+            if alive[index] and all([needle in name for needle in needles]):
+                matches.append(index)
+                if len(matches) >= MAX_RANKED:
+                    more = True
+                    break
+
+        # Primero los que empiezan con la consulta, luego los que la tienen al inicio
+        # de una palabra; a igualdad, los nombres más cortos
+        first = ' ' + terms[0]
+        word_needles = [' ' + term for term in terms]
+        def rank(index):
+            name = names[index]
+            if name.startswith(first):
+                tier = 0
+            elif all([needle in name for needle in word_needles]):
+                tier = 1
+            else:
+                tier = 2
+            return tier, len(name), index
+        ranked = heapq.nsmallest(limit, matches, key=rank)
+        total = len(matches)
+
+        if len(ranked) < limit and not more:
+            fuzzy = self._fuzzy(terms, set(matches), limit - len(ranked))
+            ranked.extend(fuzzy)
+            total += len(fuzzy)
+        return [self.paths[index] for index in ranked], total, more
+
+    def _similar_words(self, term):
+        """Palabras del vocabulario parecidas al término (coeficiente de Dice de trigramas)."""
+        keys = trigrams(term)
+        counts = Counter()
+        for key in keys:
+            counts.update(self.word_grams.get(key, ()))
+        similar = []
+        for word, common in counts.items():
+            similarity = 2 * common / (len(keys) + max(1, len(word) - 2))
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                similar.append((similarity, word))
+        return similar
+
+    def _fuzzy(self, terms, exclude, limit):
+        """Nombres con palabras parecidas a los términos largos (errores de dedo); los cortos y los números deben coincidir."""
+        scores = None
+        needles = []
+        for term in terms:
+            if len(term) < FUZZY_MIN_TERM or term.isdigit():
+                needles.append(' ' + term if len(term) < 3 else term)
+                continue
+            term_scores = {}
+            for similarity, word in sorted(self._similar_words(term), reverse=True):
+                # Las palabras más parecidas primero; las ya vistas conservan su puntaje. Como
+                # en la búsqueda exacta, de una palabra muy común solo cuentan las primeras
+                term_scores = {**dict.fromkeys(self.words[word][:MAX_RANKED], similarity), **term_scores}
+                if len(term_scores) >= MAX_RANKED:
+                    break
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {index: score + term_scores[index] for index, score in scores.items() if index in term_scores}
+        if not scores:
+            return []
+        names = self.names
+        alive = self.alive
+        found = [(-score, len(names[index]), index) for index, score in scores.items()
+                 if alive[index] and index not in exclude and all([needle in names[index] for needle in needles])]
+        return [index for _, _, index in heapq.nsmallest(limit, found)]
+
+    def memory_bytes(self):
+        """Memoria aproximada del índice, incluidas sus rutas compactas."""
+        total = self.paths.nbytes() + self.paths.dirs.nbytes() + sys.getsizeof(self.names) + sys.getsizeof(self.alive)
+        total += sum(sys.getsizeof(name) for name in self.names)
+        for table in (self.grams, self.prefixes, self.words, self.word_grams):
+            total += sys.getsizeof(table)
+            total += sum(sys.getsizeof(key) + sys.getsizeof(posting) for key, posting in table.items())
+        return total
+
+class SearchIndexer:
+    """Mantiene un SearchIndex desde un hilo propio para no detener la GUI.
+
+    add(), remove_under() y measure() solo encolan el trabajo, que se hace en
+    orden. Los nombres se agregan en tramos de INDEX_CHUNK y el candado del
+    índice se toma por tramo, así que search() espera a lo más un tramo. La
+    compactación arma un índice nuevo fuera del candado y lo intercambia al
+    final. `version` aumenta con cada cambio visible en las búsquedas;
+    on_update(kind) se llama desde el hilo con kind 'indexed' o 'measured'.
+    """
+
+    def __init__(self, on_update=None, chunk=INDEX_CHUNK):
+        self.on_update = on_update
+        self.chunk = chunk
+        self.index = SearchIndex()
+        self.index_lock = threading.Lock() # Solo el hilo modifica el índice; lo toma para no cruzarse con search()
+        self.lock = threading.Condition()
+        self.jobs = deque()                # ('add', rutas) | ('remove', punto de montaje) | ('measure', None)
+        self.busy = False
+        self.thread = None
+        self.version = 0
+        self.memory = 0                    # Bytes del índice en la última medición
+
+    def __len__(self):
+        return len(self.index)
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def _enqueue(self, job):
+        with self.lock:
+            self.jobs.append(job)
+            self.lock.notify()
+        self.start()
+
+    def add(self, paths):
+        """Encola rutas para indexar (un lote del escaneo)."""
+        self._enqueue(('add', list(paths)))
+
+    def remove_under(self, mount_point):
+        """Encola el retiro de las rutas de un volumen."""
+        self._enqueue(('remove', mount_point))
+
+    def measure(self):
+        """Encola la medición de memoria del índice; el resultado queda en `memory`."""
+        self._enqueue(('measure', None))
+
+    def pending(self):
+        """True mientras quede trabajo en cola o en curso."""
+        with self.lock:
+            return self.busy or bool(self.jobs)
+
+    def search(self, query, limit=RESULT_LIMIT):
+        with self.index_lock:
+            return self.index.search(query, limit)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while not self.jobs:
+                    self.busy = False
+                    self.lock.wait()
+                kind, argument = self.jobs.popleft()
+                self.busy = True
+
+            if kind == 'add':
+                for start in range(0, len(argument), self.chunk):
+                    with self.index_lock:
+                        self.index.add(argument[start:start + self.chunk])
+                        self.version += 1
+            elif kind == 'remove':
+                with self.index_lock:
+                    self.index.remove_under(argument, compact=False)
+                    self.version += 1
+                if self.index.needs_compaction():
+                    self._compact()
+            else:
+                # Solo este hilo modifica el índice: se puede recorrer sin el candado
+                self.memory = self.index.memory_bytes()
+            if self.on_update:
+                self.on_update('measured' if kind == 'measure' else 'indexed')
+
+    def _compact(self):
+        paths = self.index.alive_paths()
+        index = SearchIndex()
+        for start in range(0, len(paths), self.chunk):
+            index.add(paths[start:start + self.chunk])
+        with self.index_lock:
+            self.index = index
+            self.version += 1
@@ -0,0 +1,220 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Métricas de rendimiento (contadores, medidores e histogramas)
+# License: MIT
+#--------------------------------------------------
+
+import os
+import time
+import bisect
+import threading
+import functools
+
+# Límites superiores (en segundos) de las cubetas de los histogramas; 16 y 33 ms
+# corresponden a un cuadro a 60 y 30 FPS
+DEFAULT_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.016, 0.033, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+EXPORT_INTERVAL_S = 10.0
+
+# Con las métricas apagadas cada punto de medición cuesta una consulta a esta variable
+enabled = False
+
+def _labels_key(labels):
+    return tuple(sorted(labels.items()))
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+class Histogram:
+    """Histograma acumulativo con cubetas fijas, como los de Prometheus."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # La última cubeta es +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Estimación del cuantil q (0..1): el límite de la cubeta donde cae."""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+class Registry:
+    """Contadores, medidores e histogramas con etiquetas; seguro entre hilos."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}   # (nombre, etiquetas) -> valor
+        self.gauges = {}
+        self.histograms = {}
+
+    def inc(self, name, value=1, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name, value, **labels):
+        with self.lock:
+            self.gauges[(name, _labels_key(labels))] = value
+
+    def observe(self, name, value, **labels):
+        key = (name, _labels_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def histogram(self, name, **labels):
+        return self.histograms.get((name, _labels_key(labels)))
+
+    def render(self):
+        """Texto en el formato de exposición de Prometheus."""
+        lines = []
+        with self.lock:
+            for kind, table in (('counter', self.counters), ('gauge', self.gauges)):
+                typed = set()
+                for (name, key), value in sorted(table.items()):
+                    if name not in typed:
+                        lines.append(f"# TYPE {name} {kind}")
+                        typed.add(name)
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            typed = set()
+            for (name, key), histogram in sorted(self.histograms.items()):
+                if name not in typed:
+                    lines.append(f"# TYPE {name} histogram")
+                    typed.add(name)
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum:.6f}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path):
+        """Escribe las métricas en un archivo de forma atómica."""
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "w") as f:
+                f.write(self.render())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"No se pudieron escribir las métricas en {path}: {e}")
+
+registry = Registry()
+
+def enable(on=True):
+    global enabled
+    enabled = on
+
+def inc(name, value=1, **labels):
+    if enabled:
+        registry.inc(name, value, **labels)
+
+def set_gauge(name, value, **labels):
+    if enabled:
+        registry.set_gauge(name, value, **labels)
+
+def observe(name, value, **labels):
+    if enabled:
+        registry.observe(name, value, **labels)
+
+class _Timer:
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        registry.observe(self.name, time.perf_counter() - self.start, **self.labels)
+        return False
+
+class _NullTimer:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NULL_TIMER = _NullTimer()
+
+def timer(name, **labels):
+    """Administrador de contexto que registra la duración del bloque en el histograma name."""
+    if not enabled:
+        return _NULL_TIMER
+    return _Timer(name, labels)
+
+def timed(name, **labels):
+    """Decorador: registra la duración de cada llamada a la función."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                registry.observe(name, time.perf_counter() - start, **labels)
+        return wrapper
+    return decorator
+
+def start_exporter(path=None, port=None, interval=EXPORT_INTERVAL_S):
+    """Publica las métricas: archivo reescrito cada interval segundos y/o HTTP local en /metrics."""
+    if path:
+        def write_loop():
+            while True:
+                time.sleep(interval)
+                registry.write_textfile(path)
+        threading.Thread(target=write_loop, daemon=True).start()
+    if port:
+        # Solo se importa si se pide el servidor
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path != '/metrics':
+                    self.send_error(404)
+                    return
+                body = registry.render().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer(('127.0.0.1', port), MetricsHandler)
+        except OSError as e:
+            print(f"No se pudo abrir el puerto de métricas {port}: {e}")
+            return
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"Métricas en http://127.0.0.1:{port}/metrics")
@@ -0,0 +1,180 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Tabla de montajes leída de /proc/self/mountinfo
+# License: MIT
+#--------------------------------------------------
+
+import os
+import re
+import select
+import threading
+import time
+
+MOUNTINFO_PATH = '/proc/self/mountinfo'
+DEFAULT_MOUNT_TIMEOUT_S = 10.0
+# Para archivos normales (p. ej. un mountinfo de prueba) los cambios se
+# detectan por mtime/tamaño cada este intervalo
+FILE_POLL_S = 0.05
+
+_OCTAL_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+def unescape(field):
+    """Decodifica los escapes octales del kernel (\\040 es un espacio)."""
+    return _OCTAL_ESCAPE.sub(lambda match: chr(int(match.group(1), 8)), field)
+
+def parse_mountinfo(text):
+    """Convierte el contenido de un mountinfo en una lista de diccionarios.
+
+    Formato de cada línea (proc(5)):
+    id padre mayor:menor raíz punto_de_montaje opciones [campos opcionales...] - tipo origen opciones_sb
+    """
+    entries = []
+    for line in text.splitlines():
+        fields = line.split()
+        try:
+            separator = fields.index('-', 6)
+        except ValueError:
+            continue
+        if len(fields) < separator + 3:
+            continue
+        entries.append({
+            'mount_id': int(fields[0]),
+            'device_number': fields[2],
+            'root': unescape(fields[3]),
+            'mount_point': unescape(fields[4]),
+            'options': fields[5],
+            'fstype': fields[separator + 1],
+            'source': unescape(fields[separator + 2]),
+        })
+    return entries
+
+class MountTable:
+    """Caché de la tabla de montajes con resolución dispositivo -> punto de montaje.
+
+    En /proc el kernel marca el descriptor de mountinfo con POLLPRI cuando
+    cambia la tabla, así que la tabla solo se vuelve a leer cuando algo se
+    montó o desmontó; consultar un dispositivo es una búsqueda en diccionario.
+    """
+
+    def __init__(self, path=MOUNTINFO_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.fd = None
+        self.poller = None
+        self.file_signature = None
+        self.entries = []
+        self.by_source = {}
+        self.by_device_number = {}
+        self.loaded = False
+
+    def _open(self):
+        self.fd = os.open(self.path, os.O_RDONLY)
+        # Los archivos de /proc se reportan como archivos normales: distinguirlos por
+        # el sistema de archivos en que viven
+        try:
+            on_proc = os.fstat(self.fd).st_dev == os.stat('/proc').st_dev
+        except OSError:
+            on_proc = False
+        if not on_proc:
+            return
+        self.poller = select.poll()
+        self.poller.register(self.fd, select.POLLPRI | select.POLLERR)
+
+    def _read(self):
+        # Leer desde el inicio; en /proc esto también limpia el aviso de cambio
+        os.lseek(self.fd, 0, os.SEEK_SET)
+        chunks = []
+        while True:
+            chunk = os.read(self.fd, 65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+        return b''.join(chunks).decode('utf-8', 'surrogateescape')
+
+    def _file_signature(self):
+        st = os.stat(self.path)
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def _changed(self, timeout):
+        """Espera hasta timeout segundos a que cambie la tabla. Regresa True si cambió."""
+        if self.poller is not None:
+            return bool(self.poller.poll(max(0, int(timeout * 1000))))
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if self._file_signature() != self.file_signature:
+                    return True
+            except OSError:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(FILE_POLL_S, remaining))
+
+    def _load(self):
+        if self.poller is None:
+            try:
+                self.file_signature = self._file_signature()
+            except OSError:
+                self.file_signature = None
+            # Un archivo reemplazado (os.replace) tiene otro inodo: reabrir
+            os.close(self.fd)
+            self.fd = os.open(self.path, os.O_RDONLY)
+        self.entries = parse_mountinfo(self._read())
+        by_source = {}
+        by_device_number = {}
+        for entry in self.entries:
+            # Con montajes bind repetidos, gana el primero que monta la raíz del sistema de archivos
+            if entry['root'] == '/':
+                by_source.setdefault(entry['source'], entry['mount_point'])
+                by_device_number.setdefault(entry['device_number'], entry['mount_point'])
+        self.by_source = by_source
+        self.by_device_number = by_device_number
+        self.loaded = True
+
+    def refresh(self, timeout=0):
+        """Vuelve a leer la tabla si cambió (esperando hasta timeout segundos)."""
+        with self.lock:
+            if self.fd is None:
+                self._open()
+            if not self.loaded:
+                self._load()
+                return True
+        # La espera va fuera del candado para no frenar las consultas de otros hilos
+        if not self._changed(timeout):
+            return False
+        with self.lock:
+            self._load()
+        return True
+
+    def mount_point(self, device_path):
+        """Regresa el punto de montaje de un dispositivo de bloque, o None."""
+        self.refresh()
+        mount_point = self.by_source.get(device_path)
+        if mount_point is not None:
+            return mount_point
+        # Por número de dispositivo: cubre enlaces como /dev/disk/by-uuid/...
+        try:
+            rdev = os.stat(device_path).st_rdev
+        except OSError:
+            return None
+        if not rdev:
+            return None
+        return self.by_device_number.get(f"{os.major(rdev)}:{os.minor(rdev)}")
+
+    def wait_for_mount(self, device_path, timeout=DEFAULT_MOUNT_TIMEOUT_S, cancel=None):
+        """Espera a que el dispositivo aparezca montado, despertando con cada cambio de la tabla.
+
+        cancel es un threading.Event opcional; se revisa al menos cada medio segundo.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            mount_point = self.mount_point(device_path)
+            if mount_point is not None:
+                return mount_point
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or (cancel is not None and cancel.is_set()):
+                return None
+            self.refresh(min(remaining, 0.5))
@@ -0,0 +1,250 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Motor de reproducción con libvlc dentro del proceso
+# License: MIT
+#--------------------------------------------------
+
+import time
+from collections.abc import Sequence
+
+# Contadores de libvlc (libvlc_media_stats_t) que se conservan de cada elemento
+STAT_FIELDS = ('decoded_video', 'displayed_pictures', 'lost_pictures', 'decoded_audio', 'lost_abuffers',
+               'input_bitrate', 'demux_bitrate', 'demux_corrupted', 'demux_discontinuity')
+PLAY_FIRST_ITEMS = 8   # Elementos que play() crea de inmediato; el resto llega con append_available()
+APPEND_CHUNK = 256     # Elementos por llamada a append_available() (una por vuelta del bucle principal)
+
+class PlaybackEngine:
+    """Reproductor basado en una sola instancia de libvlc reutilizada entre medios.
+
+    Usa un MediaListPlayer con listas nativas de libvlc (sin archivos .m3u)
+    y dibuja el video dentro de la ventana de Pygame. Los eventos de libvlc
+    llegan en hilos internos de VLC, por lo que solo se reenvían mediante
+    on_event(tipo, **datos); nunca se llama a libvlc desde esos hilos.
+
+    Eventos: 'first_frame' (ttff en segundos), 'ended' (fin de la lista sin
+    bucle) y 'error'.
+
+    Si se da un prefetcher (prefetch.ReadAheadPrefetcher), al empezar cada
+    elemento se le pide leer por adelantado el siguiente de la lista.
+
+    Si se da options_for(ruta), regresa (etiqueta, opciones): las opciones se
+    agregan al medio y la etiqueta acompaña a sus estadísticas. sample_stats()
+    (desde el hilo principal) lee los contadores del elemento actual; cuando el
+    elemento cambia o se detiene la reproducción, la última lectura queda en
+    take_finished() como (ruta, etiqueta, estadísticas).
+
+    Crear cada medio (media_new_path, add_option, options_for) cuesta
+    llamadas a libvlc, así que play() solo crea los primeros elementos y el
+    hilo principal agrega el resto por partes con append_available()
+    mientras pending_items() sea mayor que cero.
+    """
+
+    def __init__(self, vlc_module, on_event, window_id=None, instance_args=None, prefetcher=None, options_for=None):
+        self.vlc = vlc_module
+        self.on_event = on_event
+        self.prefetcher = prefetcher
+        self.options_for = options_for
+        self.instance = vlc_module.Instance(instance_args or ['--no-video-title-show', '--no-osd'])
+        self.player = self.instance.media_player_new()
+        if window_id:
+            self.player.set_xwindow(window_id)
+        # El teclado y el ratón se quedan con Pygame (ESC para detener)
+        self.player.video_set_key_input(False)
+        self.player.video_set_mouse_input(False)
+        self.list_player = self.instance.media_list_player_new()
+        self.list_player.set_media_player(self.player)
+        self.media_list = None
+        self.paths = []
+        self.loop = False
+        self.position = -1
+        self.active = False
+        self.item_started = None
+        self.first_frame_pending = False
+        self.ttff_samples = [] # Tiempos al primer cuadro, en segundos
+        self.stalls = 0        # Veces que el búfer se vació después del primer cuadro
+        self.buffering = False
+        self.medias = []
+        self.item_tags = []
+        self.image_duration = 0
+        self.item_serial = 0   # Aumenta con cada elemento que empieza (también al repetir en bucle)
+        self.sampled = None    # (serie, ruta, etiqueta, estadísticas) de la última lectura
+        self.finished = []
+
+        event_type = vlc_module.EventType
+        player_events = self.player.event_manager()
+        player_events.event_attach(event_type.MediaPlayerVout, self._on_vout)
+        player_events.event_attach(event_type.MediaPlayerEndReached, self._on_end_reached)
+        player_events.event_attach(event_type.MediaPlayerEncounteredError, self._on_error)
+        player_events.event_attach(event_type.MediaPlayerBuffering, self._on_buffering)
+        self.list_player.event_manager().event_attach(event_type.MediaListPlayerNextItemSet, self._on_next_item)
+
+    def play(self, paths, loop=False, image_duration=0, start_index=0):
+        """Reproduce una lista de archivos, opcionalmente en bucle."""
+        # Las vistas de la biblioteca arman cada ruta al pedirla: no se copian
+        if not isinstance(paths, Sequence):
+            paths = list(paths)
+        media_list = self.instance.media_list_new()
+        medias = []
+        tags = []
+        self.image_duration = image_duration
+        for index in range(min(len(paths), start_index + PLAY_FIRST_ITEMS)):
+            media, tag = self._new_media(paths[index])
+            media_list.add_media(media)
+            medias.append(media)
+            tags.append(tag)
+
+        self.sample_stats()
+        self._finish_item()
+        self.list_player.stop()
+        self.media_list = media_list
+        self.medias = medias
+        self.item_tags = tags
+        self.paths = paths
+        self.loop = loop
+        self.position = start_index - 1
+        self.active = True
+        self.list_player.set_media_list(media_list)
+        self.list_player.set_playback_mode(self.vlc.PlaybackMode.loop if loop else self.vlc.PlaybackMode.default)
+        self.item_started = time.monotonic()
+        self.first_frame_pending = True
+        self.list_player.play_item_at_index(start_index)
+
+    def _new_media(self, path):
+        media = self.instance.media_new_path(path)
+        if self.image_duration > 0:
+            media.add_option(f':image-duration={self.image_duration}')
+        tag = None
+        if self.options_for is not None:
+            tag, options = self.options_for(path)
+            for option in options:
+                media.add_option(option)
+        return media, tag
+
+    def pending_items(self):
+        """Rutas que aún no están en la lista de libvlc."""
+        return len(self.paths) - len(self.medias) if self.active else 0
+
+    def append_available(self, limit=APPEND_CHUNK):
+        """Agrega a la lista en reproducción hasta `limit` rutas que aún no están en ella.
+
+        Son las que play() dejó para después y las que el escaneo agrega a una
+        vista de la biblioteca que se está reproduciendo. Regresa cuántas agregó.
+        """
+        if not self.active or len(self.paths) <= len(self.medias):
+            return 0
+        added = 0
+        self.media_list.lock()
+        try:
+            for index in range(len(self.medias), min(len(self.paths), len(self.medias) + limit)):
+                media, tag = self._new_media(self.paths[index])
+                self.media_list.add_media(media)
+                self.medias.append(media)
+                self.item_tags.append(tag)
+                added += 1
+        finally:
+            self.media_list.unlock()
+        return added
+
+    def stop(self):
+        # Última lectura antes de detener: libvlc reinicia los contadores con el medio
+        self.sample_stats()
+        self._finish_item()
+        if self.active:
+            self.active = False
+            self.list_player.stop()
+        if self.prefetcher is not None:
+            self.prefetcher.cancel()
+
+    def is_active(self):
+        return self.active
+
+    def has_video(self):
+        """True si libvlc está dibujando video en la ventana."""
+        return self.active and self.player.has_vout() > 0
+
+    def current_path(self):
+        if 0 <= self.position < len(self.medias):
+            return self.paths[self.position]
+        return None
+
+    def next_path(self):
+        """Ruta del elemento que sigue al actual, o None al final de una lista sin bucle."""
+        if not self.medias:
+            return None
+        following = self.position + 1
+        if following >= len(self.medias):
+            if not self.loop:
+                return None
+            following = 0
+        return self.paths[following]
+
+    def sample_stats(self):
+        """Lee los contadores de libvlc del elemento actual. Regresa el diccionario o None."""
+        position = self.position
+        if not self.active or not 0 <= position < len(self.medias):
+            return None
+        serial = self.item_serial
+        stats = self.vlc.MediaStats()
+        if not self.medias[position].get_stats(stats):
+            return None
+        values = {name: getattr(stats, name) for name in STAT_FIELDS}
+        if self.sampled is not None and self.sampled[0] != serial:
+            self._finish_item()
+        self.sampled = (serial, self.paths[position], self.item_tags[position], values)
+        return values
+
+    def _finish_item(self):
+        if self.sampled is not None:
+            self.finished.append(self.sampled[1:])
+            self.sampled = None
+
+    def take_finished(self):
+        """Regresa y limpia las estadísticas finales de los elementos que terminaron."""
+        finished = self.finished
+        self.finished = []
+        return finished
+
+    def average_ttff(self):
+        if not self.ttff_samples:
+            return None
+        return sum(self.ttff_samples) / len(self.ttff_samples)
+
+    # --- Callbacks de libvlc (hilos de VLC) ---
+    def _on_next_item(self, event):
+        # Posiciones sobre la lista de libvlc: la secuencia de rutas puede ir más adelante
+        if self.medias:
+            self.position = (self.position + 1) % len(self.medias)
+        self.item_serial += 1
+        self.item_started = time.monotonic()
+        self.first_frame_pending = True
+        self.buffering = False
+        if self.prefetcher is not None:
+            following = self.next_path()
+            if following is not None and following != self.current_path():
+                self.prefetcher.prefetch(following)
+
+    def _on_vout(self, event):
+        if self.first_frame_pending and self.item_started is not None:
+            self.first_frame_pending = False
+            ttff = time.monotonic() - self.item_started
+            self.ttff_samples.append(ttff)
+            self.on_event('first_frame', ttff=ttff, path=self.current_path())
+
+    def _on_end_reached(self, event):
+        if not self.loop and self.position >= len(self.medias) - 1:
+            self.active = False
+            self.on_event('ended')
+
+    def _on_buffering(self, event):
+        # Solo cuenta como atasco si ocurre ya mostrando el elemento, no al abrirlo
+        cache = event.u.new_cache
+        if cache < 100 and not self.first_frame_pending and not self.buffering:
+            self.buffering = True
+            self.stalls += 1
+        elif cache >= 100:
+            self.buffering = False
+
+    def _on_error(self, event):
+        self.on_event('error', path=self.current_path())
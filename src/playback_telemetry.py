@@ -0,0 +1,144 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Historial de calidad de reproducción y elección adaptativa del decodificador
+# License: MIT
+#--------------------------------------------------
+
+import os
+import json
+
+# Perfiles de decodificación, del más fiel al más barato. Cada reproducción con
+# demasiados cuadros perdidos sube un nivel para ese archivo (y, en promedio,
+# para su códec y resolución). El nivel 0 es lo que elige libvlc (avcodec, que
+# ya intenta la aceleración por hardware que detecte); desde el 1 se fuerza el
+# decodificador de hardware de la Pi: MMAL (nombres del módulo en VLC oficial y
+# en el de Raspberry Pi OS; los que no existen se ignoran) o, si cae en avcodec,
+# su aceleración por DRM/V4L2.
+PI_HW_DECODER = [':codec=mmal_codec,mmal_decoder,any', ':avcodec-hw=drm']
+DECODER_LEVELS = (
+    [],                                   # 0: elección de libvlc
+    PI_HW_DECODER,                        # 1: decodificador de hardware de la Pi
+    PI_HW_DECODER + [                     # 2: además, omitir el filtro de bloques
+        ':avcodec-skiploopfilter=4'],
+    PI_HW_DECODER + [                     # 3: además, desentrelazado barato y
+        ':avcodec-skiploopfilter=4',      #    omitir cuadros no referenciados
+        ':deinterlace-mode=discard',
+        ':avcodec-skip-frame=1'],
+)
+DROP_BAD = 0.05      # Más de 5% de cuadros perdidos: subir de nivel
+MIN_FRAMES = 150     # Reproducciones más cortas (~5 s) no cuentan
+CODEC_SMOOTHING = 0.3
+
+TELEMETRY_VERSION = 2 # 2: el nivel 1 dejó de ser igual al 0
+
+def drop_ratio(stats):
+    """Fracción de cuadros decodificados que no llegaron a mostrarse."""
+    decoded = stats.get('decoded_video') or 0
+    if decoded <= 0:
+        return None
+    lost = stats.get('lost_pictures') or 0
+    displayed = stats.get('displayed_pictures') or 0
+    # Algunos módulos de salida no cuentan lost_pictures: usar también decodificados - mostrados
+    return min(1.0, max(lost, decoded - displayed, 0) / decoded)
+
+def codec_key(codec, height):
+    """Agrupa por códec y resolución aproximada, p. ej. 'hevc@1080'."""
+    if not codec:
+        return None
+    if not height:
+        return codec
+    for limit in (480, 720, 1080, 2160):
+        if height <= limit:
+            return f"{codec}@{limit}"
+    return f"{codec}@{height}"
+
+class PlaybackTelemetry:
+    """Guarda, por archivo y por códec, cómo se reprodujo y qué nivel de decodificación conviene.
+
+    El historial es un JSON pequeño; se reescribe (de forma atómica) con
+    cada reproducción registrada.
+    """
+
+    def __init__(self, path, levels=DECODER_LEVELS):
+        self.path = path
+        self.levels = levels
+        self.files = {}   # ruta -> {'level', 'plays', 'drop', 'size'}
+        self.codecs = {}  # códec@altura -> {'level', 'plays', 'drop'}
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if data.get('version') != TELEMETRY_VERSION:
+            return False
+        self.files = data.get('files', {})
+        self.codecs = data.get('codecs', {})
+        return True
+
+    def save(self):
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump({'version': TELEMETRY_VERSION, 'files': self.files, 'codecs': self.codecs},
+                          f, separators=(',', ':'))
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            print(f"No se pudo guardar la telemetría de reproducción: {e}")
+
+    def choose_level(self, path, size=None, codec=None, height=None):
+        """Nivel para la siguiente reproducción: el del archivo si se conoce, si no el de su códec."""
+        entry = self.files.get(path)
+        if entry is not None and entry.get('size') == size:
+            return entry['level']
+        key = codec_key(codec, height)
+        if key in self.codecs:
+            return self.codecs[key]['level']
+        return 0
+
+    def options_for(self, path, size=None, codec=None, height=None):
+        """Regresa (nivel, opciones de libvlc) para reproducir el archivo."""
+        level = min(self.choose_level(path, size, codec, height), len(self.levels) - 1)
+        return level, list(self.levels[level])
+
+    def record(self, path, level, stats, size=None, codec=None, height=None):
+        """Registra una reproducción. Regresa el nivel que usará la siguiente, o None si no contó."""
+        ratio = drop_ratio(stats)
+        if ratio is None or stats.get('decoded_video', 0) < MIN_FRAMES or level is None:
+            return None
+        top = len(self.levels) - 1
+
+        entry = self.files.get(path)
+        if entry is None or entry.get('size') != size:
+            entry = {'level': level, 'plays': 0, 'drop': ratio, 'size': size}
+            self.files[path] = entry
+        entry['plays'] += 1
+        entry['drop'] = ratio
+        if ratio > DROP_BAD and level < top:
+            entry['level'] = level + 1
+        else:
+            entry['level'] = level
+
+        key = codec_key(codec, height)
+        if key is not None:
+            codec_entry = self.codecs.setdefault(key, {'level': 0, 'plays': 0, 'drop': None})
+            codec_entry['plays'] += 1
+            # Solo las reproducciones en el nivel actual del códec dicen algo de ese nivel
+            if level == codec_entry['level']:
+                previous = codec_entry['drop']
+                smoothed = ratio if previous is None else previous + CODEC_SMOOTHING * (ratio - previous)
+                codec_entry['drop'] = smoothed
+                if smoothed > DROP_BAD and codec_entry['level'] < top:
+                    codec_entry['level'] += 1
+                    codec_entry['drop'] = None
+        self.save()
+        return entry['level']
+
+    def summary(self):
+        """Texto con el nivel elegido por códec."""
+        return ", ".join(f"{key}: nivel {entry['level']} ({entry['plays']} repr.)"
+                         for key, entry in sorted(self.codecs.items())) or "sin datos"
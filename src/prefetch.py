@@ -0,0 +1,142 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Lectura anticipada del siguiente elemento de la lista de reproducción
+# License: MIT
+#--------------------------------------------------
+
+import os
+import threading
+import time
+
+# Presupuesto de lectura anticipada por elemento: una fracción de la RAM
+# disponible, acotada entre un mínimo y un máximo
+DEFAULT_MIN_BYTES = 8 * 1024 * 1024
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+DEFAULT_MEMORY_FRACTION = 0.05
+DEFAULT_CHUNK_BYTES = 1024 * 1024
+# Espera tras empezar un elemento antes de leer el siguiente, para no
+# competir por el bus USB mientras el reproductor llena su propio búfer
+DEFAULT_START_DELAY_S = 2.0
+# Pausa tras cada bloque, como múltiplo de lo que tardó en leerse: con 1.0 la
+# lectura anticipada ocupa como mucho la mitad del tiempo del dispositivo
+DEFAULT_PACING = 1.0
+
+def available_memory():
+    """Regresa la memoria disponible en bytes según /proc/meminfo, o None si no se puede leer."""
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+def adaptive_budget(min_bytes=DEFAULT_MIN_BYTES, max_bytes=DEFAULT_MAX_BYTES, fraction=DEFAULT_MEMORY_FRACTION):
+    """Bytes a leer por adelantado según la RAM disponible en este momento."""
+    available = available_memory()
+    if available is None:
+        return min_bytes
+    return int(max(min_bytes, min(max_bytes, available * fraction)))
+
+class ReadAheadPrefetcher:
+    """Calienta la caché de páginas con el inicio del siguiente archivo a reproducir.
+
+    Solo hay una lectura anticipada a la vez: pedir otro archivo cancela la
+    anterior. Se hace una lectura secuencial por bloques, espaciada (pacing)
+    para no quitarle ancho de banda al elemento que se está reproduciendo; un
+    posix_fadvise(WILLNEED) sobre todo el presupuesto lanzaría la lectura
+    completa de golpe en el mismo bus USB.
+    """
+
+    def __init__(self, min_bytes=DEFAULT_MIN_BYTES, max_bytes=DEFAULT_MAX_BYTES,
+                 memory_fraction=DEFAULT_MEMORY_FRACTION, chunk_size=DEFAULT_CHUNK_BYTES,
+                 start_delay=DEFAULT_START_DELAY_S, pacing=DEFAULT_PACING):
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.memory_fraction = memory_fraction
+        self.chunk_size = chunk_size
+        self.start_delay = start_delay
+        self.pacing = pacing
+        self.lock = threading.Condition()
+        self.pending = None    # (ruta, momento a partir del cual leer)
+        self.generation = 0    # Se incrementa con cada solicitud; detiene la lectura en curso
+        self.current_path = None
+        self.thread = None
+        self.prefetched_files = 0
+        self.prefetched_bytes = 0
+        self.cancelled = 0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def prefetch(self, path, delay=None):
+        """Programa la lectura anticipada de path; puede llamarse desde cualquier hilo."""
+        with self.lock:
+            if path == self.current_path and self.pending is None:
+                return
+            self.generation += 1
+            self.current_path = path
+            self.pending = (path, time.monotonic() + (self.start_delay if delay is None else delay))
+            self.lock.notify()
+
+    def cancel(self):
+        """Descarta la lectura pendiente y detiene la que esté en curso."""
+        with self.lock:
+            self.generation += 1
+            self.current_path = None
+            self.pending = None
+
+    def stats(self):
+        return {'files': self.prefetched_files, 'bytes': self.prefetched_bytes, 'cancelled': self.cancelled}
+
+    def _run(self):
+        while True:
+            with self.lock:
+                while True:
+                    if self.pending is not None:
+                        remaining = self.pending[1] - time.monotonic()
+                        if remaining <= 0:
+                            break
+                        self.lock.wait(remaining)
+                    else:
+                        self.lock.wait()
+                path = self.pending[0]
+                generation = self.generation
+                self.pending = None
+            self._warm(path, generation)
+
+    def read_chunk(self, fd, offset, length):
+        """Lee un bloque del archivo; la lectura en sí es lo que llena la caché de páginas."""
+        return len(os.pread(fd, length, offset))
+
+    def _warm(self, path, generation):
+        budget = adaptive_budget(self.min_bytes, self.max_bytes, self.memory_fraction)
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except OSError:
+            return
+        try:
+            length = min(os.fstat(fd).st_size, budget)
+            offset = 0
+            while offset < length:
+                if generation != self.generation:
+                    self.cancelled += 1
+                    return
+                started = time.monotonic()
+                read = self.read_chunk(fd, offset, min(self.chunk_size, length - offset))
+                if read <= 0:
+                    break
+                offset += read
+                if self.pacing > 0:
+                    time.sleep((time.monotonic() - started) * self.pacing)
+            self.prefetched_files += 1
+            self.prefetched_bytes += offset
+        except OSError as e:
+            print(f"No se pudo leer por adelantado {path}: {e}")
+        finally:
+            os.close(fd)
@@ -8,23 +8,51 @@
 
 
 
+# El temporizador de arranque va antes que todo para medir también las importaciones
+import startup_timing
+startup_timer = startup_timing.StartupTimer()
+
 import pygame
-import vlc
 import os
 import time
 import subprocess
-import pyudev
 import threading
 import sys
+import media_index
+import ui_scene
+import text_cache
+import usb_events
+import thumbnails
+import playback
+import prefetch
+import slideshow
+import icon_atlas
+import wifi_manager
+import mountinfo
+import media_library
+import media_metadata
+import metrics
+import playback_telemetry
+import browser_launcher
+import folder_browser
+import media_search
+import stall_watchdog
+from collections import OrderedDict
+# vlc y pyudev se importan hasta que se necesitan (reproducir, monitorear USB):
+# cargar libvlc no debe retrasar el primer cuadro
 
 # --- Inicialización y Configuración Global ---
-pygame.init()
+startup_timer.mark("importaciones")
+# Solo los subsistemas que se usan: pygame.init() también abre el audio y los joysticks
+pygame.display.init()
+pygame.font.init()
 
 # Configuración de la pantalla
 info = pygame.display.Info()
 SCREEN_WIDTH, SCREEN_HEIGHT = info.current_w, info.current_h
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.FULLSCREEN)
 pygame.display.set_caption("Centro Multimedia Raspberry Pi")
+startup_timer.mark("pygame y pantalla")
 
 # Definición de colores
 WHITE = (255, 255, 255)
@@ -41,10 +69,15 @@ font_large = pygame.font.Font(None, 74)
 font_medium = pygame.font.Font(None, 50)
 font_small = pygame.font.Font(None, 36)
 font_tiny = pygame.font.Font(None, 24)
+startup_timer.mark("fuentes")
 
-# Instancia global de VLC y variable para el proceso externo
-player = vlc.MediaPlayer()
-vlc_process = None
+# Motor de reproducción libvlc; se crea la primera vez que se reproduce algo
+playback_engine = None
+# Lectura anticipada del siguiente elemento de la lista (memorias USB lentas)
+playback_prefetcher = prefetch.ReadAheadPrefetcher()
+# Extractor de metadatos en segundo plano; se crea al terminar el primer escaneo de USB
+metadata_extractor = None
+metadata_generation = 0 # Aumenta con cada aviso de metadatos nuevos
 
 # --- Gestión de Estados de la Aplicación ---
 STATE_MAIN_MENU = 0
@@ -56,6 +89,32 @@ STATE_PLAYING_MEDIA = 5
 STATE_USB_VIDEO_SELECTION = 6
 STATE_USB_NO_MEDIA = 7
 STATE_WIFI_SUCCESS_MESSAGE = 8
+STATE_USB_PHOTO_GRID = 9
+STATE_PHOTO_SLIDESHOW = 10
+STATE_USB_FOLDER_BROWSE = 11
+STATE_USB_SEARCH = 12
+# Nombres de los estados para las métricas (etiqueta state="...")
+STATE_NAMES = {value: name[len('STATE_'):].lower() for name, value in list(globals().items()) if name.startswith('STATE_')}
+
+# Eventos propios de Pygame para despertar el bucle principal desde otros hilos
+USB_WAKE_EVENT = pygame.USEREVENT + 1     # Hay eventos nuevos en el bus de USB (o ya se ordenaron los videos)
+SUBPROCESS_EXIT_EVENT = pygame.USEREVENT + 2 # Terminó un proceso externo (Chromium)
+THUMBNAIL_EVENT = pygame.USEREVENT + 3    # Una miniatura terminó de generarse
+PLAYBACK_EVENT = pygame.USEREVENT + 4     # Evento del motor de reproducción (fin, error, primer cuadro)
+SLIDESHOW_EVENT = pygame.USEREVENT + 5    # Una foto de la presentación terminó de decodificarse
+CONNECTIVITY_EVENT = pygame.USEREVENT + 6 # Terminó la verificación de conexión a internet
+WIFI_EVENT = pygame.USEREVENT + 7         # Cambió la lista de redes o el intento de conexión Wi-Fi
+METADATA_EVENT = pygame.USEREVENT + 8     # Hay metadatos nuevos (duración, resolución, etiquetas)
+FOLDER_EVENT = pygame.USEREVENT + 9       # Se listó una carpeta o se recorrió un subárbol
+SEARCH_EVENT = pygame.USEREVENT + 10      # El índice de búsqueda cambió o terminó de medirse
+
+# Planificación del bucle principal: a 30 FPS mientras algo cambia; si no,
+# se bloquea esperando eventos con un tiempo máximo
+FPS = 30
+IDLE_WAIT_MS = 500
+PLAYING_WAIT_MS = 2000
+# Tiempo objetivo desde que arranca el proceso hasta el primer cuadro
+STARTUP_TARGET_MS = 1000
 
 # Estado inicial de la aplicación
 current_state = STATE_MAIN_MENU
@@ -63,62 +122,128 @@ running = True
 
 # --- Variables para la Detección y Contenido de USB ---
 usb_thread = None
-usb_event_queue = [] # Cola para eventos de USB
-usb_data = {
-    'mount_point': None,
-    'photos': [],
-    'music': [],
-    'videos': []
-}
+# Una biblioteca por memoria conectada; las pantallas muestran su vista combinada
+usb_library = media_library.MediaLibrary(on_orders_ready=lambda: pygame.event.post(pygame.event.Event(USB_WAKE_EVENT)))
+usb_pending_kind = None # Tipo de medio solicitado mientras el escaneo aún no lo encuentra
+# Texto de la búsqueda por nombre (el índice, search_index, se llena con los lotes del escaneo)
+search_query = ""
+
+# Directorio para cachés persistentes (índices de USB, etc.)
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "centro_multimedia")
+USB_INDEX_DIR = os.path.join(CACHE_DIR, "usb_index")
+# Metadatos extraídos con libvlc, por volumen + ruta + tamaño + mtime
+METADATA_DB = os.path.join(CACHE_DIR, "metadata.sqlite3")
+
+# Historial de calidad de reproducción (cuadros perdidos por archivo y por códec)
+TELEMETRY_FILE = os.path.join(CACHE_DIR, "playback_telemetry.json")
+playback_history = playback_telemetry.PlaybackTelemetry(TELEMETRY_FILE)
+
+# Métricas de rendimiento: CENTRO_METRICS=1 las activa desde el arranque (F3 muestra el HUD
+# y también las activa); se escriben en METRICS_FILE y, si se define CENTRO_METRICS_PORT,
+# se sirven en http://127.0.0.1:<puerto>/metrics
+METRICS_FILE = os.path.join(CACHE_DIR, "metrics.prom")
+METRICS_PORT = int(os.environ.get("CENTRO_METRICS_PORT", "0"))
+
+# Vigilancia de bloqueos: un cuadro que tarda más de CENTRO_STALL_MS (0 la desactiva) deja
+# en STALL_LOG el estado, la duración y las pilas muestreadas del hilo principal
+STALL_LOG = os.path.join(CACHE_DIR, "stalls.log")
+STALL_THRESHOLD_MS = int(os.environ.get("CENTRO_STALL_MS", stall_watchdog.STALL_THRESHOLD_S * 1000))
+
+# Chromium para los servicios de streaming: una sola instancia que se reutiliza navegando
+# por DevTools (por tuberías, sin puerto). Se lanza al abrir el primer servicio y después
+# reposa minimizada en about:blank; CENTRO_BROWSER_PREWARM=1 la lanza desde el arranque.
+# En una Pi de 1 GB el tope de memoria en reposo (CENTRO_BROWSER_MEMORY_MB) la reinicia
+# si crece de más.
+BROWSER_PROFILE_DIR = os.path.join(CACHE_DIR, "chromium")
+browser = browser_launcher.BrowserLauncher(
+    profile_dir=BROWSER_PROFILE_DIR,
+    memory_cap_mb=int(os.environ.get("CENTRO_BROWSER_MEMORY_MB", browser_launcher.MEMORY_CAP_MB)),
+    prewarm=os.environ.get("CENTRO_BROWSER_PREWARM", "0") == "1",
+    on_exit=lambda: pygame.event.post(pygame.event.Event(SUBPROCESS_EXIT_EVENT)))
+metrics.enable(os.environ.get("CENTRO_METRICS") == "1" or METRICS_PORT > 0)
+METRICS_HUD_REFRESH_S = 0.5
+metrics_hud = False # HUD de métricas visible (tecla F3)
+metrics_hud_drawn_at = 0.0
+# Hilos para listar directorios del USB en paralelo (la lectura está limitada por latencia)
+USB_SCAN_WORKERS = int(os.environ.get("CENTRO_SCAN_WORKERS", media_index.DEFAULT_SCAN_WORKERS))
+
+# Orden de la lista de videos: 'scan' (orden de escaneo), 'name', 'size' o 'mtime'
+VIDEO_SORT_LABELS = {'scan': "Escaneo", 'name': "Nombre", 'size': "Tamaño", 'mtime': "Fecha"}
+video_sort_key = 'scan'
+
+# Vista de la selección de videos: 'list' (nombres) o 'grid' (miniaturas)
+video_view = 'list'
+
+# --- Exploración por carpetas ---
+folder_cache = None       # folder_browser.FolderBrowser; se crea al abrir la exploración
+browse_path = None        # Carpeta mostrada, o None para la lista de memorias
+browse_walk_path = None   # Carpeta cuya lista de reproducción se está armando
+folder_generation = 0     # Aumenta cuando cambia un listado de la carpeta mostrada
+
+# --- Miniaturas ---
+THUMBNAIL_DIR = os.path.join(CACHE_DIR, "thumbnails")
+THUMBNAIL_CACHE_BYTES = 200 * 1024 * 1024 # Tamaño máximo de la caché de miniaturas en disco
+THUMBNAIL_SIZE = (220, 140)
+THUMBNAIL_CELL = (240, 200)               # Celda de la cuadrícula (miniatura + nombre)
+THUMBNAIL_MEMORY_ITEMS = 256              # Miniaturas cargadas en memoria como superficies
+thumbnail_surfaces = OrderedDict()        # ruta del medio -> superficie (LRU)
+thumbnail_failed = set()                  # Medios cuya miniatura no se pudo generar
+
+# --- Presentación de fotos ---
+SLIDESHOW_SECONDS = 3.0
+SLIDESHOW_DECODE_AHEAD = 3                # Fotos decodificadas y escaladas por adelantado
+slide_decoder = None                      # Se crea con la primera presentación
+photo_slideshow = None                    # Presentación en curso (slideshow.Slideshow)
+slideshow_return_state = STATE_USB_PHOTO_GRID # Pantalla a la que se regresa al terminar
 
 # --- Variables para la Configuración de Wi-Fi ---
 wifi_ssid_input = ""
 wifi_password_input = ""
 active_input_field = None # Campo de entrada activo ('ssid' o 'password')
+# Dos columnas: redes encontradas a la izquierda, campos y botones a la derecha
+WIFI_COLUMN_X = SCREEN_WIDTH // 2 + 25
+WIFI_COLUMN_WIDTH = SCREEN_WIDTH // 2 - 75
+WIFI_LIST_RECT = pygame.Rect(50, 200, SCREEN_WIDTH // 2 - 75, SCREEN_HEIGHT - 330)
+WIFI_SSID_RECT = pygame.Rect(WIFI_COLUMN_X, 250, WIFI_COLUMN_WIDTH, 60)
+WIFI_PASS_RECT = pygame.Rect(WIFI_COLUMN_X, 350, WIFI_COLUMN_WIDTH, 60)
+WIFI_SUCCESS_SECONDS = 2.0
+wifi_success_until = None # Momento en que el mensaje de conexión exitosa regresa al menú
+
+# Escenas de la GUI en caché por estado: estado -> (firma de datos, escena)
+ui_scenes = {}
+pending_click_pos = None # Posición del clic izquierdo recibido en este cuadro
 
 # --- Carga y Escalado de Íconos ---
 ICON_PATH = "icons/"
-icons = {}
+ICON_CACHE_DIR = os.path.join(CACHE_DIR, "icons")
+# Lado en píxeles de cada icono (nombre del PNG sin extensión)
+ICON_SIZES = {
+    'netflix': 100, 'disneyplus': 100, 'primevideo': 100, 'spotify': 100, 'applemusic': 100, 'usb': 100,
+    'videos_logo': 120, 'imagenes_logo': 120, 'music_logo': 120,
+    'back_arrow': 60,
+    'wifi_logo': 60,
+}
 try:
-    # Carga de iconos individuales
-    icons['netflix'] = pygame.image.load(os.path.join(ICON_PATH, 'netflix.png')).convert_alpha()
-    icons['disneyplus'] = pygame.image.load(os.path.join(ICON_PATH, 'disneyplus.png')).convert_alpha()
-    icons['primevideo'] = pygame.image.load(os.path.join(ICON_PATH, 'primevideo.png')).convert_alpha()
-    icons['spotify'] = pygame.image.load(os.path.join(ICON_PATH, 'spotify.png')).convert_alpha()
-    icons['applemusic'] = pygame.image.load(os.path.join(ICON_PATH, 'applemusic.png')).convert_alpha()
-    icons['usb'] = pygame.image.load(os.path.join(ICON_PATH, 'usb.png')).convert_alpha()
-    icons['videos_logo'] = pygame.image.load(os.path.join(ICON_PATH, 'videos_logo.png')).convert_alpha()
-    icons['imagenes_logo'] = pygame.image.load(os.path.join(ICON_PATH, 'imagenes_logo.png')).convert_alpha()
-    icons['music_logo'] = pygame.image.load(os.path.join(ICON_PATH, 'music_logo.png')).convert_alpha()
-    icons['back_arrow'] = pygame.image.load(os.path.join(ICON_PATH, 'back_arrow.png')).convert_alpha()
-    icons['wifi_logo'] = pygame.image.load(os.path.join(ICON_PATH, 'wifi_logo.png')).convert_alpha()
-
-    # Definición de tamaños de iconos
-    icon_size_main = 100
-    icon_size_submenu = 120
-    icon_size_back_arrow = 60
-    icon_size_wifi = 60
-
-    # Escalado de iconos según su tipo
-    for key in icons:
-        if key == 'back_arrow':
-            icons[key] = pygame.transform.scale(icons[key], (icon_size_back_arrow, icon_size_back_arrow))
-        elif key == 'wifi_logo':
-            icons[key] = pygame.transform.scale(icons[key], (icon_size_wifi, icon_size_wifi))
-        elif key in ['videos_logo', 'imagenes_logo', 'music_logo']:
-            icons[key] = pygame.transform.scale(icons[key], (icon_size_submenu, icon_size_submenu))
-        else:
-            icons[key] = pygame.transform.scale(icons[key], (icon_size_main, icon_size_main))
-
-except pygame.error as e:
+    # Un solo atlas ya escalado, guardado en disco por resolución
+    icons = icon_atlas.load_icons(ICON_PATH, ICON_SIZES, ICON_CACHE_DIR, (SCREEN_WIDTH, SCREEN_HEIGHT))
+except (pygame.error, OSError) as e:
     print(f"Error al cargar un icono: {e}")
     print("Asegúrate de que los archivos de imagen estén en la carpeta 'icons/' y sean accesibles.")
     icons = None
+startup_timer.mark("iconos")
 
 # --- Funciones de Utilidad de la GUI ---
-def draw_text(text, font, color, surface, x, y, align_center=True):
-    """Renderiza texto en la superficie de Pygame."""
-    textobj = font.render(text, True, color)
+def edit_text(value, event):
+    """Aplica una tecla a un texto en edición: Retroceso borra y Enter termina. Regresa (texto, terminado)."""
+    if event.key == pygame.K_BACKSPACE:
+        return value[:-1], False
+    if event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+        return value, True
+    return value + event.unicode, False
+
+def draw_text(text, font, color, surface, x, y, align_center=True, volatile=False):
+    """Renderiza texto en la superficie de Pygame (usando la caché de texto)."""
+    textobj = text_cache.render_text(text, font, color, volatile=volatile)
     textrect = textobj.get_rect()
     if align_center:
         textrect.center = (x, y)
@@ -126,157 +251,261 @@ def draw_text(text, font, color, surface, x, y, align_center=True):
         textrect.topleft = (x, y)
     surface.blit(textobj, textrect)
 
-def create_button_with_icon(icon_name, rect, base_color, hover_color, text_label="", font=None, text_color=WHITE):
-    """Crea un botón con un icono y etiqueta de texto."""
-    mouse_pos = pygame.mouse.get_pos()
-    clicked = pygame.mouse.get_pressed()[0]
-    
-    current_color = base_color
-    if rect.collidepoint(mouse_pos):
-        current_color = hover_color
-        if clicked:
-            return True
-    
-    pygame.draw.rect(screen, current_color, rect, border_radius=10)
-    
-    if icons and icon_name in icons:
-        icon = icons[icon_name]
-        icon_rect = icon.get_rect(center=rect.center)
-        screen.blit(icon, icon_rect)
-    else:
-        # Si no hay icono, dibujar solo el texto
-        if font:
-            draw_text(text_label, font, text_color, screen, rect.centerx, rect.centery)
-        else:
-            draw_text(text_label, font_medium, text_color, screen, rect.centerx, rect.centery)
-
-    return False
+def create_icon_button(icon_name, rect, base_color, hover_color, text_label="", font=None, text_color=WHITE):
+    """Crea un botón con un icono; si el icono no está disponible, muestra la etiqueta de texto."""
+    icon = icons[icon_name] if icons and icon_name in icons else None
+    return ui_scene.Button(rect, base_color, hover_color, text_label, font or font_medium, icon, text_color)
 
-def create_button_text_only(text, rect, font, base_color, hover_color):
-    """Crea un botón que solo contiene texto."""
-    mouse_pos = pygame.mouse.get_pos()
-    clicked = pygame.mouse.get_pressed()[0]
-    
-    current_color = base_color
-    if rect.collidepoint(mouse_pos):
-        current_color = hover_color
-        if clicked:
-            return True
-    
-    pygame.draw.rect(screen, current_color, rect, border_radius=10)
-    draw_text(text, font, WHITE, screen, rect.centerx, rect.centery)
-    return False
+def create_back_button():
+    """Crea el botón de flecha para regresar, en la esquina superior izquierda."""
+    back_arrow_rect = pygame.Rect(20, 20, icons['back_arrow'].get_width(), icons['back_arrow'].get_height())
+    return create_icon_button('back_arrow', back_arrow_rect, DARK_BLUE, GRAY)
+
+def get_scene(state, signature, builder):
+    """Regresa la escena en caché de un estado; se reconstruye solo si cambia su firma de datos."""
+    cached = ui_scenes.get(state)
+    if cached is None or cached[0] != signature:
+        cached = (signature, builder())
+        ui_scenes[state] = cached
+    return cached[1]
+
+def show_scene(scene):
+    """Actualiza los widgets con el estado del ratón, dibuja lo que cambió y regresa el widget activado.
+
+    Un widget se activa con el evento de clic del cuadro actual (no con el
+    botón mantenido presionado), así un clic no se repite en varios cuadros.
+    """
+    global pending_click_pos
+    click_pos = pending_click_pos
+    pending_click_pos = None
+    clicked = scene.update(click_pos or pygame.mouse.get_pos(), click_pos is not None)
+    scene.render(screen)
+    return clicked
 
 # --- Lógica de Negocio ---
 def stop_current_playback():
     """Detiene cualquier reproducción de VLC activa."""
-    if player.is_playing():
-        player.stop()
-    global vlc_process
-    if vlc_process:
-        vlc_process.terminate()
-        vlc_process = None
+    if playback_engine is not None:
+        playback_engine.stop()
 
 def is_connected_to_internet():
     """Verifica la conexión a internet."""
     try:
         subprocess.check_output(['ping', '-c', '1', '8.8.8.8'], timeout=2)
         return True
-    except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
         return False
 
-def connect_to_wifi_logic(ssid, password):
-    """Intenta conectar el dispositivo a una red Wi-Fi."""
-    try:
-        # Asegurar que NetworkManager esté activo
-        subprocess.run(['sudo', 'systemctl', 'start', 'NetworkManager'], check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        time.sleep(1) 
+def start_connectivity_check():
+    """Verifica la conexión en un hilo; el resultado llega como CONNECTIVITY_EVENT."""
+    def check():
+        connected = is_connected_to_internet()
+        pygame.event.post(pygame.event.Event(CONNECTIVITY_EVENT, connected=connected))
+    threading.Thread(target=check, daemon=True).start()
 
-        subprocess.run(['sudo', 'nmcli', 'device', 'wifi', 'connect', ssid, 'password', password],
-                        check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        print(f"Conectado exitosamente a la red Wi-Fi '{ssid}'.")
-        return True
-    except subprocess.CalledProcessError as e:
-        print(f"Error al conectar: {e.stderr.decode().strip()}")
-        return False
-    except FileNotFoundError:
-        print("Error: 'nmcli' o 'systemctl' no encontrado. Asegúrese de que NetworkManager esté instalado.")
-        return False
+def on_wifi_update(kind):
+    """Despierta al bucle principal (desde los hilos de Wi-Fi) con el tipo de cambio."""
+    pygame.event.post(pygame.event.Event(WIFI_EVENT, kind=kind))
+
+# Operaciones de nmcli en segundo plano: búsqueda de redes en caché y conexión cancelable
+wifi_service = wifi_manager.WifiManager(on_wifi_update)
 
 # --- Funciones de Manejo de USB (en un hilo separado) ---
+def wake_main_loop():
+    """Despierta al bucle principal cuando hay eventos de USB pendientes."""
+    pygame.event.post(pygame.event.Event(USB_WAKE_EVENT))
+
+# Tabla de montajes en caché; solo se vuelve a leer cuando el kernel avisa un cambio
+mount_table = mountinfo.MountTable()
+MOUNT_TIMEOUT_S = 10
+
+@metrics.timed('mount_lookup_seconds')
 def get_mount_point(device_path):
     """Obtiene el punto de montaje de un dispositivo."""
     try:
-        result = subprocess.run(["findmnt", "-unl", "-S", device_path], capture_output=True, text=True, check=True)
-        return result.stdout.split(" ")[0].strip()
-    except subprocess.CalledProcessError:
+        return mount_table.mount_point(device_path)
+    except OSError as e:
+        print(f"No se pudo leer la tabla de montajes: {e}")
         return None
 
-def auto_mount(device_path):
-    """Monta automáticamente un dispositivo USB."""
+@metrics.timed('auto_mount_seconds')
+def auto_mount(device_path, cancel=None):
+    """Monta automáticamente un dispositivo USB y espera a que aparezca en la tabla de montajes."""
     try:
         subprocess.run(["udisksctl", "mount", "-b", device_path], check=True)
-        time.sleep(1)
-        return True
-    except subprocess.CalledProcessError as e:
+    except (subprocess.CalledProcessError, FileNotFoundError) as e:
         print(f"Fallo al montar {device_path}: {e}")
         return False
+    return mount_table.wait_for_mount(device_path, MOUNT_TIMEOUT_S, cancel) is not None
 
-def get_media_files(mount_point):
+def iter_media_files(mount_point, volume_key=None, cancel=None):
+    """Escanea el punto de montaje y produce los archivos multimedia por lotes.
+
+    Si se conoce la clave del volumen (UUID/etiqueta), se usa el índice
+    persistente y solo se vuelven a listar los directorios que cambiaron.
+    El escaneo se detiene si se activa `cancel`.
+    """
+    if not os.path.exists(mount_point):
+        return
+
+    start_time = time.monotonic()
+    index = media_index.MediaIndex(USB_INDEX_DIR, volume_key)
+    index.load()
+    for batch in index.iter_update(mount_point, workers=USB_SCAN_WORKERS, cancel=cancel):
+        yield batch
+    if cancel is not None and cancel.is_set():
+        return
+    index.save()
+    elapsed = time.monotonic() - start_time
+    metrics.observe('media_scan_seconds', elapsed, mode='incremental')
+    metrics.inc('media_scan_dirs_listed', index.rescanned_dirs)
+    print(f"Escaneo de {mount_point}: {index.rescanned_dirs}/{len(index.dirs)} directorios listados en {elapsed:.2f} s")
+
+@metrics.timed('media_scan_seconds', mode='full')
+def get_media_files(mount_point, volume_key=None):
     """Escanea el punto de montaje en busca de archivos multimedia."""
-    photos = []
-    music = []
-    videos = []
-    
     if not os.path.exists(mount_point):
-        return photos, music, videos
-
-    for root, _, files in os.walk(mount_point):
-        for file in files:
-            file_path = os.path.join(root, file)
-            lower_file = file.lower()
-            # Añadir archivos a las listas correspondientes
-            if lower_file.endswith(('.jpg', '.jpeg', '.png', '.gif', '.bmp')):
-                photos.append(file_path)
-            elif lower_file.endswith(('.mp3', '.wav', '.flac', '.ogg')):
-                music.append(file_path)
-            elif lower_file.endswith(('.mp4', '.avi', '.mkv', '.mov', '.webm')):
-                videos.append(file_path)
-    return photos, music, videos
-
-# --- Funciones de Reproducción (VLC externo) ---
-def play_media_vlc_external(file_path, loop=False, slideshow_duration=0):
-    """Inicia la reproducción de medios usando un proceso VLC externo."""
-    stop_current_playback()
+        return [], [], []
+    index = media_index.MediaIndex(USB_INDEX_DIR, volume_key)
+    index.load()
+    index.update(mount_point, workers=USB_SCAN_WORKERS)
+    index.save()
+    # El índice queda en preorden, igual que el recorrido con os.walk
+    return index.media_files(mount_point)
+
+# --- Funciones de Reproducción (libvlc embebido) ---
+def on_playback_event(kind, **data):
+    """Reenvía al bucle principal los eventos del motor (llegan en hilos de VLC)."""
+    pygame.event.post(pygame.event.Event(PLAYBACK_EVENT, kind=kind, **data))
+
+def get_playback_engine():
+    """Regresa el motor de reproducción, creándolo sobre la ventana de Pygame la primera vez."""
+    global playback_engine
+    if playback_engine is None:
+        import vlc
+        window_id = pygame.display.get_wm_info().get('window')
+        playback_prefetcher.start()
+        playback_history.load()
+        playback_engine = playback.PlaybackEngine(vlc, on_playback_event, window_id, prefetcher=playback_prefetcher,
+                                                  options_for=decoder_options_for)
+    return playback_engine
+
+def file_size(path):
+    try:
+        return os.stat(path).st_size
+    except OSError:
+        return None
+
+def decoder_options_for(path):
+    """Nivel y opciones de decodificación de un video según su historial (o el de su códec)."""
+    if media_index.classify_media(path) != 'videos':
+        return None, []
+    metadata = metadata_extractor.get(path) if metadata_extractor is not None else None
+    metadata = metadata or {}
+    # El tamaño distingue un archivo reemplazado en la misma ruta; solo se consulta si hay historial
+    size = file_size(path) if path in playback_history.files else None
+    return playback_history.options_for(path, size, codec=metadata.get('video_codec'), height=metadata.get('height'))
+
+def collect_playback_telemetry(state):
+    """Lee las estadísticas de libvlc mientras se reproduce y registra las de los elementos que terminaron."""
+    if playback_engine is None:
+        return
+    if state == STATE_PLAYING_MEDIA and playback_engine.is_active():
+        playback_engine.sample_stats()
+    for path, level, stats in playback_engine.take_finished():
+        metadata = (metadata_extractor.get(path) if metadata_extractor is not None else None) or {}
+        codec = metadata.get('video_codec')
+        height = metadata.get('height')
+        next_level = playback_history.record(path, level, stats, file_size(path), codec=codec, height=height)
+        if next_level is None:
+            continue
+        ratio = playback_telemetry.drop_ratio(stats)
+        print(f"Calidad de reproducción: {os.path.basename(path)} ({playback_telemetry.codec_key(codec, height) or 'códec desconocido'}), "
+              f"nivel {level}: {stats['decoded_video']} cuadros, {ratio * 100:.1f}% perdidos")
+        if next_level != level:
+            print(f"  La siguiente reproducción usará el nivel de decodificación {next_level}: {' '.join(playback_telemetry.DECODER_LEVELS[next_level])}")
+
+def media_busy():
+    """True mientras se reproduce algo: el extractor de metadatos no debe competir por el disco."""
+    return (playback_engine is not None and playback_engine.is_active()) or photo_slideshow is not None
+
+def on_metadata_update():
+    """Avisa al bucle principal (desde el hilo del extractor) que hay metadatos nuevos."""
+    pygame.event.post(pygame.event.Event(METADATA_EVENT))
+
+def get_metadata_extractor():
+    """Regresa el extractor de metadatos, creándolo (e importando vlc) la primera vez."""
+    global metadata_extractor
+    if metadata_extractor is None:
+        import vlc
+        metadata_extractor = media_metadata.MetadataExtractor(
+            vlc, media_metadata.MetadataStore(METADATA_DB), on_metadata_update, media_busy)
+        metadata_extractor.start()
+    return metadata_extractor
+
+def on_folder_update(kind, path, result):
+    """Despierta al bucle principal (desde el hilo de exploración) con un listado o un recorrido."""
+    pygame.event.post(pygame.event.Event(FOLDER_EVENT, kind=kind, path=path, result=result))
+
+def on_search_index_update(kind):
+    """Despierta al bucle principal (desde el hilo indexador) cuando el índice de búsqueda cambia."""
+    if kind == 'measured':
+        print(f"Índice de búsqueda: {len(search_index)} nombres, {search_index.memory / (1024 * 1024):.1f} MB")
+    pygame.event.post(pygame.event.Event(SEARCH_EVENT, kind=kind))
+
+# Índice de nombres de todas las memorias; se construye en su propio hilo
+search_index = media_search.SearchIndexer(on_search_index_update)
+
+def get_folder_browser():
+    """Crea el explorador de carpetas la primera vez que se usa."""
+    global folder_cache
+    if folder_cache is None:
+        folder_cache = folder_browser.FolderBrowser(on_folder_update, media_busy)
+        folder_cache.start()
+    return folder_cache
+
+def media_description(path):
+    """Duración y resolución conocidas de un archivo, o cadena vacía."""
+    if metadata_extractor is None:
+        return ""
+    metadata = metadata_extractor.get(path)
+    return media_metadata.describe(metadata) if metadata else ""
+
+def play_media_vlc(paths, loop=False):
+    """Reproduce una lista de medios con la instancia de libvlc ya cargada."""
+    print(f"Reproduciendo {len(paths)} elemento(s) con libvlc (bucle: {loop})")
+    with metrics.timer('launch_seconds', target='vlc'):
+        get_playback_engine().play(paths, loop=loop)
+    metrics.inc('launches_total', target='vlc')
 
-    vlc_cmd = ['vlc', '--fullscreen', '--no-video-title-show', '--no-osd']
-    if loop:
-        vlc_cmd.append('--loop')
-    if slideshow_duration > 0:
-        vlc_cmd.append(f'--image-duration={slideshow_duration}')
-    
-    vlc_cmd.append(file_path)
-    
-    print(f"Lanzando VLC externo: {vlc_cmd}")
-    global vlc_process
-    vlc_process = subprocess.Popen(vlc_cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    
     global current_state
     current_state = STATE_PLAYING_MEDIA
 
-def play_slideshow_vlc(photo_paths):
-    """Inicia una presentación de diapositivas de fotos con VLC."""
+def on_slide_ready(path):
+    """Despierta al bucle principal (desde el hilo decodificador) cuando una foto está lista."""
+    pygame.event.post(pygame.event.Event(SLIDESHOW_EVENT, path=path))
+
+def play_slideshow(photo_paths, start_index=0, return_state=STATE_USB_PHOTO_GRID):
+    """Inicia la presentación de fotos dentro de la GUI, empezando por start_index."""
+    global slide_decoder, photo_slideshow, current_state, slideshow_return_state
     if not photo_paths:
         print("No se encontraron fotografías.")
         return
-    
-    playlist_file = "/tmp/usb_photos.m3u"
-    with open(playlist_file, "w") as f:
-        f.write("#EXTM3U\n")
-        for p in photo_paths:
-            f.write(p + "\n")
 
-    play_media_vlc_external(playlist_file, loop=True, slideshow_duration=3)
+    stop_current_playback()
+    if slide_decoder is None:
+        slide_decoder = slideshow.SlideDecoder((SCREEN_WIDTH, SCREEN_HEIGHT), on_slide_ready, SLIDESHOW_DECODE_AHEAD)
+        slide_decoder.start()
+    photo_slideshow = slideshow.Slideshow(photo_paths, slide_decoder, start_index, SLIDESHOW_SECONDS)
+    slideshow_return_state = return_state
+    current_state = STATE_PHOTO_SLIDESHOW
+
+def stop_slideshow():
+    """Termina la presentación; las fotos ya escaladas se quedan en la caché."""
+    global photo_slideshow
+    photo_slideshow = None
+    if slide_decoder is not None:
+        slide_decoder.set_window([])
 
 def play_music_loop_vlc(music_paths):
     """Reproduce música en bucle con VLC."""
@@ -284,18 +513,11 @@ def play_music_loop_vlc(music_paths):
         print("No se encontraron pistas de música.")
         return
 
-    playlist_file = "/tmp/usb_music.m3u"
-    with open(playlist_file, "w") as f:
-        f.write("#EXTM3U\n")
-        for m in music_paths:
-            f.write(m + "\n")
+    play_media_vlc(music_paths, loop=True)
 
-    play_media_vlc_external(playlist_file, loop=True)
-
-def play_video_selection_vlc(video_paths):
+def play_video_selection_vlc():
     """Prepara la selección de video del USB."""
-    global current_state, usb_data
-    usb_data['videos'] = video_paths
+    global current_state
     current_state = STATE_USB_VIDEO_SELECTION
 
 def play_video_slideshow_vlc(video_paths):
@@ -304,74 +526,225 @@ def play_video_slideshow_vlc(video_paths):
         print("No se encontraron videos para la presentación.")
         return
 
-    playlist_file = "/tmp/usb_videos.m3u"
-    with open(playlist_file, "w") as f:
-        f.write("#EXTM3U\n")
-        for v in video_paths:
-            f.write(v + "\n")
+    play_media_vlc(video_paths, loop=True)
+
+def scan_usb_partition(device, token):
+    """Monta una partición USB y envía su contenido al bus por lotes.
+
+    Se ejecuta en un hilo del bus de eventos; si la memoria se retira durante
+    el escaneo, `token` se cancela y los lotes restantes se descartan.
+    """
+    dev_path = device.device_node
+    mount_point = get_mount_point(dev_path)
+    if not mount_point:
+        if auto_mount(dev_path, token.cancel_event):
+            mount_point = get_mount_point(dev_path)
+
+    if not mount_point:
+        print(f"No se pudo montar/obtener punto de montaje para {dev_path}")
+        return
+
+    volume_key = media_index.volume_key_from_udev(device)
+    if not usb_event_bus.post({'type': 'usb_inserted', 'device': dev_path, 'mount_point': mount_point,
+                               'label': device.get('ID_FS_LABEL'), 'volume': volume_key}, token):
+        return
+    counts = {'photos': 0, 'music': 0, 'videos': 0}
+    for batch in iter_media_files(mount_point, volume_key, token.cancel_event):
+        for kind in counts:
+            counts[kind] += len(batch[kind])
+        if not usb_event_bus.post({
+            'type': 'usb_scan_progress',
+            'device': dev_path,
+            'photos': batch['photos'],
+            'music': batch['music'],
+            'videos': batch['videos'],
+            'video_info': batch['info']['videos'],
+            'counts': dict(counts)
+        }, token):
+            return
+    if token.is_cancelled():
+        return
+    if usb_event_bus.post({'type': 'usb_scan_complete', 'device': dev_path, 'counts': counts}, token):
+        print(f"USB montado y escaneado: {dev_path} en {mount_point}")
+
+def on_thumbnail_ready(path, thumb_path):
+    """Avisa al bucle principal (desde el hilo de miniaturas) que una miniatura está lista."""
+    pygame.event.post(pygame.event.Event(THUMBNAIL_EVENT, path=path, thumb_path=thumb_path))
 
-    play_media_vlc_external(playlist_file, loop=True)
+# Servicio de miniaturas: pool de procesos con caché en disco (ruta+tamaño+mtime)
+thumbnail_service = thumbnails.ThumbnailService(
+    thumbnails.ThumbnailCache(THUMBNAIL_DIR, THUMBNAIL_CACHE_BYTES), THUMBNAIL_SIZE, on_thumbnail_ready)
+
+def store_thumbnail(path, thumb_path):
+    """Carga en memoria una miniatura generada (en el hilo principal)."""
+    if thumb_path is None:
+        thumbnail_failed.add(path)
+        return
+    try:
+        thumbnail_surfaces[path] = pygame.image.load(thumb_path).convert()
+    except pygame.error:
+        thumbnail_failed.add(path)
+        return
+    while len(thumbnail_surfaces) > THUMBNAIL_MEMORY_ITEMS:
+        thumbnail_surfaces.popitem(last=False)
+
+def thumbnail_for(path):
+    """Regresa la superficie de la miniatura si ya está en memoria."""
+    surface = thumbnail_surfaces.get(path)
+    if surface is not None:
+        thumbnail_surfaces.move_to_end(path)
+    return surface
+
+def request_grid_thumbnails(scene, grid, kind, path_func):
+    """Pide las miniaturas de las celdas visibles y, con menor prioridad, las de la página siguiente."""
+    visible = grid.visible_range()
+    if visible == scene.requested_range:
+        return
+    scene.requested_range = visible
+    # Lo que quedó en cola de la vista anterior ya no está en pantalla
+    thumbnail_service.new_view()
+    first, last = visible
+    page = last - first
+    for index in range(first, min(grid.count, last + page)):
+        path = path_func(index)
+        if path not in thumbnail_surfaces and path not in thumbnail_failed:
+            priority = thumbnails.PRIORITY_VISIBLE if index < last else thumbnails.PRIORITY_PREFETCH
+            thumbnail_service.request(kind, path, priority)
+
+# Bus de eventos de USB: agrupa ráfagas de add/remove por dispositivo y entrega
+# los resultados de los escaneos al bucle principal
+usb_event_bus = usb_events.UsbEventBus(scan_usb_partition, wake=wake_main_loop)
 
 def usb_monitor_thread_func():
     """Monitorea eventos de conexión/desconexión de USB en un hilo separado."""
+    import pyudev
     context = pyudev.Context()
     monitor = pyudev.Monitor.from_netlink(context)
     monitor.filter_by(subsystem='block', device_type='partition')
+    usb_event_bus.start()
 
     print("Hilo de monitoreo USB iniciado.")
     
-    # Comprobar USB ya conectados al inicio
+    # Comprobar USB ya conectados al inicio; el bus escanea cada partición en su propio hilo
     for device in context.list_devices(subsystem='block', device_type='partition'):
         if 'ID_BUS' in device and device['ID_BUS'] == 'usb':
-            dev_path = device.device_node
-            mount_point = get_mount_point(dev_path)
-            if not mount_point:
-                if auto_mount(dev_path):
-                    mount_point = get_mount_point(dev_path)
-            
-            if mount_point:
-                photos, music, videos = get_media_files(mount_point)
-                usb_event_queue.append({
-                    'type': 'usb_inserted',
-                    'mount_point': mount_point,
-                    'photos': photos,
-                    'music': music,
-                    'videos': videos
-                })
-                print(f"USB existente detectado y datos en cola: {mount_point}")
-                break
+            print(f"USB existente detectado: {device.device_node}")
+            usb_event_bus.device_event('add', device)
 
     # Monitorear nuevos eventos de USB
     for action, device in monitor:
-        if action == 'add' and device.get('ID_BUS') == 'usb' and device.device_type == 'partition':
-            dev_path = device.device_node
-            print(f"Nuevo USB insertado: {dev_path}")
-            mount_point = get_mount_point(dev_path)
-            if not mount_point:
-                if auto_mount(dev_path):
-                    mount_point = get_mount_point(dev_path)
-            
-            if mount_point:
-                photos, music, videos = get_media_files(mount_point)
-                usb_event_queue.append({
-                    'type': 'usb_inserted',
-                    'mount_point': mount_point,
-                    'photos': photos,
-                    'music': music,
-                    'videos': videos
-                })
-                print(f"Nuevo USB montado y datos en cola: {mount_point}")
-            else:
-                print(f"No se pudo montar/obtener punto de montaje para {dev_path}")
-        elif action == 'remove' and device.get('ID_BUS') == 'usb' and device.device_type == 'partition':
-            print(f"USB removido: {device.device_node}")
-            usb_event_queue.append({'type': 'usb_removed'})
+        if action in ('add', 'remove') and device.get('ID_BUS') == 'usb' and device.device_type == 'partition':
+            print(f"Evento USB '{action}': {device.device_node}")
+            usb_event_bus.device_event(action, device)
 
 # --- Pantallas de la GUI ---
-def main_menu_screen():
-    """Dibuja y maneja la pantalla del menú principal."""
-    screen.fill(DARK_BLUE)
-    draw_text("Centro Multimedia Pi", font_large, WHITE, screen, SCREEN_WIDTH // 2, 80)
+def open_usb_media(kind):
+    """Abre el tipo de medio solicitado; si el escaneo aún no lo encuentra, espera en la pantalla de carga."""
+    global usb_pending_kind
+    if getattr(usb_library, kind):
+        usb_pending_kind = None
+        if kind == 'videos':
+            play_video_selection_vlc()
+            return STATE_USB_VIDEO_SELECTION
+        elif kind == 'photos':
+            return STATE_USB_PHOTO_GRID
+        else:
+            # Mientras se escanea se reproduce la vista misma: los lotes nuevos se agregan a la lista
+            play_music_loop_vlc(usb_library.music if usb_library.scanning else usb_library.music.frozen())
+        return STATE_PLAYING_MEDIA
+
+    usb_pending_kind = kind
+    return STATE_USB_LOADING
+
+def remove_usb_device(device, state):
+    """Quita de la biblioteca la memoria retirada y regresa el estado con el que se sigue.
+
+    Lo que se reproduce desde otra memoria continúa; solo se detiene lo que
+    estaba leyendo del dispositivo retirado.
+    """
+    global browse_path, browse_walk_path
+    library = usb_library.remove_device(device)
+    if library is None:
+        return state
+    print(f"Memoria USB desconectada: {library.label}")
+    if metadata_extractor is not None:
+        metadata_extractor.forget(library.mount_point)
+    if folder_cache is not None:
+        folder_cache.forget(library.mount_point)
+    search_index.remove_under(library.mount_point)
+    if browse_path is not None and media_library.is_under(browse_path, library.mount_point):
+        browse_path = None
+        browse_walk_path = None
+        if len(usb_library.devices) == 1:
+            browse_path = next(iter(usb_library.devices.values())).mount_point
+            get_folder_browser().request(browse_path)
+    # Las miniaturas pendientes pueden ser de esta memoria; las pantallas vuelven a pedir las suyas
+    thumbnail_service.cancel_pending()
+
+    if playback_engine is not None and playback_engine.is_active():
+        current = playback_engine.current_path()
+        if current is not None and media_library.is_under(current, library.mount_point):
+            stop_current_playback()
+            if state == STATE_PLAYING_MEDIA:
+                state = STATE_USB_SUBMENU
+
+    if photo_slideshow is not None:
+        remaining = [path for path in photo_slideshow.paths if not media_library.is_under(path, library.mount_point)]
+        current = photo_slideshow.paths[photo_slideshow.index]
+        if current in remaining:
+            play_slideshow(remaining, remaining.index(current), slideshow_return_state)
+        else:
+            stop_slideshow()
+            if state == STATE_PHOTO_SLIDESHOW:
+                state = slideshow_return_state
+
+    if not usb_library.devices:
+        stop_current_playback()
+        stop_slideshow()
+        if slide_decoder is not None:
+            slide_decoder.clear()
+        # Sin memorias conectadas, regresar al menú principal si estaba en un estado relacionado
+        if state in [STATE_USB_LOADING, STATE_USB_MIXED_CHOICE, STATE_USB_VIDEO_SELECTION, STATE_USB_NO_MEDIA, STATE_PLAYING_MEDIA, STATE_USB_SUBMENU, STATE_USB_PHOTO_GRID, STATE_PHOTO_SLIDESHOW, STATE_USB_FOLDER_BROWSE, STATE_USB_SEARCH]:
+            return STATE_MAIN_MENU
+    elif state == STATE_USB_PHOTO_GRID and not usb_library.photos:
+        state = STATE_USB_SUBMENU
+    elif state == STATE_USB_VIDEO_SELECTION and not usb_library.videos:
+        state = STATE_USB_SUBMENU
+    return state
+
+def process_usb_events(state):
+    """Aplica a la biblioteca los eventos pendientes del bus de USB y regresa el estado con el que se sigue."""
+    for usb_event in usb_event_bus.get_events():
+        if usb_event['type'] == 'usb_inserted':
+            # Inicia el escaneo de una memoria: su biblioteca se llena con los lotes que lleguen
+            if usb_event['device'] in usb_library.devices:
+                search_index.remove_under(usb_library.devices[usb_event['device']].mount_point)
+            usb_library.add_device(usb_event['device'], usb_event['mount_point'], usb_event['label'], usb_event['volume'])
+
+        elif usb_event['type'] == 'usb_scan_progress':
+            usb_library.extend(usb_event['device'], usb_event)
+            search_index.add(usb_event['photos'] + usb_event['music'] + usb_event['videos'])
+
+        elif usb_event['type'] == 'usb_scan_complete':
+            library = usb_library.finish(usb_event['device'])
+            if library is not None:
+                counts = library.counts()
+                print(f"Datos de USB actualizados ({library.label}): Fotos={counts['photos']}, Música={counts['music']}, Videos={counts['videos']}")
+                search_index.measure()
+                # Duración, resolución y etiquetas se extraen en segundo plano (lo ya conocido sale de SQLite)
+                if library.videos or library.music:
+                    extractor = get_metadata_extractor()
+                    extractor.enqueue(library.volume, library.mount_point, library.videos)
+                    extractor.enqueue(library.volume, library.mount_point, library.music)
+
+        elif usb_event['type'] == 'usb_removed':
+            state = remove_usb_device(usb_event['device'], state)
+    return state
+
+def build_main_menu_scene():
+    """Construye la escena del menú principal."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.add_static_text("Centro Multimedia Pi", font_large, WHITE, SCREEN_WIDTH // 2, 80)
 
     button_width = 250
     button_height = 120
@@ -391,91 +764,149 @@ def main_menu_screen():
     # Botón de configuración Wi-Fi
     wifi_icon_size = icons['wifi_logo'].get_width()
     btn_wifi_rect = pygame.Rect(SCREEN_WIDTH - wifi_icon_size - 20, 20, wifi_icon_size, wifi_icon_size)
-    if create_button_with_icon('wifi_logo', btn_wifi_rect, DARK_BLUE, GRAY):
-        return STATE_WIFI_SETUP
+    scene.btn_wifi = scene.add(create_icon_button('wifi_logo', btn_wifi_rect, DARK_BLUE, GRAY))
 
     # Botones de aplicaciones de streaming
-    if create_button_with_icon('netflix', btn_netflix_rect, GRAY, LIGHT_BLUE, "Netflix"):
-        subprocess.Popen(['chromium-browser', '--kiosk', 'https://www.netflix.com'])
-        return STATE_MAIN_MENU
-    if create_button_with_icon('disneyplus', btn_disney_rect, GRAY, LIGHT_BLUE, "Disney+"):
-        subprocess.Popen(['chromium-browser', '--kiosk', 'https://www.disneyplus.com'])
-        return STATE_MAIN_MENU
-    if create_button_with_icon('primevideo', btn_prime_video_rect, GRAY, LIGHT_BLUE, "Prime Video"):
-        subprocess.Popen(['chromium-browser', '--kiosk', 'https://www.primevideo.com'])
-        return STATE_MAIN_MENU
-    if create_button_with_icon('spotify', btn_spotify_rect, GRAY, LIGHT_BLUE, "Spotify"):
-        subprocess.Popen(['chromium-browser', '--kiosk', 'https://open.spotify.com'])
-        return STATE_MAIN_MENU
-    if create_button_with_icon('applemusic', btn_apple_music_rect, GRAY, LIGHT_BLUE, "Apple Music"):
-        subprocess.Popen(['chromium-browser', '--kiosk', 'https://music.apple.com'])
-        return STATE_MAIN_MENU
-    
+    scene.streaming_urls = {
+        scene.add(create_icon_button('netflix', btn_netflix_rect, GRAY, LIGHT_BLUE, "Netflix")): 'https://www.netflix.com',
+        scene.add(create_icon_button('disneyplus', btn_disney_rect, GRAY, LIGHT_BLUE, "Disney+")): 'https://www.disneyplus.com',
+        scene.add(create_icon_button('primevideo', btn_prime_video_rect, GRAY, LIGHT_BLUE, "Prime Video")): 'https://www.primevideo.com',
+        scene.add(create_icon_button('spotify', btn_spotify_rect, GRAY, LIGHT_BLUE, "Spotify")): 'https://open.spotify.com',
+        scene.add(create_icon_button('applemusic', btn_apple_music_rect, GRAY, LIGHT_BLUE, "Apple Music")): 'https://music.apple.com',
+    }
+
     # Botón de USB
-    if create_button_with_icon('usb', btn_usb_rect, GRAY, LIGHT_BLUE, "Reproducir USB"):
-        return STATE_USB_SUBMENU
+    scene.btn_usb = scene.add(create_icon_button('usb', btn_usb_rect, GRAY, LIGHT_BLUE, "Reproducir USB"))
 
     # Botón de salida
-    if create_button_text_only("Salir", btn_exit_rect, font_medium, GRAY, RED):
+    scene.btn_exit = scene.add(ui_scene.Button(btn_exit_rect, GRAY, RED, "Salir", font_medium))
+    return scene
+
+def main_menu_screen():
+    """Dibuja y maneja la pantalla del menú principal."""
+    scene = get_scene(STATE_MAIN_MENU, None, build_main_menu_scene)
+    clicked = show_scene(scene)
+
+    if clicked is scene.btn_wifi:
+        return STATE_WIFI_SETUP
+    if clicked in scene.streaming_urls:
+        # Varios clics seguidos en el mismo servicio solo abren una página
+        if browser.open(scene.streaming_urls[clicked]):
+            metrics.inc('launches_total', target='chromium')
+        return STATE_MAIN_MENU
+    if clicked is scene.btn_usb:
+        return STATE_USB_SUBMENU
+    if clicked is scene.btn_exit:
         return -1
 
     return STATE_MAIN_MENU
 
+def build_wifi_setup_scene():
+    """Construye la escena de configuración de Wi-Fi."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.add_static_text("Configuración Wi-Fi", font_large, WHITE, SCREEN_WIDTH // 2, 80)
+    scene.add_static_text("Redes disponibles:", font_medium, WHITE, WIFI_LIST_RECT.centerx, 160)
+    scene.add_static_text("Ingrese datos de la red:", font_medium, WHITE, WIFI_SSID_RECT.centerx, 160)
+
+    # Redes encontradas por nmcli; al elegir una se llena el SSID
+    scene.network_list = scene.add(ui_scene.VirtualList(WIFI_LIST_RECT, 60, font_small, GRAY, LIGHT_BLUE, WHITE))
+    scene.shown_networks = None
+    btn_refresh = pygame.Rect(WIFI_LIST_RECT.x, WIFI_LIST_RECT.bottom + 20, WIFI_LIST_RECT.width, 60)
+    scene.btn_refresh = scene.add(ui_scene.Button(btn_refresh, GRAY, LIGHT_BLUE, "Actualizar redes", font_small))
+
+    # Campos de entrada para SSID y Contraseña
+    scene.ssid_field = scene.add(ui_scene.TextField(WIFI_SSID_RECT, "SSID: ", font_medium, BLACK, WHITE, GRAY, (150, 255, 150)))
+    scene.pass_field = scene.add(ui_scene.TextField(WIFI_PASS_RECT, "Contraseña: ", font_medium, BLACK, WHITE, GRAY, (150, 255, 150), mask=True))
+
+    btn_connect = pygame.Rect(WIFI_COLUMN_X, 450, WIFI_COLUMN_WIDTH, 80)
+    btn_back = pygame.Rect(WIFI_COLUMN_X, 550, WIFI_COLUMN_WIDTH, 80)
+
+    scene.btn_back_arrow = scene.add(create_back_button())
+    scene.btn_connect = scene.add(ui_scene.Button(btn_connect, GREEN, (0, 200, 0), "Conectar", font_medium))
+    scene.btn_back = scene.add(ui_scene.Button(btn_back, GRAY, YELLOW, "Volver", font_medium))
+    scene.status_label = scene.add(ui_scene.Label("", font_small, WHITE, WIFI_SSID_RECT.centerx, 670))
+    return scene
+
+def network_label(network):
+    """Texto de un renglón de la lista de redes."""
+    secure = "  (segura)" if network['security'] else ""
+    return f"{network['ssid']}  {network['signal']}%{secure}"
+
+def wifi_status_text(job):
+    """Mensaje de estado: el intento de conexión tiene prioridad sobre la búsqueda de redes."""
+    if job is not None:
+        return job.message
+    if wifi_service.scan_running and not wifi_service.networks:
+        return "Buscando redes..."
+    if wifi_service.scan_error:
+        return f"Sin lista de redes: {wifi_service.scan_error}"
+    return ""
+
 def wifi_setup_screen():
     """Dibuja y maneja la pantalla de configuración de Wi-Fi."""
-    global wifi_ssid_input, wifi_password_input, active_input_field
-    screen.fill(DARK_BLUE)
-    draw_text("Configuración Wi-Fi", font_large, WHITE, screen, SCREEN_WIDTH // 2, 80)
-    draw_text("Ingrese datos de la red:", font_medium, WHITE, screen, SCREEN_WIDTH // 2, 160)
-
-    ssid_rect = pygame.Rect(SCREEN_WIDTH // 2 - 300, 250, 600, 60)
-    pass_rect = pygame.Rect(SCREEN_WIDTH // 2 - 300, 350, 600, 60)
-
-    # Dibujar campos de entrada para SSID y Contraseña
-    pygame.draw.rect(screen, WHITE, ssid_rect, border_radius=5)
-    pygame.draw.rect(screen, (150,255,150) if active_input_field == 'ssid' else GRAY, ssid_rect, 3, border_radius=5)
-    draw_text("SSID: " + wifi_ssid_input, font_medium, BLACK, screen, ssid_rect.centerx, ssid_rect.centery)
-
-    pygame.draw.rect(screen, WHITE, pass_rect, border_radius=5)
-    pygame.draw.rect(screen, (150,255,150) if active_input_field == 'password' else GRAY, pass_rect, 3, border_radius=5)
-    draw_text("Contraseña: " + ("*" * len(wifi_password_input)), font_medium, BLACK, screen, pass_rect.centerx, pass_rect.centery)
-
-    btn_connect = pygame.Rect(SCREEN_WIDTH // 2 - 200, 450, 400, 80)
-    btn_back = pygame.Rect(SCREEN_WIDTH // 2 - 200, 550, 400, 80)
-
-    # Botón para regresar al menú principal
-    back_arrow_rect = pygame.Rect(20, 20, icons['back_arrow'].get_width(), icons['back_arrow'].get_height())
-    if create_button_with_icon('back_arrow', back_arrow_rect, DARK_BLUE, GRAY):
+    global wifi_ssid_input, active_input_field
+    scene = get_scene(STATE_WIFI_SETUP, None, build_wifi_setup_scene)
+    networks = wifi_service.networks
+    if networks is not scene.shown_networks:
+        # Llegó una búsqueda nueva: mismo número de renglones no implica mismo contenido
+        scene.shown_networks = networks
+        scene.network_list.set_items(len(networks), lambda row: network_label(networks[row]))
+        scene.network_list.invalidate()
+
+    job = wifi_service.job
+    connecting = job is not None and not job.is_done()
+    scene.btn_connect.set_text("Cancelar" if connecting else "Conectar")
+    scene.status_label.set_text(wifi_status_text(job))
+    scene.ssid_field.set_value(wifi_ssid_input)
+    scene.ssid_field.set_active(active_input_field == 'ssid')
+    scene.pass_field.set_value(wifi_password_input)
+    scene.pass_field.set_active(active_input_field == 'password')
+    clicked = show_scene(scene)
+
+    # Botones para regresar al menú principal (un intento en curso sigue en segundo plano)
+    if clicked is scene.btn_back_arrow or clicked is scene.btn_back:
         return STATE_MAIN_MENU
 
-    # Botón para conectar a Wi-Fi
-    if create_button_text_only("Conectar", btn_connect, font_medium, GREEN, (0, 200, 0)):
-        if connect_to_wifi_logic(wifi_ssid_input, wifi_password_input):
-            return STATE_WIFI_SUCCESS_MESSAGE
+    if clicked is scene.btn_refresh:
+        wifi_service.request_scan()
+
+    row = scene.network_list.take_activated()
+    if row is not None and row < len(networks):
+        wifi_ssid_input = networks[row]['ssid']
+        active_input_field = 'password'
+
+    # Botón para conectar a Wi-Fi, o para cancelar el intento en curso;
+    # el resultado llega como WIFI_EVENT al bucle principal
+    if clicked is scene.btn_connect:
+        if connecting:
+            wifi_service.cancel()
+        elif wifi_ssid_input:
+            wifi_service.connect(wifi_ssid_input, wifi_password_input)
         else:
-            print("Fallo la conexión Wi-Fi.")
-            return STATE_WIFI_SETUP
-    
-    # Botón para volver al menú principal
-    if create_button_text_only("Volver", btn_back, font_medium, GRAY, YELLOW):
-        return STATE_MAIN_MENU
+            print("Escriba o elija el nombre de la red.")
 
     return STATE_WIFI_SETUP
 
+def build_wifi_success_scene():
+    """Construye la escena del mensaje de conexión exitosa."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), GREEN)
+    scene.add_static_text("¡Conexión Wi-Fi Exitosa!", font_large, WHITE, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50)
+    scene.add_static_text("Volviendo al menú principal...", font_medium, WHITE, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30)
+    return scene
+
 def wifi_success_message_screen():
-    """Muestra un mensaje de conexión Wi-Fi exitosa."""
-    screen.fill(GREEN)
-    draw_text("¡Conexión Wi-Fi Exitosa!", font_large, WHITE, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50)
-    draw_text("Volviendo al menú principal...", font_medium, WHITE, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30)
-    
-    pygame.display.flip()
-    pygame.time.wait(2000)
-    return STATE_MAIN_MENU
+    """Muestra un mensaje de conexión Wi-Fi exitosa y regresa al menú cuando pasa su tiempo."""
+    scene = get_scene(STATE_WIFI_SUCCESS_MESSAGE, None, build_wifi_success_scene)
+    scene.render(screen)
 
-def usb_submenu_screen():
-    """Dibuja y maneja la pantalla del submenú USB."""
-    screen.fill(DARK_BLUE)
-    draw_text("Seleccione tipo de medio USB", font_large, WHITE, screen, SCREEN_WIDTH // 2, 80)
+    if wifi_success_until is None or time.monotonic() >= wifi_success_until:
+        return STATE_MAIN_MENU
+    return STATE_WIFI_SUCCESS_MESSAGE
+
+def build_usb_submenu_scene():
+    """Construye la escena del submenú USB."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.add_static_text("Seleccione tipo de medio USB", font_large, WHITE, SCREEN_WIDTH // 2, 80)
 
     button_width = 300
     button_height = 150
@@ -490,229 +921,791 @@ def usb_submenu_screen():
     btn_imagenes_rect = pygame.Rect(start_x + button_width + button_spacing, y_pos, button_width, button_height)
     btn_music_rect = pygame.Rect(start_x + 2 * (button_width + button_spacing), y_pos, button_width, button_height)
 
+    scene.btn_back_arrow = scene.add(create_back_button())
+    scene.media_buttons = {
+        scene.add(create_icon_button('videos_logo', btn_videos_rect, GRAY, LIGHT_BLUE, "Videos")): 'videos',
+        scene.add(create_icon_button('imagenes_logo', btn_imagenes_rect, GRAY, LIGHT_BLUE, "Imágenes")): 'photos',
+        scene.add(create_icon_button('music_logo', btn_music_rect, GRAY, LIGHT_BLUE, "Música")): 'music',
+    }
+
+    # Exploración por carpetas y búsqueda por nombre: no esperan a que termine el escaneo
+    btn_folders_rect = pygame.Rect(SCREEN_WIDTH // 2 - 420, y_pos + button_height + 40, 400, 70)
+    scene.btn_folders = scene.add(ui_scene.Button(btn_folders_rect, GRAY, LIGHT_BLUE, "Explorar carpetas", font_medium))
+    btn_search_rect = pygame.Rect(SCREEN_WIDTH // 2 + 20, y_pos + button_height + 40, 400, 70)
+    scene.btn_search = scene.add(ui_scene.Button(btn_search_rect, GRAY, LIGHT_BLUE, "Buscar", font_medium))
+
+    # Origen de los medios: todas las memorias o una sola (visible con dos o más conectadas)
+    btn_source_rect = pygame.Rect(SCREEN_WIDTH // 2 - 250, y_pos + button_height + 130, 500, 70)
+    scene.btn_source = scene.add(ui_scene.Button(btn_source_rect, GRAY, LIGHT_BLUE, "", font_medium))
+    return scene
+
+def usb_submenu_screen():
+    """Dibuja y maneja la pantalla del submenú USB."""
+    scene = get_scene(STATE_USB_SUBMENU, None, build_usb_submenu_scene)
+    scene.btn_source.set_text("Origen: " + usb_library.source_label())
+    scene.btn_source.set_visible(len(usb_library.devices) > 1)
+    clicked = show_scene(scene)
+
     # Botón para regresar
-    back_arrow_rect = pygame.Rect(20, 20, icons['back_arrow'].get_width(), icons['back_arrow'].get_height())
-    if create_button_with_icon('back_arrow', back_arrow_rect, DARK_BLUE, GRAY):
+    if clicked is scene.btn_back_arrow:
         return STATE_MAIN_MENU
 
-    # Botones de selección de tipo de medio
-    if create_button_with_icon('videos_logo', btn_videos_rect, GRAY, LIGHT_BLUE, "Videos"):
-        if usb_data['videos']:
-            play_video_selection_vlc(usb_data['videos'])
-            return STATE_USB_VIDEO_SELECTION
-        else:
-            return STATE_USB_LOADING
-    
-    if create_button_with_icon('imagenes_logo', btn_imagenes_rect, GRAY, LIGHT_BLUE, "Imágenes"):
-        if usb_data['photos']:
-            play_slideshow_vlc(usb_data['photos'])
-            return STATE_PLAYING_MEDIA
-        else:
-            return STATE_USB_LOADING
+    if clicked is scene.btn_source:
+        usb_library.cycle_filter()
+        return STATE_USB_SUBMENU
 
-    if create_button_with_icon('music_logo', btn_music_rect, GRAY, LIGHT_BLUE, "Música"):
-        if usb_data['music']:
-            play_music_loop_vlc(usb_data['music'])
-            return STATE_PLAYING_MEDIA
-        else:
-            return STATE_USB_LOADING
+    if clicked is scene.btn_folders:
+        return open_folder_browser()
+
+    if clicked is scene.btn_search:
+        return STATE_USB_SEARCH
+
+    # Botones de selección de tipo de medio
+    if clicked in scene.media_buttons:
+        return open_usb_media(scene.media_buttons[clicked])
 
     return STATE_USB_SUBMENU
 
+def build_usb_loading_scene():
+    """Construye la escena de carga del USB."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.title = scene.add(ui_scene.Label("", font_large, WHITE, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50))
+    scene.detail = scene.add(ui_scene.Label("", font_medium, WHITE, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30))
+    scene.btn_back_arrow = scene.add(create_back_button())
+    return scene
+
 def usb_loading_screen():
     """Muestra una pantalla de carga para el USB."""
-    screen.fill(DARK_BLUE)
-    draw_text("Cargando USB...", font_large, WHITE, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50)
-    draw_text("Por favor espere o inserte la memoria USB.", font_medium, WHITE, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30)
-    
+    # En cuanto el escaneo encuentra el tipo de medio solicitado, se abre sin esperar al final
+    if usb_pending_kind and getattr(usb_library, usb_pending_kind):
+        return open_usb_media(usb_pending_kind)
+    if usb_pending_kind and usb_library.devices and not usb_library.scanning:
+        return STATE_USB_NO_MEDIA
+
+    scene = get_scene(STATE_USB_LOADING, None, build_usb_loading_scene)
+    if usb_library.scanning:
+        scene.title.set_text("Escaneando USB...")
+        scene.detail.set_text(f"Fotos: {len(usb_library.photos)}   Música: {len(usb_library.music)}   Videos: {len(usb_library.videos)}")
+    else:
+        scene.title.set_text("Cargando USB...")
+        scene.detail.set_text("Por favor espere o inserte la memoria USB.")
+    clicked = show_scene(scene)
+
     # Botón para regresar
-    back_arrow_rect = pygame.Rect(20, 20, icons['back_arrow'].get_width(), icons['back_arrow'].get_height())
-    if create_button_with_icon('back_arrow', back_arrow_rect, DARK_BLUE, GRAY):
+    if clicked is scene.btn_back_arrow:
         return STATE_USB_SUBMENU
 
     return STATE_USB_LOADING
 
+def build_usb_no_media_scene():
+    """Construye la escena de USB sin medios."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.add_static_text("USB detectado, pero sin medios.", font_large, WHITE, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50)
+    scene.add_static_text("Inserte un USB con fotos, música o videos.", font_medium, WHITE, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30)
+    scene.btn_back_arrow = scene.add(create_back_button())
+    return scene
+
 def usb_no_media_screen():
     """Muestra un mensaje cuando el USB no contiene medios compatibles."""
-    screen.fill(DARK_BLUE)
-    draw_text("USB detectado, pero sin medios.", font_large, WHITE, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 - 50)
-    draw_text("Inserte un USB con fotos, música o videos.", font_medium, WHITE, screen, SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 30)
-    
+    scene = get_scene(STATE_USB_NO_MEDIA, None, build_usb_no_media_scene)
+    clicked = show_scene(scene)
+
     # Botón para regresar
-    back_arrow_rect = pygame.Rect(20, 20, icons['back_arrow'].get_width(), icons['back_arrow'].get_height())
-    if create_button_with_icon('back_arrow', back_arrow_rect, DARK_BLUE, GRAY):
+    if clicked is scene.btn_back_arrow:
         return STATE_USB_SUBMENU
 
     return STATE_USB_NO_MEDIA
 
+def build_usb_mixed_choice_scene():
+    """Construye la escena de contenido mixto con un botón por cada tipo de medio presente."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.add_static_text("Contenido mixto en USB", font_large, WHITE, SCREEN_WIDTH // 2, 80)
+    scene.add_static_text("¿Qué desea reproducir?", font_medium, WHITE, SCREEN_WIDTH // 2, 160)
+    scene.btn_back_arrow = scene.add(create_back_button())
+
+    y_offset = 250
+    scene.media_buttons = {}
+    for kind, label in (('photos', "Reproducir Fotos"), ('music', "Reproducir Música"), ('videos', "Reproducir Videos")):
+        if getattr(usb_library, kind):
+            btn_rect = pygame.Rect(SCREEN_WIDTH // 2 - 200, y_offset, 400, 80)
+            scene.media_buttons[scene.add(ui_scene.Button(btn_rect, GRAY, LIGHT_BLUE, label, font_medium))] = kind
+            y_offset += 100
+    return scene
+
 def usb_mixed_choice_screen():
     """Permite al usuario elegir qué tipo de medio reproducir si el USB tiene varios."""
-    screen.fill(DARK_BLUE)
-    draw_text("Contenido mixto en USB", font_large, WHITE, screen, SCREEN_WIDTH // 2, 80)
-    draw_text("¿Qué desea reproducir?", font_medium, WHITE, screen, SCREEN_WIDTH // 2, 160)
+    # La escena se reconstruye solo si cambia qué tipos de medio hay en el USB
+    kinds_present = (bool(usb_library.photos), bool(usb_library.music), bool(usb_library.videos))
+    scene = get_scene(STATE_USB_MIXED_CHOICE, kinds_present, build_usb_mixed_choice_scene)
+    clicked = show_scene(scene)
 
     # Botón para regresar
-    back_arrow_rect = pygame.Rect(20, 20, icons['back_arrow'].get_width(), icons['back_arrow'].get_height())
-    if create_button_with_icon('back_arrow', back_arrow_rect, DARK_BLUE, GRAY):
+    if clicked is scene.btn_back_arrow:
         return STATE_USB_SUBMENU
 
-    y_offset = 250
-    
     # Botones para seleccionar tipo de medio
-    if usb_data['photos']:
-        btn_photos = pygame.Rect(SCREEN_WIDTH // 2 - 200, y_offset, 400, 80)
-        if create_button_text_only("Reproducir Fotos", btn_photos, font_medium, GRAY, LIGHT_BLUE):
-            play_slideshow_vlc(usb_data['photos'])
-            return STATE_PLAYING_MEDIA
-        y_offset += 100
-    
-    if usb_data['music']:
-        btn_music = pygame.Rect(SCREEN_WIDTH // 2 - 200, y_offset, 400, 80)
-        if create_button_text_only("Reproducir Música", btn_music, font_medium, GRAY, LIGHT_BLUE):
-            play_music_loop_vlc(usb_data['music'])
-            return STATE_PLAYING_MEDIA
-        y_offset += 100
-    
-    if usb_data['videos']:
-        btn_videos = pygame.Rect(SCREEN_WIDTH // 2 - 200, y_offset, 400, 80)
-        if create_button_text_only("Reproducir Videos", btn_videos, font_medium, GRAY, LIGHT_BLUE):
-            play_video_selection_vlc(usb_data['videos'])
-            return STATE_USB_VIDEO_SELECTION
-        y_offset += 100
+    if clicked in scene.media_buttons:
+        return open_usb_media(scene.media_buttons[clicked])
 
     return STATE_USB_MIXED_CHOICE
 
+def video_order():
+    """Regresa la lista de índices de usb_library.videos en el orden elegido, o None si es el de escaneo."""
+    return usb_library.video_order(video_sort_key)
+
+def sorted_videos():
+    """Regresa las rutas de los videos en el orden mostrado en pantalla."""
+    order = video_order()
+    if order is None:
+        return usb_library.videos.frozen()
+    return media_library.SubsetView(usb_library.videos, order)
+
+def video_row_path(row):
+    """Regresa la ruta del video que aparece en un renglón de la lista."""
+    order = video_order()
+    return usb_library.videos[order[row] if order is not None else row]
+
+def video_row_label(row):
+    path = video_row_path(row)
+    description = media_description(path)
+    if description:
+        return f"{os.path.basename(path)}   {description}"
+    return os.path.basename(path)
+
+def video_row_thumbnail(row):
+    return thumbnail_for(video_row_path(row))
+
+def build_usb_video_selection_scene():
+    """Construye la escena de selección de video con una lista virtualizada."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.add_static_text("Seleccione un Video del USB", font_large, WHITE, SCREEN_WIDTH // 2, 80)
+    scene.scan_label = scene.add(ui_scene.Label("", font_small, YELLOW, SCREEN_WIDTH // 2, 140))
+    scene.btn_back_arrow = scene.add(create_back_button())
+    scene.btn_sort = scene.add(ui_scene.Button((SCREEN_WIDTH - 300, 20, 280, 50), GRAY, LIGHT_BLUE,
+                                               "Orden: " + VIDEO_SORT_LABELS[video_sort_key], font_small))
+
+    # Solo se dibujan los renglones que caben entre el título y el botón inferior
+    list_rect = pygame.Rect(50, 180, SCREEN_WIDTH - 100, SCREEN_HEIGHT - 180 - 200)
+    scene.video_list = scene.add(ui_scene.VirtualList(list_rect, 70, font_small, GRAY, LIGHT_BLUE, WHITE))
+    scene.video_grid = scene.add(ui_scene.ThumbnailGrid(list_rect, THUMBNAIL_CELL, font_tiny, GRAY, LIGHT_BLUE, WHITE, THUMBNAIL_EVENT))
+    scene.btn_view = scene.add(ui_scene.Button((SCREEN_WIDTH - 600, 20, 280, 50), GRAY, LIGHT_BLUE, "", font_small))
+    scene.shown_order = None
+    scene.shown_version = None
+    scene.shown_metadata = None
+    scene.requested_range = None
+
+    # Botón para reproducir todos los videos en presentación
+    btn_play_all = pygame.Rect(SCREEN_WIDTH // 2 - 250, SCREEN_HEIGHT - 180, 500, 70)
+    scene.btn_play_all = scene.add(ui_scene.Button(btn_play_all, GREEN, (0, 200, 0), "Reproducir todos en presentación", font_medium))
+    return scene
+
 def usb_video_selection_screen():
     """Permite al usuario seleccionar un video específico del USB."""
-    screen.fill(DARK_BLUE)
-    draw_text("Seleccione un Video del USB", font_large, WHITE, screen, SCREEN_WIDTH // 2, 80)
+    global video_sort_key, video_view
+    scene = get_scene(STATE_USB_VIDEO_SELECTION, None, build_usb_video_selection_scene)
+    # El orden elegido se aplica cuando el escaneo termina; la lista también se
+    # reinicia si la vista cambió (memoria retirada o filtro de origen)
+    order = video_order()
+    reset = order is not scene.shown_order or usb_library.version != scene.shown_version
+    if reset:
+        scene.requested_range = None
+    scene.video_list.set_items(len(usb_library.videos), video_row_label, reset=reset)
+    scene.video_grid.set_items(len(usb_library.videos), video_row_thumbnail, video_row_label, reset=reset)
+    scene.shown_order = order
+    scene.shown_version = usb_library.version
+    if scene.shown_metadata != metadata_generation:
+        scene.shown_metadata = metadata_generation
+        scene.video_list.invalidate()
+        scene.video_grid.invalidate()
+    scene.video_list.set_visible(video_view == 'list')
+    scene.video_grid.set_visible(video_view == 'grid')
+    scene.btn_view.set_text("Vista: Lista" if video_view == 'list' else "Vista: Miniaturas")
+    if video_view == 'grid':
+        request_grid_thumbnails(scene, scene.video_grid, 'videos', video_row_path)
+    if usb_library.scanning:
+        scene.scan_label.set_text(f"Escaneando... {len(usb_library.videos)} videos encontrados")
+    elif order is None and video_sort_key != 'scan':
+        scene.scan_label.set_text(f"Ordenando {len(usb_library.videos)} videos...")
+    else:
+        scene.scan_label.set_text(f"{len(usb_library.videos)} videos")
+    clicked = show_scene(scene)
 
     # Botón para regresar
-    back_arrow_rect = pygame.Rect(20, 20, icons['back_arrow'].get_width(), icons['back_arrow'].get_height())
-    if create_button_with_icon('back_arrow', back_arrow_rect, DARK_BLUE, GRAY):
+    if clicked is scene.btn_back_arrow:
         return STATE_USB_SUBMENU
 
-    start_y = 180
-    video_buttons = []
-    for i, video_path in enumerate(usb_data['videos']):
-        display_name = os.path.basename(video_path)
-        btn_rect = pygame.Rect(50, start_y + i * 70, SCREEN_WIDTH - 100, 60)
-        video_buttons.append((btn_rect, video_path))
-        pygame.draw.rect(screen, GRAY, btn_rect, border_radius=5)
-        draw_text(display_name, font_small, WHITE, screen, btn_rect.centerx, btn_rect.centery)
-
-    # Botón para reproducir todos los videos en presentación
-    btn_play_all = pygame.Rect(SCREEN_WIDTH // 2 - 250, SCREEN_HEIGHT - 180, 500, 70)
-    if create_button_text_only("Reproducir todos en presentación", btn_play_all, font_medium, GREEN, (0, 200, 0)):
-        play_video_slideshow_vlc(usb_data['videos'])
+    if clicked is scene.btn_sort:
+        keys = list(VIDEO_SORT_LABELS)
+        video_sort_key = keys[(keys.index(video_sort_key) + 1) % len(keys)]
+        scene.btn_sort.set_text("Orden: " + VIDEO_SORT_LABELS[video_sort_key])
+        scene.video_list.set_items(len(usb_library.videos), video_row_label, reset=True)
+        scene.video_grid.set_items(len(usb_library.videos), video_row_thumbnail, video_row_label, reset=True)
+        scene.requested_range = None
+        return STATE_USB_VIDEO_SELECTION
+
+    if clicked is scene.btn_view:
+        video_view = 'grid' if video_view == 'list' else 'list'
+        scene.requested_range = None
+        return STATE_USB_VIDEO_SELECTION
+
+    if clicked is scene.btn_play_all:
+        play_video_slideshow_vlc(sorted_videos())
         return STATE_PLAYING_MEDIA
 
-    mouse_pos = pygame.mouse.get_pos()
-    clicked = pygame.mouse.get_pressed()[0]
-    if clicked:
-        for btn_rect, video_path in video_buttons:
-            if btn_rect.collidepoint(mouse_pos):
-                play_media_vlc_external(video_path, loop=False)
-                return STATE_PLAYING_MEDIA
+    # Renglón elegido con clic, Enter o el control remoto
+    row = scene.video_list.take_activated() if video_view == 'list' else scene.video_grid.take_activated()
+    if row is not None and row < len(usb_library.videos):
+        play_media_vlc([video_row_path(row)])
+        return STATE_PLAYING_MEDIA
     
     return STATE_USB_VIDEO_SELECTION
 
+def photo_label(index):
+    return usb_library.photos.basename(index)
+
+def photo_thumbnail(index):
+    return thumbnail_for(usb_library.photos[index])
+
+def build_usb_photo_grid_scene():
+    """Construye la escena de la cuadrícula de fotos."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.add_static_text("Fotos del USB", font_large, WHITE, SCREEN_WIDTH // 2, 80)
+    scene.btn_back_arrow = scene.add(create_back_button())
+
+    grid_rect = pygame.Rect(50, 150, SCREEN_WIDTH - 100, SCREEN_HEIGHT - 150 - 200)
+    scene.photo_grid = scene.add(ui_scene.ThumbnailGrid(grid_rect, THUMBNAIL_CELL, font_tiny, GRAY, LIGHT_BLUE, WHITE, THUMBNAIL_EVENT))
+    scene.requested_range = None
+    scene.shown_version = None
+
+    btn_slideshow = pygame.Rect(SCREEN_WIDTH // 2 - 250, SCREEN_HEIGHT - 180, 500, 70)
+    scene.btn_slideshow = scene.add(ui_scene.Button(btn_slideshow, GREEN, (0, 200, 0), "Reproducir presentación", font_medium))
+    return scene
+
+def usb_photo_grid_screen():
+    """Muestra las fotos del USB como miniaturas; al elegir una inicia la presentación desde ella."""
+    scene = get_scene(STATE_USB_PHOTO_GRID, None, build_usb_photo_grid_scene)
+    reset = usb_library.version != scene.shown_version
+    if reset:
+        scene.shown_version = usb_library.version
+        scene.requested_range = None
+    scene.photo_grid.set_items(len(usb_library.photos), photo_thumbnail, photo_label, reset=reset)
+    request_grid_thumbnails(scene, scene.photo_grid, 'photos', lambda index: usb_library.photos[index])
+    clicked = show_scene(scene)
+
+    if clicked is scene.btn_back_arrow:
+        return STATE_USB_SUBMENU
+
+    if clicked is scene.btn_slideshow:
+        play_slideshow(usb_library.photos.frozen())
+        return STATE_PHOTO_SLIDESHOW
+
+    index = scene.photo_grid.take_activated()
+    if index is not None and index < len(usb_library.photos):
+        play_slideshow(usb_library.photos.frozen(), index)
+        return STATE_PHOTO_SLIDESHOW
+
+    return STATE_USB_PHOTO_GRID
+
+def build_photo_slideshow_scene():
+    """Construye la escena de la presentación: una sola vista de imagen a pantalla completa."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK)
+    scene.slide = scene.add(ui_scene.ImageView((0, 0, SCREEN_WIDTH, SCREEN_HEIGHT), BLACK))
+    return scene
+
+def photo_slideshow_screen():
+    """Muestra la presentación de fotos; un clic o la flecha derecha avanza, ESC regresa."""
+    if photo_slideshow is None:
+        return slideshow_return_state
+
+    scene = get_scene(STATE_PHOTO_SLIDESHOW, None, build_photo_slideshow_scene)
+    surface = photo_slideshow.tick()
+    if surface is not None:
+        scene.slide.set_image(surface)
+    clicked = show_scene(scene)
+
+    if clicked is scene.slide:
+        photo_slideshow.step(1)
+    if photo_slideshow.exhausted:
+        print("Ninguna foto de la presentación se pudo mostrar.")
+        stop_slideshow()
+        return slideshow_return_state
+
+    return STATE_PHOTO_SLIDESHOW
+
+def open_folder_browser():
+    """Abre la exploración por carpetas: la raíz de la memoria si hay una sola, o la lista de memorias."""
+    global browse_path, browse_walk_path
+    browse_walk_path = None
+    if browse_path is None or usb_library.device_for_path(browse_path) is None:
+        browse_path = None
+        if len(usb_library.devices) == 1:
+            browse_path = next(iter(usb_library.devices.values())).mount_point
+    if browse_path is not None:
+        get_folder_browser().request(browse_path)
+    return STATE_USB_FOLDER_BROWSE
+
+def browse_to(path):
+    """Muestra otra carpeta; si ya estaba en caché aparece de inmediato y se revalida en segundo plano."""
+    global browse_path, browse_walk_path
+    browse_path = path
+    browse_walk_path = None
+    if path is not None:
+        get_folder_browser().request(path)
+
+def browse_parent():
+    """Carpeta superior de la mostrada: al salir de la raíz de una memoria se vuelve a la lista de memorias."""
+    device = usb_library.device_for_path(browse_path)
+    if device is None or browse_path.rstrip(os.sep) == usb_library.devices[device].mount_point.rstrip(os.sep):
+        return None
+    return os.path.dirname(browse_path.rstrip(os.sep))
+
+def browse_title():
+    if browse_path is None:
+        return "Memorias USB"
+    device = usb_library.device_for_path(browse_path)
+    if device is None:
+        return browse_path
+    library = usb_library.devices[device]
+    relative = os.path.relpath(browse_path, library.mount_point)
+    return library.label if relative == '.' else f"{library.label}/{relative}"
+
+def browse_rows(listing):
+    """Renglones de la carpeta mostrada: ('device', nodo), ('dir', nombre) o ('file', nombre, tipo)."""
+    if browse_path is None:
+        return [('device', device) for device in usb_library.devices]
+    if listing is None:
+        return []
+    return [('dir', name) for name in listing.dirs] + [('file', name, kind) for name, kind in listing.files]
+
+def browse_row_label(scene, row):
+    entry = scene.rows[row]
+    if entry[0] == 'device':
+        library = usb_library.devices.get(entry[1])
+        return f"{library.label}/" if library is not None else entry[1]
+    if entry[0] == 'dir':
+        # El conteo aparece en cuanto la lectura anticipada lista la subcarpeta
+        child = folder_cache.get(os.path.join(browse_path, entry[1]))
+        return f"{entry[1]}/   ({child.count()})" if child is not None else f"{entry[1]}/"
+    description = media_description(os.path.join(browse_path, entry[1]))
+    return f"{entry[1]}   {description}" if description else entry[1]
+
+def play_folder_media(media):
+    """Reproduce los medios de un subárbol: videos y música con VLC, o si solo hay fotos, la presentación."""
+    if media['videos'] or media['music']:
+        play_media_vlc(media['videos'] + media['music'], loop=True)
+        return STATE_PLAYING_MEDIA
+    if media['photos']:
+        play_slideshow(media['photos'], return_state=STATE_USB_FOLDER_BROWSE)
+        return STATE_PHOTO_SLIDESHOW
+    print("La carpeta no contiene medios.")
+    return STATE_USB_FOLDER_BROWSE
+
+def play_folder_file(listing, name, kind):
+    """Reproduce un archivo de la carpeta; música y fotos siguen con el resto de la carpeta."""
+    prefix = os.path.join(browse_path, '')
+    same_kind = [prefix + file_name for file_name, file_kind in listing.files if file_kind == kind]
+    index = same_kind.index(prefix + name)
+    if kind == 'videos':
+        play_media_vlc([prefix + name])
+        return STATE_PLAYING_MEDIA
+    if kind == 'music':
+        play_media_vlc(same_kind[index:] + same_kind[:index], loop=True)
+        return STATE_PLAYING_MEDIA
+    play_slideshow(same_kind, index, STATE_USB_FOLDER_BROWSE)
+    return STATE_PHOTO_SLIDESHOW
+
+def build_usb_folder_browse_scene():
+    """Construye la escena de exploración por carpetas con una lista virtualizada."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.title = scene.add(ui_scene.Label("", font_large, WHITE, SCREEN_WIDTH // 2, 80))
+    scene.status_label = scene.add(ui_scene.Label("", font_small, YELLOW, SCREEN_WIDTH // 2, 140))
+    scene.btn_back_arrow = scene.add(create_back_button())
+
+    list_rect = pygame.Rect(50, 180, SCREEN_WIDTH - 100, SCREEN_HEIGHT - 180 - 200)
+    scene.folder_list = scene.add(ui_scene.VirtualList(list_rect, 70, font_small, GRAY, LIGHT_BLUE, WHITE))
+    scene.rows = []
+    scene.shown_path = False
+    scene.shown_listing = None
+    scene.shown_devices = None
+    scene.shown_generation = None
+    scene.shown_metadata = None
+
+    btn_play_folder = pygame.Rect(SCREEN_WIDTH // 2 - 250, SCREEN_HEIGHT - 180, 500, 70)
+    scene.btn_play_folder = scene.add(ui_scene.Button(btn_play_folder, GREEN, (0, 200, 0), "Reproducir carpeta", font_medium))
+    return scene
+
+def usb_folder_browse_screen():
+    """Muestra una carpeta de la memoria; solo se lista la carpeta abierta (y por adelantado sus hijas)."""
+    global browse_walk_path
+    scene = get_scene(STATE_USB_FOLDER_BROWSE, None, build_usb_folder_browse_scene)
+    listing = folder_cache.get(browse_path) if browse_path is not None and folder_cache is not None else None
+    devices = tuple(usb_library.devices)
+    path_changed = browse_path != scene.shown_path
+    if path_changed or listing is not scene.shown_listing or devices != scene.shown_devices:
+        scene.rows = browse_rows(listing)
+        scene.folder_list.set_items(len(scene.rows), lambda row: browse_row_label(scene, row), reset=path_changed)
+        scene.folder_list.invalidate()
+        scene.title.set_text(browse_title())
+        scene.shown_path = browse_path
+        scene.shown_listing = listing
+        scene.shown_devices = devices
+    if scene.shown_generation != folder_generation or scene.shown_metadata != metadata_generation:
+        scene.shown_generation = folder_generation
+        scene.shown_metadata = metadata_generation
+        scene.folder_list.invalidate()
+
+    if browse_walk_path is not None:
+        scene.status_label.set_text("Preparando la lista de reproducción...")
+    elif browse_path is None:
+        scene.status_label.set_text("Elija una memoria" if devices else "Inserte una memoria USB")
+    elif listing is None:
+        scene.status_label.set_text("Leyendo carpeta...")
+    else:
+        scene.status_label.set_text(f"{len(listing.dirs)} carpetas, {len(listing.files)} archivos")
+    scene.btn_play_folder.set_visible(browse_path is not None and listing is not None and listing.count() > 0)
+    clicked = show_scene(scene)
+
+    if clicked is scene.btn_back_arrow:
+        if browse_path is None:
+            return STATE_USB_SUBMENU
+        parent = browse_parent()
+        if parent is None and len(usb_library.devices) == 1:
+            return STATE_USB_SUBMENU
+        browse_to(parent)
+        return STATE_USB_FOLDER_BROWSE
+
+    if clicked is scene.btn_play_folder:
+        # El recorrido del subárbol corre en segundo plano; FOLDER_EVENT inicia la reproducción
+        browse_walk_path = browse_path
+        get_folder_browser().walk(browse_path)
+        return STATE_USB_FOLDER_BROWSE
+
+    row = scene.folder_list.take_activated()
+    if row is not None and row < len(scene.rows):
+        entry = scene.rows[row]
+        if entry[0] == 'device':
+            library = usb_library.devices.get(entry[1])
+            if library is not None:
+                browse_to(library.mount_point)
+        elif entry[0] == 'dir':
+            browse_to(os.path.join(browse_path, entry[1]))
+        else:
+            return play_folder_file(listing, entry[1], entry[2])
+
+    return STATE_USB_FOLDER_BROWSE
+
+def is_search_key(event):
+    """True si la tecla edita la consulta (letras, números, espacio o retroceso); el resto mueve la lista."""
+    return event.key == pygame.K_BACKSPACE or (event.unicode != "" and event.unicode.isprintable())
+
+def search_row_label(scene, row):
+    path = scene.results[row]
+    description = media_description(path)
+    if description:
+        return f"{os.path.basename(path)}   {description}"
+    return os.path.basename(path)
+
+def build_usb_search_scene():
+    """Construye la escena de búsqueda: campo de texto y resultados en una lista virtualizada."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), DARK_BLUE)
+    scene.add_static_text("Buscar en USB", font_large, WHITE, SCREEN_WIDTH // 2, 60)
+    scene.btn_back_arrow = scene.add(create_back_button())
+    query_rect = pygame.Rect(50, 110, SCREEN_WIDTH - 100, 60)
+    scene.query_field = scene.add(ui_scene.TextField(query_rect, "Buscar: ", font_medium, WHITE, GRAY, WHITE, LIGHT_BLUE))
+    scene.query_field.set_active(True)
+    scene.status_label = scene.add(ui_scene.Label("", font_small, YELLOW, SCREEN_WIDTH // 2, 200))
+
+    list_rect = pygame.Rect(50, 240, SCREEN_WIDTH - 100, SCREEN_HEIGHT - 240 - 60)
+    scene.result_list = scene.add(ui_scene.VirtualList(list_rect, 70, font_small, GRAY, LIGHT_BLUE, WHITE))
+    scene.results = []
+    scene.total = 0
+    scene.more = False
+    scene.shown_query = None
+    scene.shown_version = None
+    scene.shown_metadata = None
+    return scene
+
+def usb_search_screen():
+    """Busca por nombre en todas las memorias conectadas; cada tecla vuelve a consultar el índice."""
+    scene = get_scene(STATE_USB_SEARCH, None, build_usb_search_scene)
+    index_version = search_index.version
+    if search_query != scene.shown_query or index_version != scene.shown_version:
+        with metrics.timer('search_seconds'):
+            scene.results, scene.total, scene.more = search_index.search(search_query)
+        # Solo una consulta nueva regresa la lista al inicio; los lotes del escaneo no la mueven
+        scene.result_list.set_items(len(scene.results), lambda row: search_row_label(scene, row),
+                                    reset=search_query != scene.shown_query)
+        scene.result_list.invalidate()
+        scene.shown_query = search_query
+        scene.shown_version = index_version
+    if scene.shown_metadata != metadata_generation:
+        scene.shown_metadata = metadata_generation
+        scene.result_list.invalidate()
+    scene.query_field.set_value(search_query)
+
+    if not search_query:
+        if search_index.pending():
+            scene.status_label.set_text(f"Indexando... {len(search_index)} archivos")
+        else:
+            size = f", {search_index.memory / (1024 * 1024):.1f} MB" if search_index.memory else ""
+            scene.status_label.set_text(f"{len(search_index)} archivos indexados{size}")
+    elif not scene.results:
+        scene.status_label.set_text("Sin resultados")
+    else:
+        total = f"{scene.total}+" if scene.more else str(scene.total)
+        shown = f" (se muestran {len(scene.results)})" if len(scene.results) < scene.total or scene.more else ""
+        scene.status_label.set_text(f"{total} resultados{shown}")
+    clicked = show_scene(scene)
+
+    if clicked is scene.btn_back_arrow:
+        return STATE_USB_SUBMENU
+
+    row = scene.result_list.take_activated()
+    if row is not None and row < len(scene.results):
+        path = scene.results[row]
+        if media_index.classify_media(path) == 'photos':
+            # La presentación recorre las fotos de los resultados, desde la elegida
+            photos = [result for result in scene.results if media_index.classify_media(result) == 'photos']
+            play_slideshow(photos, photos.index(path), STATE_USB_SEARCH)
+            return STATE_PHOTO_SLIDESHOW
+        play_media_vlc([path])
+        return STATE_PLAYING_MEDIA
+
+    return STATE_USB_SEARCH
+
+def build_playing_media_scene():
+    """Construye la escena que queda detrás del reproductor."""
+    scene = ui_scene.Scene((SCREEN_WIDTH, SCREEN_HEIGHT), BLACK)
+    scene.add_static_text("Reproduciendo multimedia...", font_large, WHITE, SCREEN_WIDTH // 2, 50)
+    scene.add_static_text("Presiona ESC para detener y volver al menú.", font_small, WHITE, SCREEN_WIDTH // 2, 120)
+    return scene
+
 def playing_media_screen():
     """Muestra la pantalla mientras se reproduce el contenido multimedia."""
-    screen.fill(BLACK)
-    draw_text("Reproduciendo multimedia...", font_large, WHITE, screen, SCREEN_WIDTH // 2, 50)
-    draw_text("Presiona ESC para detener y volver al menú.", font_small, WHITE, screen, SCREEN_WIDTH // 2, 120)
-
-    global vlc_process
-    # Regresar al menú principal si la reproducción externa de VLC ha terminado
-    if vlc_process and vlc_process.poll() is not None:
-        print("Reproducción externa de VLC terminada.")
-        vlc_process = None
-        return STATE_MAIN_MENU
+    scene = get_scene(STATE_PLAYING_MEDIA, None, build_playing_media_scene)
+    # Con video, libvlc dibuja sobre esta misma ventana: no pintar encima.
+    # El fin de la reproducción llega como PLAYBACK_EVENT al bucle principal.
+    if playback_engine is None or not playback_engine.has_video():
+        scene.render(screen)
 
     return STATE_PLAYING_MEDIA
 
+def on_stall(report):
+    """Avisa (desde el hilo vigilante) de un bloqueo del bucle principal."""
+    state = STATE_NAMES.get(report['state'], report['state'])
+    print(f"Bloqueo de {report['duration'] * 1000:.0f} ms en {state}; pilas en {STALL_LOG}")
+    metrics.inc('stalls_total', state=state)
+    metrics.observe('stall_seconds', report['duration'], state=state)
+
+watchdog = None
+if STALL_THRESHOLD_MS > 0:
+    watchdog = stall_watchdog.StallWatchdog(STALL_LOG, STALL_THRESHOLD_MS / 1000, on_stall=on_stall)
+
+def record_queue_depths(event_count):
+    """Registra la profundidad de las colas entre hilos (solo con las métricas activas)."""
+    metrics.set_gauge('queue_depth', event_count, queue='pygame_events')
+    metrics.set_gauge('queue_depth', usb_event_bus.qsize(), queue='usb_events')
+    metrics.set_gauge('queue_depth', len(thumbnail_service.heap), queue='thumbnails')
+    if metadata_extractor is not None:
+        metrics.set_gauge('queue_depth', metadata_extractor.pending(), queue='metadata')
+
+def metrics_hud_lines(state):
+    """Texto del HUD: tiempos de cuadro del estado actual, eventos y colas."""
+    def line(label, histogram):
+        if histogram is None or not histogram.count:
+            return f"{label}: sin datos"
+        return (f"{label}: p50 {histogram.quantile(0.5) * 1000:.0f} ms  p95 {histogram.quantile(0.95) * 1000:.0f} ms  "
+                f"máx {histogram.max * 1000:.0f} ms  (n={histogram.count})")
+    lines = [line(f"cuadro {STATE_NAMES.get(state, state)}", metrics.registry.histogram('frame_seconds', state=STATE_NAMES.get(state))),
+             line("eventos", metrics.registry.histogram('event_processing_seconds'))]
+    depths = "  ".join(f"{dict(key)['queue']}={value}" for (name, key), value in sorted(metrics.registry.gauges.items())
+                       if name == 'queue_depth')
+    lines.append("colas: " + depths)
+    return lines
+
+def draw_metrics_hud(state):
+    """Dibuja el HUD de métricas en la esquina superior izquierda, a lo mucho cada METRICS_HUD_REFRESH_S."""
+    global metrics_hud_drawn_at
+    now = time.monotonic()
+    if now - metrics_hud_drawn_at < METRICS_HUD_REFRESH_S and not ui_scene.dirty_rects:
+        return
+    metrics_hud_drawn_at = now
+    surfaces = [text_cache.render_text(text, font_tiny, YELLOW, volatile=True) for text in metrics_hud_lines(state)]
+    width = max(surface.get_width() for surface in surfaces) + 20
+    height = sum(surface.get_height() for surface in surfaces) + 20
+    hud_rect = pygame.Rect(0, 0, width, height)
+    screen.fill(BLACK, hud_rect)
+    y = 10
+    for surface in surfaces:
+        screen.blit(surface, (10, y))
+        y += surface.get_height()
+    ui_scene.dirty_rects.append(hud_rect)
+
 # --- Bucle Principal de la Aplicación ---
 def main_loop():
     """Bucle principal de la aplicación Pygame que gestiona los estados."""
-    global current_state, running, active_input_field, wifi_ssid_input, wifi_password_input, vlc_process, usb_thread
+    global current_state, running, active_input_field, wifi_ssid_input, wifi_password_input, usb_thread, pending_click_pos, wifi_success_until, metadata_generation, metrics_hud, browse_walk_path, folder_generation, search_query
+
+    # El pool de miniaturas se crea antes que los demás hilos (usa fork)
+    thumbnail_service.start()
 
     # Iniciar el hilo de monitoreo de USB una sola vez al inicio
     if usb_thread is None:
         usb_thread = threading.Thread(target=usb_monitor_thread_func, daemon=True)
         usb_thread.start()
 
-    # Si no hay conexión a internet al inicio, redirigir a la configuración Wi-Fi
-    if not is_connected_to_internet():
-        current_state = STATE_WIFI_SETUP
+    startup_timer.mark("pool de miniaturas y hilos")
+
+    # La conexión a internet se verifica en segundo plano; si no hay, se pasa a la
+    # configuración Wi-Fi cuando llegue el resultado (el menú se muestra mientras)
+    start_connectivity_check()
+    browser.start()
+
+    if metrics.enabled:
+        metrics.start_exporter(METRICS_FILE, METRICS_PORT)
+    if watchdog is not None:
+        watchdog.start()
 
-    vlc_process = None # Asegura que no haya un proceso VLC activo al inicio
+    clock = pygame.time.Clock()
+    frame_active = True # Hubo cambios en el último cuadro: seguir a FPS completos
+    frames_drawn = 0
+    start_time = time.monotonic()
+    start_cpu = time.process_time()
 
     while running:
-        for event in pygame.event.get():
+        if frame_active:
+            events = pygame.event.get()
+        else:
+            # Nada cambió: bloquear hasta que llegue un evento (entrada, USB, fin de
+            # un proceso o de la reproducción) o se cumpla el tiempo máximo. Mientras VLC ocupa la
+            # pantalla casi no hay nada que redibujar.
+            wait_ms = PLAYING_WAIT_MS if current_state == STATE_PLAYING_MEDIA else IDLE_WAIT_MS
+            if current_state == STATE_PHOTO_SLIDESHOW and photo_slideshow is not None:
+                # Despertar justo para la siguiente diapositiva; si aún se decodifica, lo avisa SLIDESHOW_EVENT
+                remaining = photo_slideshow.seconds_until_next()
+                if remaining is not None:
+                    wait_ms = int(remaining * 1000) + 1
+            elif current_state == STATE_WIFI_SUCCESS_MESSAGE and wifi_success_until is not None:
+                wait_ms = max(1, int((wifi_success_until - time.monotonic()) * 1000) + 1)
+            first_event = pygame.event.wait(wait_ms)
+            events = [first_event] + pygame.event.get() if first_event.type != pygame.NOEVENT else []
+
+        frame_start = time.perf_counter()
+        if watchdog is not None:
+            watchdog.frame_start(current_state)
+        previous_state = current_state
+        pending_click_pos = None
+        for event in events:
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                pending_click_pos = event.pos
+            elif event.type == THUMBNAIL_EVENT:
+                store_thumbnail(event.path, event.thumb_path)
+            elif event.type == METADATA_EVENT:
+                # Las etiquetas de las listas incluyen duración y resolución
+                metadata_generation += 1
+            elif event.type == FOLDER_EVENT:
+                if event.kind == 'walked':
+                    # Solo se reproduce si el usuario sigue esperando esa carpeta
+                    if event.path == browse_walk_path and current_state == STATE_USB_FOLDER_BROWSE:
+                        browse_walk_path = None
+                        current_state = play_folder_media(event.result)
+                elif event.path == browse_path or os.path.dirname(event.path) == browse_path:
+                    # La carpeta mostrada o el conteo de una subcarpeta cambió
+                    folder_generation += 1
+            elif event.type == CONNECTIVITY_EVENT:
+                # Solo redirigir si el usuario sigue en el menú principal
+                if not event.connected and current_state == STATE_MAIN_MENU:
+                    print("Sin conexión a internet: abriendo la configuración Wi-Fi.")
+                    current_state = STATE_WIFI_SETUP
+            elif event.type == WIFI_EVENT:
+                job = wifi_service.job
+                if event.kind == 'job' and job is not None and job.state == wifi_manager.JOB_CONNECTED:
+                    if current_state == STATE_WIFI_SETUP:
+                        wifi_success_until = time.monotonic() + WIFI_SUCCESS_SECONDS
+                        current_state = STATE_WIFI_SUCCESS_MESSAGE
+            elif event.type == PLAYBACK_EVENT:
+                if event.kind == 'first_frame':
+                    print(f"Primer cuadro en {event.ttff * 1000:.0f} ms: {event.path}")
+                elif current_state == STATE_PLAYING_MEDIA and event.kind in ('ended', 'error'):
+                    if event.kind == 'error':
+                        print(f"Error de reproducción: {event.path}")
+                    # Detener también al terminar: así se registran las estadísticas del último elemento
+                    stop_current_playback()
+                    print("Reproducción terminada.")
+                    current_state = STATE_MAIN_MENU
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                # Otra ventana (Chromium) cubrió la pantalla: redibujar todo
+                ui_scene.invalidate_all()
+            elif event.type == pygame.WINDOWFOCUSGAINED:
+                # Se volvió a la aplicación: el navegador regresa a reposo (sin audio ni video)
+                browser.hide()
+
+            # Teclado y rueda del ratón para los widgets de la escena visible; mientras
+            # se escribe en un campo de Wi-Fi las teclas no mueven la lista de redes
+            typing = event.type == pygame.KEYDOWN and (
+                (current_state == STATE_WIFI_SETUP and active_input_field)
+                or (current_state == STATE_USB_SEARCH and is_search_key(event)))
+            if ui_scene.active_scene is not None and not typing:
+                ui_scene.active_scene.handle_event(event)
             
             # Manejo de entrada de texto en la pantalla de configuración Wi-Fi
             if current_state == STATE_WIFI_SETUP:
                 if event.type == pygame.MOUSEBUTTONDOWN:
-                    ssid_rect = pygame.Rect(SCREEN_WIDTH // 2 - 300, 250, 600, 60)
-                    pass_rect = pygame.Rect(SCREEN_WIDTH // 2 - 300, 350, 600, 60)
-                    if ssid_rect.collidepoint(event.pos):
+                    if WIFI_SSID_RECT.collidepoint(event.pos):
                         active_input_field = 'ssid'
-                    elif pass_rect.collidepoint(event.pos):
+                    elif WIFI_PASS_RECT.collidepoint(event.pos):
                         active_input_field = 'password'
                     else:
                         active_input_field = None
 
                 if event.type == pygame.KEYDOWN and active_input_field:
-                    if event.key == pygame.K_BACKSPACE:
-                        if active_input_field == 'ssid':
-                            wifi_ssid_input = wifi_ssid_input[:-1]
-                        else:
-                            wifi_password_input = wifi_password_input[:-1]
-                    elif event.key == pygame.K_RETURN:
-                        active_input_field = None
+                    if active_input_field == 'ssid':
+                        wifi_ssid_input, done = edit_text(wifi_ssid_input, event)
                     else:
-                        if active_input_field == 'ssid':
-                            wifi_ssid_input += event.unicode
-                        else:
-                            wifi_password_input += event.unicode
+                        wifi_password_input, done = edit_text(wifi_password_input, event)
+                    if done:
+                        active_input_field = None
+
+            # En la búsqueda, las letras y el retroceso editan la consulta (cada tecla busca de nuevo)
+            if current_state == STATE_USB_SEARCH and typing:
+                search_query, _ = edit_text(search_query, event)
             
             # Manejo de la tecla ESC para salir de estados o detener reproducción
             if event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_ESCAPE:
+                if event.key == pygame.K_F3:
+                    # HUD de métricas; al mostrarlo se activa la medición
+                    metrics_hud = not metrics_hud
+                    if metrics_hud and not metrics.enabled:
+                        metrics.enable()
+                        metrics.start_exporter(METRICS_FILE, METRICS_PORT)
+                    ui_scene.invalidate_all()
+                elif event.key == pygame.K_ESCAPE:
                     if current_state == STATE_PLAYING_MEDIA:
                         stop_current_playback()
                         current_state = STATE_MAIN_MENU
+                    elif current_state == STATE_PHOTO_SLIDESHOW:
+                        stop_slideshow()
+                        current_state = slideshow_return_state
                     elif current_state in [STATE_USB_SUBMENU, STATE_USB_LOADING, STATE_USB_NO_MEDIA,
-                                           STATE_USB_MIXED_CHOICE, STATE_USB_VIDEO_SELECTION,
-                                           STATE_WIFI_SETUP, STATE_WIFI_SUCCESS_MESSAGE]:
+                                           STATE_USB_MIXED_CHOICE, STATE_USB_VIDEO_SELECTION, STATE_USB_PHOTO_GRID,
+                                           STATE_USB_FOLDER_BROWSE, STATE_USB_SEARCH, STATE_WIFI_SETUP, STATE_WIFI_SUCCESS_MESSAGE]:
                         current_state = STATE_MAIN_MENU
                     elif current_state != STATE_MAIN_MENU: # Cualquier otro estado vuelve al menú principal
                         current_state = STATE_MAIN_MENU
+                elif current_state == STATE_PHOTO_SLIDESHOW and photo_slideshow is not None:
+                    # Flechas para recorrer la presentación a mano
+                    if event.key == pygame.K_RIGHT:
+                        photo_slideshow.step(1)
+                    elif event.key == pygame.K_LEFT:
+                        photo_slideshow.step(-1)
 
-        # Procesar eventos de USB desde la cola del hilo
-        while usb_event_queue:
-            usb_event = usb_event_queue.pop(0)
-            if usb_event['type'] == 'usb_inserted':
-                usb_data['mount_point'] = usb_event['mount_point']
-                usb_data['photos'] = usb_event['photos']
-                usb_data['music'] = usb_event['music']
-                usb_data['videos'] = usb_event['videos']
-                
-                print(f"Datos de USB actualizados: Fotos={len(usb_data['photos'])}, Música={len(usb_data['music'])}, Videos={len(usb_data['videos'])}")
-
-            elif usb_event['type'] == 'usb_removed':
-                stop_current_playback()
-                usb_data['mount_point'] = None
-                usb_data['photos'] = []
-                usb_data['music'] = []
-                usb_data['videos'] = []
-                # Si se remueve el USB, regresar al menú principal si estaba en un estado relacionado
-                if current_state in [STATE_USB_LOADING, STATE_USB_MIXED_CHOICE, STATE_USB_VIDEO_SELECTION, STATE_USB_NO_MEDIA, STATE_PLAYING_MEDIA, STATE_USB_SUBMENU]:
-                    current_state = STATE_MAIN_MENU
-                print("Memoria USB desconectada.")
+        # Procesar eventos de USB desde el bus
+        current_state = process_usb_events(current_state)
+
+        events_done = time.perf_counter()
+        screen_state = current_state
 
         # Renderizar la pantalla actual según el estado de la aplicación
         if current_state == STATE_MAIN_MENU:
@@ -731,17 +1724,74 @@ def main_loop():
             current_state = usb_mixed_choice_screen()
         elif current_state == STATE_USB_VIDEO_SELECTION:
             current_state = usb_video_selection_screen()
+        elif current_state == STATE_USB_PHOTO_GRID:
+            current_state = usb_photo_grid_screen()
+        elif current_state == STATE_PHOTO_SLIDESHOW:
+            current_state = photo_slideshow_screen()
+        elif current_state == STATE_USB_FOLDER_BROWSE:
+            current_state = usb_folder_browse_screen()
+        elif current_state == STATE_USB_SEARCH:
+            current_state = usb_search_screen()
         elif current_state == STATE_PLAYING_MEDIA:
             current_state = playing_media_screen()
             
         if current_state == -1: # Estado de salida de la aplicación
             running = False
 
-        pygame.display.flip()
-        pygame.time.Clock().tick(30) # Limitar a 30 FPS
+        # La búsqueda periódica de redes solo corre con la pantalla de Wi-Fi visible
+        wifi_service.set_scanning(current_state == STATE_WIFI_SETUP)
+        collect_playback_telemetry(current_state)
+        # Las listas largas llegan a libvlc por partes, una en cada vuelta, igual que las
+        # pistas nuevas de una música que empezó durante el escaneo
+        if playback_engine is not None:
+            playback_engine.append_available()
+
+        if metrics.enabled:
+            metrics.observe('event_processing_seconds', events_done - frame_start)
+            metrics.observe('frame_seconds', time.perf_counter() - events_done, state=STATE_NAMES.get(screen_state))
+            record_queue_depths(len(events))
+            # Con video, libvlc dibuja sobre la ventana: no pintar el HUD encima
+            if metrics_hud and running and (playback_engine is None or not playback_engine.has_video()):
+                draw_metrics_hud(current_state)
+
+        # Enviar al display solo los rectángulos que cambiaron
+        dirty_rects = ui_scene.take_dirty_rects()
+        if dirty_rects:
+            pygame.display.update(dirty_rects)
+            frames_drawn += 1
+            if not startup_timer.reported:
+                startup_timer.mark("primer cuadro")
+                startup_timer.report(STARTUP_TARGET_MS)
+        if watchdog is not None:
+            watchdog.frame_end()
+        frame_active = (bool(dirty_rects) or current_state != previous_state
+                        or (playback_engine is not None and playback_engine.pending_items() > 0))
+        if frame_active:
+            clock.tick(FPS) # Limitar a 30 FPS
 
     # Limpieza al salir
+    elapsed = time.monotonic() - start_time
+    if elapsed > 0:
+        print(f"Uso de CPU de la GUI: {100 * (time.process_time() - start_cpu) / elapsed:.1f}% en {elapsed:.0f} s ({frames_drawn} cuadros dibujados)")
+    print(f"Caché de texto: {text_cache.default_cache.stats()}")
     stop_current_playback()
+    if playback_engine is not None:
+        playback_engine.stop()
+        average_ttff = playback_engine.average_ttff()
+        if average_ttff is not None:
+            print(f"Tiempo promedio al primer cuadro: {average_ttff * 1000:.0f} ms ({len(playback_engine.ttff_samples)} medios)")
+        print(f"Atascos de reproducción: {playback_engine.stalls}; lectura anticipada: {playback_prefetcher.stats()}")
+        collect_playback_telemetry(None)
+        print(f"Niveles de decodificación por códec: {playback_history.summary()}")
+    if watchdog is not None and watchdog.stalls:
+        print(f"Bloqueos del bucle principal: {watchdog.stalls} (el más largo de {watchdog.longest * 1000:.0f} ms); ver {STALL_LOG}")
+    if metadata_extractor is not None:
+        print(f"Metadatos: {metadata_extractor.parsed} analizados, {metadata_extractor.cached} desde la base, "
+              f"{metadata_extractor.failed} fallidos, {metadata_extractor.pending()} pendientes")
+    if metrics.enabled:
+        metrics.registry.write_textfile(METRICS_FILE)
+    browser.stop()
+    thumbnail_service.stop()
     pygame.quit()
     sys.exit()
 
@@ -0,0 +1,282 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Presentación de fotos con decodificación anticipada
+# License: MIT
+#--------------------------------------------------
+
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence
+
+import pygame
+
+DEFAULT_SLIDE_SECONDS = 3.0
+DEFAULT_DECODE_AHEAD = 3
+EXIF_ORIENTATION_TAG = 0x0112
+
+# --- Orientación EXIF ---
+def _tiff_orientation(tiff):
+    """Busca la etiqueta de orientación en el primer IFD de un bloque TIFF/EXIF."""
+    if len(tiff) < 8:
+        return 1
+    if tiff[:2] == b'II':
+        order = 'little'
+    elif tiff[:2] == b'MM':
+        order = 'big'
+    else:
+        return 1
+    ifd = int.from_bytes(tiff[4:8], order)
+    if ifd + 2 > len(tiff):
+        return 1
+    for i in range(int.from_bytes(tiff[ifd:ifd + 2], order)):
+        entry = ifd + 2 + 12 * i
+        if entry + 12 > len(tiff):
+            break
+        if int.from_bytes(tiff[entry:entry + 2], order) == EXIF_ORIENTATION_TAG:
+            value = int.from_bytes(tiff[entry + 8:entry + 10], order)
+            return value if 1 <= value <= 8 else 1
+    return 1
+
+def exif_orientation(path):
+    """Regresa la orientación EXIF (1-8) de un JPEG; 1 si no tiene o no es JPEG.
+
+    Solo se leen los primeros 64 KB, donde los JPEG guardan el segmento APP1.
+    """
+    try:
+        with open(path, 'rb') as f:
+            data = f.read(65536)
+    except OSError:
+        return 1
+    if data[:2] != b'\xff\xd8':
+        return 1
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return 1
+        marker = data[pos + 1]
+        if marker == 0xFF: # Relleno entre segmentos
+            pos += 1
+            continue
+        if marker in (0xDA, 0xD9): # Inicio de los datos de imagen: ya no hay EXIF
+            return 1
+        length = int.from_bytes(data[pos + 2:pos + 4], 'big')
+        if marker == 0xE1 and data[pos + 4:pos + 10] == b'Exif\x00\x00':
+            return _tiff_orientation(data[pos + 10:pos + 2 + length])
+        pos += 2 + length
+    return 1
+
+def apply_orientation(surface, orientation):
+    """Gira o refleja la superficie para que se vea como la tomó la cámara."""
+    if orientation in (2, 4, 5, 7):
+        surface = pygame.transform.flip(surface, orientation in (2, 5, 7), orientation == 4)
+    if orientation == 3:
+        surface = pygame.transform.rotate(surface, 180)
+    elif orientation in (5, 8):
+        surface = pygame.transform.rotate(surface, 90)
+    elif orientation in (6, 7):
+        surface = pygame.transform.rotate(surface, -90)
+    return surface
+
+def decode_slide(path, screen_size):
+    """Decodifica una foto y la reduce para caber en la pantalla, ya orientada."""
+    image = pygame.image.load(path)
+    orientation = exif_orientation(path)
+    width, height = image.get_size()
+    if orientation >= 5: # Se girará 90°: ajustar con las medidas ya rotadas
+        width, height = height, width
+    scale = min(screen_size[0] / width, screen_size[1] / height, 1.0)
+    target = (max(1, int(width * scale)), max(1, int(height * scale)))
+    if orientation >= 5:
+        target = (target[1], target[0])
+    if target != image.get_size():
+        if image.get_bitsize() in (24, 32):
+            image = pygame.transform.smoothscale(image, target)
+        else:
+            image = pygame.transform.scale(image, target)
+    image = apply_orientation(image, orientation)
+    # Convertir al formato del display para que el blit de cada diapositiva sea directo
+    if pygame.display.get_surface() is not None:
+        image = image.convert()
+    return image
+
+# --- Caché y decodificador ---
+class SlideCache:
+    """LRU de diapositivas ya escaladas, acotada por bytes de píxeles."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+
+    def get(self, path):
+        surface = self.entries.get(path)
+        if surface is not None:
+            self.entries.move_to_end(path)
+        return surface
+
+    def put(self, path, surface):
+        old = self.entries.pop(path, None)
+        if old is not None:
+            self.total_bytes -= old.get_bytesize() * old.get_width() * old.get_height()
+        self.entries[path] = surface
+        self.total_bytes += surface.get_bytesize() * surface.get_width() * surface.get_height()
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.total_bytes -= evicted.get_bytesize() * evicted.get_width() * evicted.get_height()
+
+    def clear(self):
+        self.entries.clear()
+        self.total_bytes = 0
+
+class SlideDecoder:
+    """Hilo que decodifica por adelantado las fotos que la presentación va a necesitar.
+
+    set_window() indica las rutas en orden de urgencia (la actual primero).
+    La memoria queda acotada por la caché sin importar cuántas fotos haya;
+    los archivos que no se pueden decodificar se marcan como fallidos para
+    que la presentación los salte. on_ready(ruta) se llama desde el hilo.
+    """
+
+    def __init__(self, screen_size, on_ready=None, ahead=DEFAULT_DECODE_AHEAD, max_bytes=None):
+        self.screen_size = screen_size
+        self.on_ready = on_ready
+        self.ahead = ahead
+        if max_bytes is None:
+            # La ventana (anterior, actual y las siguientes) con margen de una más
+            max_bytes = (ahead + 3) * screen_size[0] * screen_size[1] * 4
+        self.cache = SlideCache(max_bytes)
+        self.failed = set()
+        self.wanted = []
+        self.generation = 0 # Se incrementa al limpiar; descarta decodificaciones viejas
+        self.lock = threading.Condition()
+        self.thread = None
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def set_window(self, paths):
+        with self.lock:
+            self.wanted = list(paths)
+            self.lock.notify()
+
+    def get(self, path):
+        with self.lock:
+            return self.cache.get(path)
+
+    def is_failed(self, path):
+        with self.lock:
+            return path in self.failed
+
+    def clear(self):
+        """Olvida todo (p. ej. al retirar la memoria USB)."""
+        with self.lock:
+            self.generation += 1
+            self.wanted = []
+            self.cache.clear()
+            self.failed.clear()
+
+    def _next_job(self):
+        for path in self.wanted:
+            if path not in self.failed and path not in self.cache.entries:
+                return path
+        return None
+
+    def _run(self):
+        while True:
+            with self.lock:
+                path = self._next_job()
+                while path is None:
+                    self.lock.wait()
+                    path = self._next_job()
+                generation = self.generation
+            try:
+                surface = decode_slide(path, self.screen_size)
+            except Exception as e:
+                print(f"No se pudo mostrar la foto {path}: {e}")
+                surface = None
+            with self.lock:
+                # Si mientras tanto se limpió la caché, el resultado ya no se quiere
+                if generation == self.generation:
+                    if surface is None:
+                        self.failed.add(path)
+                    else:
+                        self.cache.put(path, surface)
+            if self.on_ready:
+                self.on_ready(path)
+
+class Slideshow:
+    """Lleva el orden y los tiempos de la presentación sin bloquear la GUI.
+
+    Si la siguiente foto aún no está decodificada se mantiene la actual
+    hasta que llegue; las fotos fallidas se saltan.
+    """
+
+    def __init__(self, paths, decoder, start_index=0, duration=DEFAULT_SLIDE_SECONDS):
+        self.paths = paths if isinstance(paths, Sequence) else list(paths)
+        self.decoder = decoder
+        self.duration = duration
+        self.index = start_index % len(self.paths) if self.paths else 0
+        self.shown_index = None
+        self.shown_at = None
+        self.exhausted = False # Ninguna foto de la lista se pudo decodificar
+        self._request()
+
+    def _window(self):
+        count = len(self.paths)
+        order = [self.index]
+        for offset in range(1, self.decoder.ahead + 1):
+            order.append((self.index + offset) % count)
+        order.append((self.index - 1) % count)
+        return [self.paths[i] for i in dict.fromkeys(order)]
+
+    def _request(self):
+        if self.paths:
+            self.decoder.set_window(self._window())
+
+    def step(self, delta):
+        """Avanza (o retrocede) manualmente; la foto se muestra en cuanto esté lista."""
+        if self.paths:
+            self.index = (self.index + delta) % len(self.paths)
+            self.shown_at = None
+            self._request()
+
+    def tick(self, now=None):
+        """Regresa la superficie a mostrar si cambió la diapositiva, o None."""
+        if not self.paths:
+            return None
+        now = time.monotonic() if now is None else now
+        if self.shown_at is not None and now - self.shown_at >= self.duration:
+            self.index = (self.index + 1) % len(self.paths)
+            self.shown_at = None
+            self._request()
+        if self.shown_at is not None:
+            return None
+
+        # Saltar las fallidas; si ninguna de la lista sirve, no hay nada que mostrar
+        for _ in range(len(self.paths)):
+            if not self.decoder.is_failed(self.paths[self.index]):
+                break
+            self.index = (self.index + 1) % len(self.paths)
+            self._request()
+        else:
+            self.exhausted = True
+            return None
+
+        surface = self.decoder.get(self.paths[self.index])
+        if surface is None:
+            return None # Todavía se decodifica: seguir mostrando la anterior
+        self.shown_index = self.index
+        self.shown_at = now
+        return surface
+
+    def seconds_until_next(self, now=None):
+        """Tiempo hasta el siguiente cambio, para saber cuánto puede dormir el bucle."""
+        if self.shown_at is None:
+            return None
+        now = time.monotonic() if now is None else now
+        return max(0.0, self.shown_at + self.duration - now)
@@ -0,0 +1,139 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Vigilancia de bloqueos del bucle principal con muestreo de pilas
+# License: MIT
+#--------------------------------------------------
+
+import os
+import sys
+import time
+import threading
+from collections import Counter
+
+STALL_THRESHOLD_S = 0.25  # Un cuadro que tarda más que esto se considera bloqueo
+SAMPLE_INTERVAL_S = 0.01
+MAX_STACK_DEPTH = 40
+REPORT_STACKS = 8         # Pilas distintas que se escriben por bloqueo (las más frecuentes)
+LOG_MAX_BYTES = 256 * 1024
+LOG_BACKUPS = 3
+
+def stack_key(frame, depth=MAX_STACK_DEPTH):
+    """Pila de un marco como tupla de 'archivo:función:línea', de la raíz hacia adentro.
+
+    No usa traceback/linecache: leer el código fuente desde el hilo vigilante
+    tocaría el disco mientras el principal está bloqueado.
+    """
+    entries = []
+    while frame is not None and len(entries) < depth:
+        code = frame.f_code
+        entries.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    entries.reverse()
+    return tuple(entries)
+
+def format_report(report):
+    """Texto compacto de un bloqueo: encabezado y pilas agregadas en formato 'colapsado'
+    (marcos separados por ';' y el número de muestras), el que leen las herramientas de flame graphs."""
+    samples = report['samples']
+    total = sum(samples.values())
+    lines = [f"=== {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(report['time']))} "
+             f"bloqueo de {report['duration'] * 1000:.0f} ms en el estado {report['state']} "
+             f"({total} muestras) ==="]
+    for stack, count in samples.most_common(REPORT_STACKS):
+        lines.append(f"{count} {100 * count / total:.0f}% {';'.join(stack)}")
+    if len(samples) > REPORT_STACKS:
+        rest = total - sum(count for _, count in samples.most_common(REPORT_STACKS))
+        lines.append(f"{rest} otras {len(samples) - REPORT_STACKS} pilas")
+    if not total:
+        # El hilo principal retuvo el GIL todo el tiempo (p. ej. dentro de una llamada en C)
+        lines.append("sin muestras: el hilo principal no soltó el intérprete")
+    return "\n".join(lines) + "\n"
+
+class StallWatchdog:
+    """Detecta cuadros del bucle principal que tardan más que threshold_s.
+
+    El bucle llama frame_start(estado) cuando empieza a trabajar (después de
+    esperar eventos: la espera no cuenta como bloqueo) y frame_end() al
+    terminar el cuadro. Si un cuadro rebasa el umbral, el hilo vigilante
+    muestrea la pila del hilo principal cada sample_interval_s hasta que el
+    cuadro termina y agrega el bloqueo a log_path, que rota al pasar de
+    LOG_MAX_BYTES. on_stall(reporte) se llama desde el hilo vigilante.
+    """
+
+    def __init__(self, log_path, threshold_s=STALL_THRESHOLD_S, sample_interval_s=SAMPLE_INTERVAL_S, on_stall=None):
+        self.log_path = log_path
+        self.threshold = threshold_s
+        self.sample_interval = sample_interval_s
+        self.on_stall = on_stall
+        self.main_thread_id = threading.main_thread().ident
+        self.frame_started = None
+        self.frame_serial = 0
+        self.state = None
+        self.thread = None
+        self.stalls = 0
+        self.longest = 0.0
+
+    def start(self):
+        if self.thread is None:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def frame_start(self, state):
+        self.state = state
+        self.frame_serial += 1
+        self.frame_started = time.monotonic()
+
+    def frame_end(self):
+        self.frame_started = None
+
+    def _run(self):
+        while True:
+            started = self.frame_started
+            if started is None:
+                time.sleep(self.threshold / 2)
+                continue
+            remaining = started + self.threshold - time.monotonic()
+            if remaining > 0:
+                time.sleep(remaining)
+                continue
+            serial = self.frame_serial
+            if self.frame_started != started:
+                continue
+            self._sample(serial, started)
+
+    def _sample(self, serial, started):
+        """Muestrea la pila del hilo principal mientras siga el mismo cuadro."""
+        state = self.state
+        samples = Counter()
+        while self.frame_serial == serial and self.frame_started is not None:
+            frame = sys._current_frames().get(self.main_thread_id)
+            if frame is not None:
+                samples[stack_key(frame)] += 1
+            del frame
+            time.sleep(self.sample_interval)
+        duration = time.monotonic() - started
+        self.stalls += 1
+        self.longest = max(self.longest, duration)
+        report = {'time': time.time(), 'duration': duration, 'state': state, 'samples': samples}
+        self._write(format_report(report))
+        if self.on_stall:
+            self.on_stall(report)
+
+    def _rotate(self):
+        for index in range(LOG_BACKUPS - 1, 0, -1):
+            older = f"{self.log_path}.{index}"
+            if os.path.exists(older):
+                os.replace(older, f"{self.log_path}.{index + 1}")
+        os.replace(self.log_path, self.log_path + ".1")
+
+    def _write(self, text):
+        try:
+            os.makedirs(os.path.dirname(self.log_path), exist_ok=True)
+            if os.path.exists(self.log_path) and os.path.getsize(self.log_path) + len(text) > LOG_MAX_BYTES:
+                self._rotate()
+            with open(self.log_path, 'a') as f:
+                f.write(text)
+        except OSError as e:
+            print(f"No se pudo escribir el registro de bloqueos {self.log_path}: {e}")
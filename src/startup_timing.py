@@ -0,0 +1,60 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Medición de los tiempos de arranque hasta el primer cuadro
+# License: MIT
+#--------------------------------------------------
+
+import os
+import time
+
+def process_age():
+    """Segundos desde que arrancó el proceso (incluye cargar el intérprete), o None."""
+    try:
+        with open('/proc/self/stat') as f:
+            # El nombre del programa va entre paréntesis y puede tener espacios
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        ticks = os.sysconf('SC_CLK_TCK')
+        return max(0.0, uptime - int(fields[19]) / ticks)
+    except (OSError, ValueError, IndexError):
+        return None
+
+class StartupTimer:
+    """Registra cuánto tarda cada fase del arranque y lo reporta al dibujar el primer cuadro."""
+
+    def __init__(self):
+        now = time.monotonic()
+        self.interpreter = process_age()
+        self.start = now
+        self.last = now
+        self.phases = []
+        self.reported = False
+
+    def mark(self, phase):
+        """Cierra la fase actual con el nombre dado."""
+        now = time.monotonic()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def total(self):
+        """Tiempo total hasta la última marca, incluyendo la carga del intérprete."""
+        return self.last - self.start + (self.interpreter or 0.0)
+
+    def report(self, target_ms=None):
+        """Imprime el desglose una sola vez."""
+        if self.reported:
+            return
+        self.reported = True
+        print("Tiempos de arranque:")
+        if self.interpreter is not None:
+            print(f"  {'intérprete de Python':<24} {self.interpreter * 1000:7.0f} ms")
+        for phase, seconds in self.phases:
+            print(f"  {phase:<24} {seconds * 1000:7.0f} ms")
+        total_ms = self.total() * 1000
+        line = f"  {'total al primer cuadro':<24} {total_ms:7.0f} ms"
+        if target_ms is not None:
+            line += f" (objetivo {target_ms} ms: {'cumplido' if total_ms <= target_ms else 'excedido'})"
+        print(line)
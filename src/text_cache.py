@@ -0,0 +1,85 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Caché LRU de superficies de texto renderizadas
+# License: MIT
+#--------------------------------------------------
+
+from collections import OrderedDict
+
+class TextCache:
+    """Caché LRU de superficies de texto con clave (texto, fuente, color, antialias).
+
+    Se limita por número de entradas y por bytes de píxeles. Los textos que
+    cambian con cada tecla (campos de SSID/contraseña) se guardan en una
+    partición "volátil" aparte y pequeña, para que no desplacen a los títulos
+    y nombres de archivo de la partición principal.
+    """
+
+    def __init__(self, max_entries=512, max_bytes=16 * 1024 * 1024, volatile_entries=16):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.volatile_entries = volatile_entries
+        self.entries = OrderedDict()
+        self.volatile = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def render(self, text, font, color, antialias=True, volatile=False):
+        """Regresa la superficie del texto, renderizándola solo si no está en caché."""
+        if not isinstance(color, tuple):
+            color = tuple(color)
+        key = (text, font, color, antialias)
+        partition = self.volatile if volatile else self.entries
+        surface = partition.get(key)
+        if surface is not None:
+            partition.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = font.render(text, antialias, color)
+        partition[key] = surface
+        if volatile:
+            while len(self.volatile) > self.volatile_entries:
+                self.volatile.popitem(last=False)
+                self.evictions += 1
+        else:
+            self.total_bytes += self._surface_bytes(surface)
+            while self.entries and (len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes):
+                _, old_surface = self.entries.popitem(last=False)
+                self.total_bytes -= self._surface_bytes(old_surface)
+                self.evictions += 1
+        return surface
+
+    def _surface_bytes(self, surface):
+        return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+    def invalidate(self):
+        """Descarta todas las superficies (p. ej. si se vuelven a cargar las fuentes)."""
+        self.entries.clear()
+        self.volatile.clear()
+        self.total_bytes = 0
+
+    def stats(self):
+        """Regresa los contadores de aciertos/fallos y el tamaño actual de la caché."""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'entries': len(self.entries),
+            'volatile_entries': len(self.volatile),
+            'bytes': self.total_bytes,
+        }
+
+# Caché compartida por draw_text y los widgets de la GUI
+default_cache = TextCache()
+
+def render_text(text, font, color, antialias=True, volatile=False):
+    """Renderiza texto usando la caché compartida."""
+    return default_cache.render(text, font, color, antialias, volatile)
@@ -0,0 +1,234 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Generación de miniaturas en segundo plano con caché en disco
+# License: MIT
+#--------------------------------------------------
+
+import os
+import heapq
+import shutil
+import hashlib
+import threading
+import subprocess
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+# Prioridades de las solicitudes: menor número se atiende primero
+PRIORITY_VISIBLE = 0
+PRIORITY_PREFETCH = 1
+
+def generate_thumbnail(kind, src_path, dest_path, size):
+    """Genera la miniatura de src_path en dest_path (se ejecuta en un proceso del pool).
+
+    Las imágenes se decodifican con pygame y se reducen con smoothscale; para
+    los videos se extrae un cuadro con ffmpeg. Regresa True si se generó.
+    """
+    tmp_path = dest_path + ".tmp.png"
+    try:
+        if kind == 'videos':
+            ffmpeg = shutil.which('ffmpeg')
+            if not ffmpeg:
+                return False
+            # Un cuadro a unos segundos del inicio evita las pantallas negras de entrada
+            for seek in ('5', '0'):
+                result = subprocess.run([ffmpeg, '-loglevel', 'error', '-y', '-ss', seek, '-i', src_path,
+                                         '-frames:v', '1', '-vf',
+                                         f'scale={size[0]}:{size[1]}:force_original_aspect_ratio=decrease',
+                                         tmp_path],
+                                        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, timeout=30)
+                if result.returncode == 0 and os.path.exists(tmp_path):
+                    break
+            else:
+                return False
+        else:
+            import pygame
+            image = pygame.image.load(src_path)
+            width, height = image.get_size()
+            scale = min(size[0] / width, size[1] / height, 1.0)
+            target = (max(1, int(width * scale)), max(1, int(height * scale)))
+            # smoothscale solo acepta superficies de 24 o 32 bits (los GIF suelen ser de 8)
+            if image.get_bitsize() in (24, 32):
+                thumb = pygame.transform.smoothscale(image, target)
+            else:
+                thumb = pygame.transform.scale(image, target)
+            pygame.image.save(thumb, tmp_path)
+        os.replace(tmp_path, dest_path)
+        return True
+    except Exception as e:
+        print(f"No se pudo generar la miniatura de {src_path}: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return False
+
+class ThumbnailCache:
+    """Caché de miniaturas en disco con clave ruta+tamaño+mtime y desalojo LRU por bytes totales.
+
+    El orden LRU se lleva con el mtime de cada archivo de miniatura, que se
+    actualiza en cada acierto.
+    """
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = None # Se calcula la primera vez que se necesita
+        self.lock = threading.Lock()
+
+    def key_path(self, path, size, mtime, thumb_size):
+        key = f"{path}\0{size}\0{mtime}\0{thumb_size[0]}x{thumb_size[1]}"
+        return os.path.join(self.cache_dir, hashlib.sha1(key.encode('utf-8', 'surrogateescape')).hexdigest() + ".png")
+
+    def lookup(self, thumb_path):
+        """Regresa True si la miniatura existe y la marca como usada recientemente."""
+        try:
+            os.utime(thumb_path)
+            return True
+        except OSError:
+            return False
+
+    def _scan(self):
+        entries = []
+        try:
+            with os.scandir(self.cache_dir) as it:
+                for entry in it:
+                    if entry.name.endswith(".png") and not entry.name.endswith(".tmp.png"):
+                        st = entry.stat()
+                        entries.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            pass
+        return entries
+
+    def added(self, thumb_path):
+        """Registra una miniatura nueva y desaloja las menos usadas si se excede el límite."""
+        with self.lock:
+            if self.total_bytes is None:
+                self.total_bytes = sum(size for _, size, _ in self._scan())
+            else:
+                try:
+                    self.total_bytes += os.path.getsize(thumb_path)
+                except OSError:
+                    return
+            if self.total_bytes <= self.max_bytes:
+                return
+            # Desalojar hasta quedar al 90% del límite para no hacerlo en cada miniatura
+            for _, size, path in sorted(self._scan()):
+                if self.total_bytes <= self.max_bytes * 0.9:
+                    break
+                try:
+                    os.remove(path)
+                    self.total_bytes -= size
+                except OSError:
+                    pass
+
+class ThumbnailService:
+    """Cola de prioridad de miniaturas atendida por un pool de procesos.
+
+    request() puede llamarse desde el hilo de la GUI sin bloquear: la consulta
+    a la caché en disco (stat, utime) se hace en el hilo despachador. Cuando
+    una miniatura está lista se llama on_ready(ruta, archivo_miniatura), o
+    on_ready(ruta, None) si no se pudo generar.
+    """
+
+    def __init__(self, cache, thumb_size, on_ready, workers=2):
+        self.cache = cache
+        self.thumb_size = thumb_size
+        self.on_ready = on_ready
+        self.workers = workers
+        self.heap = []
+        self.seq = 0
+        self.state = {}       # ruta -> mejor prioridad en cola, o 'busy' mientras se genera
+        self.generation = 0   # Se incrementa al cancelar; descarta trabajo viejo
+        self.in_flight = 0
+        self.lock = threading.Condition()
+        self.pool = None
+        self.thread = None
+
+    def start(self):
+        """Crea el pool de procesos e inicia el despachador.
+
+        Conviene llamarlo al arrancar, antes de crear otros hilos: el pool usa
+        fork y los procesos se crean en este momento.
+        """
+        if self.thread is not None:
+            return
+        os.makedirs(self.cache.cache_dir, exist_ok=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('fork'))
+        self.pool.submit(os.getpid).result()
+        self.thread = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self.thread.start()
+
+    def request(self, kind, path, priority=PRIORITY_VISIBLE):
+        """Solicita la miniatura de un archivo; las solicitudes repetidas solo suben la prioridad."""
+        with self.lock:
+            current = self.state.get(path)
+            if current == 'busy' or (current is not None and current <= priority):
+                return
+            self.state[path] = priority
+            self.seq += 1
+            heapq.heappush(self.heap, (priority, self.seq, kind, path, self.generation))
+            self.lock.notify()
+
+    def new_view(self):
+        """Descarta las solicitudes en cola de la vista anterior (p. ej. al desplazar la cuadrícula).
+
+        Las miniaturas que ya se están generando terminan y se entregan; el
+        que llama vuelve a pedir las celdas de la vista nueva, que así no
+        esperan detrás de las que salieron de la pantalla.
+        """
+        with self.lock:
+            self.heap.clear()
+            self.state = {path: value for path, value in self.state.items() if value == 'busy'}
+
+    def cancel_pending(self):
+        """Descarta todas las solicitudes pendientes (p. ej. al retirar la memoria USB)."""
+        with self.lock:
+            self.generation += 1
+        self.new_view()
+
+    def _dispatch_loop(self):
+        while True:
+            with self.lock:
+                while not self.heap or self.in_flight >= self.workers:
+                    self.lock.wait()
+                priority, _, kind, path, generation = heapq.heappop(self.heap)
+                # Entrada vieja: ya se atendió con mejor prioridad o se canceló
+                if generation != self.generation or self.state.get(path) != priority:
+                    continue
+                self.state[path] = 'busy'
+                self.in_flight += 1
+
+            try:
+                st = os.stat(path)
+                thumb_path = self.cache.key_path(path, st.st_size, int(st.st_mtime), self.thumb_size)
+            except OSError:
+                self._finish(path, None, generation)
+                continue
+            if self.cache.lookup(thumb_path):
+                self._finish(path, thumb_path, generation)
+                continue
+            future = self.pool.submit(generate_thumbnail, kind, path, thumb_path, self.thumb_size)
+            future.add_done_callback(lambda f, path=path, thumb_path=thumb_path, generation=generation:
+                                     self._generated(f, path, thumb_path, generation))
+
+    def _generated(self, future, path, thumb_path, generation):
+        ok = not future.cancelled() and future.exception() is None and future.result()
+        if ok:
+            self.cache.added(thumb_path)
+        self._finish(path, thumb_path if ok else None, generation)
+
+    def _finish(self, path, thumb_path, generation):
+        with self.lock:
+            self.in_flight -= 1
+            cancelled = generation != self.generation
+            if self.state.get(path) == 'busy':
+                del self.state[path]
+            self.lock.notify()
+        if not cancelled:
+            self.on_ready(path, thumb_path)
+
+    def stop(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
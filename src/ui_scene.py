@@ -0,0 +1,544 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Capa de escenas (modo retenido) para la GUI del Centro Multimedia
+# License: MIT
+#--------------------------------------------------
+
+import pygame
+import text_cache
+
+# Rectángulos de pantalla modificados desde la última actualización del display
+dirty_rects = []
+# Escena mostrada actualmente; al cambiar de escena se redibuja la pantalla completa
+active_scene = None
+
+def take_dirty_rects():
+    """Regresa y limpia la lista de rectángulos pendientes de enviar al display."""
+    global dirty_rects
+    rects = dirty_rects
+    dirty_rects = []
+    return rects
+
+def invalidate_all():
+    """Fuerza un redibujado completo en el siguiente cuadro (p. ej. tras cerrar VLC o Chromium)."""
+    global active_scene
+    active_scene = None
+
+# --- Widgets ---
+class Widget:
+    """Elemento de la escena con un rectángulo fijo que se redibuja solo cuando cambia."""
+
+    def __init__(self, rect):
+        self.rect = pygame.Rect(rect)
+        self.visible = True
+        self.dirty = True
+
+    def invalidate(self):
+        self.dirty = True
+
+    def set_visible(self, visible):
+        """Muestra u oculta el widget; el área que ocupaba se limpia en el siguiente cuadro."""
+        if visible != self.visible:
+            self.visible = visible
+            self.dirty = True
+
+    def update(self, mouse_pos, pressed):
+        """Actualiza el estado del widget. Regresa True si fue activado."""
+        return False
+
+    def handle_event(self, event):
+        """Procesa un evento de Pygame (teclado, rueda del ratón)."""
+        pass
+
+    def draw(self, surface):
+        pass
+
+class Label(Widget):
+    """Texto cuyo contenido puede cambiar (contadores, mensajes de estado)."""
+
+    def __init__(self, text, font, color, x, y, align_center=True):
+        self.font = font
+        self.color = color
+        self.anchor = (x, y)
+        self.align_center = align_center
+        self.text = None
+        self.surface = None
+        super().__init__((x, y, 0, 0))
+        self.set_text(text)
+
+    def set_text(self, text):
+        """Cambia el texto; solo marca el widget como sucio si el texto es distinto."""
+        if text == self.text:
+            return
+        self.text = text
+        self.surface = text_cache.render_text(text, self.font, self.color)
+        new_rect = self.surface.get_rect()
+        if self.align_center:
+            new_rect.center = self.anchor
+        else:
+            new_rect.topleft = self.anchor
+        # El área anterior también debe limpiarse
+        self.old_rect = self.rect.copy()
+        self.rect = new_rect
+        self.dirty = True
+
+    def draw(self, surface):
+        surface.blit(self.surface, self.rect)
+
+class Button(Widget):
+    """Botón con icono opcional o etiqueta de texto; se redibuja al cambiar el estado hover."""
+
+    def __init__(self, rect, base_color, hover_color, text="", font=None, icon=None,
+                 text_color=(255, 255, 255), border_radius=10):
+        super().__init__(rect)
+        self.base_color = base_color
+        self.hover_color = hover_color
+        self.text = text
+        self.font = font
+        self.icon = icon
+        self.text_color = text_color
+        self.border_radius = border_radius
+        self.hovered = False
+        self.label_surface = None
+        if text and font and icon is None:
+            self.label_surface = text_cache.render_text(text, font, text_color)
+
+    def set_text(self, text):
+        """Cambia la etiqueta del botón."""
+        if text != self.text and self.font and self.icon is None:
+            self.text = text
+            self.label_surface = text_cache.render_text(text, self.font, self.text_color)
+            self.dirty = True
+
+    def update(self, mouse_pos, pressed):
+        hovered = self.rect.collidepoint(mouse_pos)
+        if hovered != self.hovered:
+            self.hovered = hovered
+            self.dirty = True
+        return hovered and pressed
+
+    def draw(self, surface):
+        color = self.hover_color if self.hovered else self.base_color
+        pygame.draw.rect(surface, color, self.rect, border_radius=self.border_radius)
+        if self.icon is not None:
+            surface.blit(self.icon, self.icon.get_rect(center=self.rect.center))
+        elif self.label_surface is not None:
+            surface.blit(self.label_surface, self.label_surface.get_rect(center=self.rect.center))
+
+class TextField(Widget):
+    """Campo de entrada de texto con borde que indica si está activo."""
+
+    def __init__(self, rect, prefix, font, text_color, fill_color, border_color, active_border_color, mask=False):
+        super().__init__(rect)
+        self.prefix = prefix
+        self.font = font
+        self.text_color = text_color
+        self.fill_color = fill_color
+        self.border_color = border_color
+        self.active_border_color = active_border_color
+        self.mask = mask
+        self.value = ""
+        self.active = False
+        self.label_surface = None
+        self._render_label()
+
+    def _render_label(self):
+        shown = "*" * len(self.value) if self.mask else self.value
+        # Cambia con cada tecla: usar la partición volátil de la caché
+        self.label_surface = text_cache.render_text(self.prefix + shown, self.font, self.text_color, volatile=True)
+
+    def set_value(self, value):
+        if value != self.value:
+            self.value = value
+            self._render_label()
+            self.dirty = True
+
+    def set_active(self, active):
+        if active != self.active:
+            self.active = active
+            self.dirty = True
+
+    def draw(self, surface):
+        pygame.draw.rect(surface, self.fill_color, self.rect, border_radius=5)
+        border = self.active_border_color if self.active else self.border_color
+        pygame.draw.rect(surface, border, self.rect, 3, border_radius=5)
+        surface.blit(self.label_surface, self.label_surface.get_rect(center=self.rect.center))
+
+class VirtualList(Widget):
+    """Lista desplazable que solo dibuja los renglones visibles.
+
+    No guarda un widget por elemento: recibe el número de elementos y una
+    función que regresa el texto de un renglón, así el costo de cada cuadro
+    depende de los renglones visibles y no del tamaño de la lista. Se
+    desplaza con la rueda del ratón, flechas, RePág/AvPág e Inicio/Fin. El
+    renglón bajo el ratón se resalta con hover_color (por omisión, el punto
+    medio entre row_color y selected_color).
+    """
+
+    def __init__(self, rect, row_height, font, row_color, selected_color, text_color, row_padding=10,
+                 hover_color=None):
+        super().__init__(rect)
+        self.row_height = row_height
+        self.row_padding = row_padding
+        self.font = font
+        self.row_color = row_color
+        self.selected_color = selected_color
+        if hover_color is None:
+            hover_color = tuple((a + b) // 2 for a, b in zip(row_color, selected_color))
+        self.hover_color = hover_color
+        self.text_color = text_color
+        self.count = 0
+        self.label_func = None
+        self.top = 0        # Primer renglón visible
+        self.selected = 0   # Renglón resaltado (teclado/control remoto)
+        self.hover_row = None  # Renglón bajo el ratón
+        self.activated = None
+        self.visible_rows = max(1, self.rect.height // row_height)
+
+    def set_items(self, count, label_func, reset=False):
+        """Actualiza los elementos; solo se redibuja si cambia algo visible."""
+        if reset:
+            self.top = 0
+            self.selected = 0
+            self.dirty = True
+        if count != self.count:
+            # Nuevos elementos al final solo cambian la pantalla si caben en ella
+            if min(count, self.top + self.visible_rows) != min(self.count, self.top + self.visible_rows):
+                self.dirty = True
+            self.count = count
+        self.label_func = label_func
+        self._clamp()
+
+    def _clamp(self):
+        self.selected = max(0, min(self.selected, self.count - 1))
+        max_top = max(0, self.count - self.visible_rows)
+        self.top = max(0, min(self.top, max_top))
+
+    def scroll(self, rows):
+        old_top = self.top
+        self.top += rows
+        self._clamp()
+        if self.top != old_top:
+            self.dirty = True
+
+    def select(self, row):
+        """Resalta un renglón y desplaza la lista para que quede visible."""
+        row = max(0, min(row, self.count - 1))
+        if row == self.selected:
+            return
+        self.selected = row
+        if row < self.top:
+            self.top = row
+        elif row >= self.top + self.visible_rows:
+            self.top = row - self.visible_rows + 1
+        self._clamp()
+        self.dirty = True
+
+    def take_activated(self):
+        """Regresa el renglón activado (Enter o clic) y lo limpia."""
+        row = self.activated
+        self.activated = None
+        return row
+
+    def handle_event(self, event):
+        if self.count == 0:
+            return
+        if event.type == pygame.MOUSEWHEEL:
+            self.scroll(-event.y * 3)
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_DOWN:
+                self.select(self.selected + 1)
+            elif event.key == pygame.K_UP:
+                self.select(self.selected - 1)
+            elif event.key == pygame.K_PAGEDOWN:
+                self.select(self.selected + self.visible_rows)
+            elif event.key == pygame.K_PAGEUP:
+                self.select(self.selected - self.visible_rows)
+            elif event.key == pygame.K_HOME:
+                self.select(0)
+            elif event.key == pygame.K_END:
+                self.select(self.count - 1)
+            elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+                self.activated = self.selected
+
+    def row_at(self, pos):
+        if not self.rect.collidepoint(pos):
+            return None
+        row = self.top + (pos[1] - self.rect.y) // self.row_height
+        if row >= self.count or (pos[1] - self.rect.y) % self.row_height >= self.row_height - self.row_padding:
+            return None
+        return row
+
+    def update(self, mouse_pos, pressed):
+        row = self.row_at(mouse_pos)
+        if row != self.hover_row:
+            self.hover_row = row
+            self.dirty = True
+        if row is not None and pressed:
+            self.activated = row
+            return True
+        return False
+
+    def draw(self, surface):
+        last = min(self.count, self.top + self.visible_rows)
+        for row in range(self.top, last):
+            y = self.rect.y + (row - self.top) * self.row_height
+            row_rect = pygame.Rect(self.rect.x, y, self.rect.width - 16, self.row_height - self.row_padding)
+            if row == self.selected:
+                color = self.selected_color
+            elif row == self.hover_row:
+                color = self.hover_color
+            else:
+                color = self.row_color
+            pygame.draw.rect(surface, color, row_rect, border_radius=5)
+            label = text_cache.render_text(self.label_func(row), self.font, self.text_color)
+            if label.get_width() <= row_rect.width - 20:
+                surface.blit(label, label.get_rect(center=row_rect.center))
+            else:
+                # Recortar nombres largos al ancho del renglón
+                surface.blit(label, (row_rect.x + 10, row_rect.centery - label.get_height() // 2),
+                             (0, 0, row_rect.width - 20, label.get_height()))
+
+        # Barra de desplazamiento proporcional
+        if self.count > self.visible_rows:
+            bar_height = max(20, self.rect.height * self.visible_rows // self.count)
+            bar_y = self.rect.y + (self.rect.height - bar_height) * self.top // (self.count - self.visible_rows)
+            pygame.draw.rect(surface, self.row_color, (self.rect.right - 8, bar_y, 8, bar_height), border_radius=4)
+
+class ThumbnailGrid(Widget):
+    """Cuadrícula desplazable de miniaturas que solo dibuja las celdas visibles.
+
+    thumb_func(i) regresa la superficie de la miniatura del elemento i, o None
+    mientras se genera (se dibuja un recuadro vacío). Un evento del tipo
+    refresh_event_type (miniatura lista) marca la cuadrícula para redibujarse.
+    """
+
+    def __init__(self, rect, cell_size, font, cell_color, selected_color, text_color, refresh_event_type=None):
+        super().__init__(rect)
+        self.cell_size = cell_size
+        self.font = font
+        self.cell_color = cell_color
+        self.selected_color = selected_color
+        self.text_color = text_color
+        self.refresh_event_type = refresh_event_type
+        self.columns = max(1, self.rect.width // cell_size[0])
+        self.visible_rows = max(1, self.rect.height // cell_size[1])
+        self.count = 0
+        self.thumb_func = None
+        self.label_func = None
+        self.top_row = 0
+        self.selected = 0
+        self.activated = None
+
+    def set_items(self, count, thumb_func, label_func, reset=False):
+        if reset:
+            self.top_row = 0
+            self.selected = 0
+            self.dirty = True
+        if count != self.count:
+            first, last = self.visible_range()
+            if min(count, last) != min(self.count, last):
+                self.dirty = True
+            self.count = count
+        self.thumb_func = thumb_func
+        self.label_func = label_func
+        self._clamp()
+
+    def visible_range(self):
+        """Regresa (primero, último + 1) de los elementos visibles."""
+        first = self.top_row * self.columns
+        return first, min(self.count, first + self.columns * self.visible_rows)
+
+    def _clamp(self):
+        self.selected = max(0, min(self.selected, self.count - 1))
+        total_rows = (self.count + self.columns - 1) // self.columns
+        self.top_row = max(0, min(self.top_row, total_rows - self.visible_rows))
+
+    def scroll(self, rows):
+        old_top = self.top_row
+        self.top_row += rows
+        self._clamp()
+        if self.top_row != old_top:
+            self.dirty = True
+
+    def select(self, index):
+        index = max(0, min(index, self.count - 1))
+        if index == self.selected:
+            return
+        self.selected = index
+        row = index // self.columns
+        if row < self.top_row:
+            self.top_row = row
+        elif row >= self.top_row + self.visible_rows:
+            self.top_row = row - self.visible_rows + 1
+        self._clamp()
+        self.dirty = True
+
+    def take_activated(self):
+        index = self.activated
+        self.activated = None
+        return index
+
+    def handle_event(self, event):
+        if self.refresh_event_type is not None and event.type == self.refresh_event_type:
+            self.dirty = True
+            return
+        if self.count == 0:
+            return
+        if event.type == pygame.MOUSEWHEEL:
+            self.scroll(-event.y)
+        elif event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_RIGHT:
+                self.select(self.selected + 1)
+            elif event.key == pygame.K_LEFT:
+                self.select(self.selected - 1)
+            elif event.key == pygame.K_DOWN:
+                self.select(self.selected + self.columns)
+            elif event.key == pygame.K_UP:
+                self.select(self.selected - self.columns)
+            elif event.key == pygame.K_PAGEDOWN:
+                self.select(self.selected + self.columns * self.visible_rows)
+            elif event.key == pygame.K_PAGEUP:
+                self.select(self.selected - self.columns * self.visible_rows)
+            elif event.key == pygame.K_HOME:
+                self.select(0)
+            elif event.key == pygame.K_END:
+                self.select(self.count - 1)
+            elif event.key in (pygame.K_RETURN, pygame.K_KP_ENTER):
+                self.activated = self.selected
+
+    def index_at(self, pos):
+        if not self.rect.collidepoint(pos):
+            return None
+        column = (pos[0] - self.rect.x) // self.cell_size[0]
+        row = (pos[1] - self.rect.y) // self.cell_size[1]
+        if column >= self.columns or row >= self.visible_rows:
+            return None
+        index = (self.top_row + row) * self.columns + column
+        return index if index < self.count else None
+
+    def update(self, mouse_pos, pressed):
+        index = self.index_at(mouse_pos)
+        if index is not None and pressed:
+            self.activated = index
+            return True
+        return False
+
+    def draw(self, surface):
+        first, last = self.visible_range()
+        cell_w, cell_h = self.cell_size
+        label_height = self.font.get_linesize()
+        for index in range(first, last):
+            offset = index - first
+            x = self.rect.x + (offset % self.columns) * cell_w
+            y = self.rect.y + (offset // self.columns) * cell_h
+            frame = pygame.Rect(x + 5, y + 5, cell_w - 10, cell_h - 15 - label_height)
+            color = self.selected_color if index == self.selected else self.cell_color
+            pygame.draw.rect(surface, color, frame.inflate(6, 6), border_radius=5)
+            thumb = self.thumb_func(index)
+            if thumb is not None:
+                # Recorte por si la miniatura es más grande que la celda
+                surface.blit(thumb, thumb.get_rect(center=frame.center), (0, 0, frame.width, frame.height))
+            label = text_cache.render_text(self.label_func(index), self.font, self.text_color)
+            surface.blit(label, (x + 5, frame.bottom + 5), (0, 0, cell_w - 10, label_height))
+
+class ImageView(Widget):
+    """Muestra una superficie centrada en su rectángulo (p. ej. la diapositiva actual)."""
+
+    def __init__(self, rect, fill_color):
+        super().__init__(rect)
+        self.fill_color = fill_color
+        self.image = None
+
+    def set_image(self, image):
+        if image is not self.image:
+            self.image = image
+            self.dirty = True
+
+    def update(self, mouse_pos, pressed):
+        return pressed and self.rect.collidepoint(mouse_pos)
+
+    def draw(self, surface):
+        surface.fill(self.fill_color, self.rect)
+        if self.image is not None:
+            surface.blit(self.image, self.image.get_rect(center=self.rect.center))
+
+# --- Escena ---
+class Scene:
+    """Conjunto de widgets de una pantalla con un fondo precalculado.
+
+    El fondo (color y textos estáticos) se dibuja una sola vez en una
+    superficie en caché. En cada cuadro solo se redibujan los widgets que
+    cambiaron y sus rectángulos se agregan a dirty_rects.
+    """
+
+    def __init__(self, size, background_color):
+        self.size = size
+        self.background = pygame.Surface(size).convert()
+        self.background.fill(background_color)
+        self.widgets = []
+
+    def add_static_text(self, text, font, color, x, y, align_center=True):
+        """Dibuja texto fijo directamente en el fondo en caché."""
+        textobj = text_cache.render_text(text, font, color)
+        textrect = textobj.get_rect()
+        if align_center:
+            textrect.center = (x, y)
+        else:
+            textrect.topleft = (x, y)
+        self.background.blit(textobj, textrect)
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        return widget
+
+    def update(self, mouse_pos, pressed):
+        """Actualiza los widgets y regresa el que fue activado.
+
+        Se recorren del último al primero, de modo que el widget dibujado
+        encima tiene prioridad cuando dos se superponen.
+        """
+        for widget in reversed(self.widgets):
+            if widget.visible and widget.update(mouse_pos, pressed):
+                return widget
+        return None
+
+    def handle_event(self, event):
+        """Reenvía un evento de Pygame a los widgets visibles."""
+        for widget in self.widgets:
+            if widget.visible:
+                widget.handle_event(event)
+
+    def render(self, surface):
+        """Dibuja la escena: completa si acaba de mostrarse, o solo las áreas sucias."""
+        global active_scene
+        if active_scene is not self:
+            active_scene = self
+            surface.blit(self.background, (0, 0))
+            for widget in self.widgets:
+                widget.dirty = False
+                if widget.visible:
+                    widget.draw(surface)
+            dirty_rects.append(surface.get_rect())
+            return
+
+        areas = []
+        for widget in self.widgets:
+            if widget.dirty:
+                widget.dirty = False
+                area = widget.rect.copy()
+                old_rect = getattr(widget, 'old_rect', None)
+                if old_rect is not None:
+                    area.union_ip(old_rect)
+                    widget.old_rect = None
+                areas.append(area)
+
+        for area in areas:
+            # Restaurar el fondo y redibujar todo widget que toque el área, en orden
+            surface.blit(self.background, area, area)
+            for widget in self.widgets:
+                if widget.visible and widget.rect.colliderect(area):
+                    widget.draw(surface)
+            dirty_rects.append(area)
@@ -0,0 +1,126 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Bus de eventos USB con antirrebote y cancelación de escaneos
+# License: MIT
+#--------------------------------------------------
+
+import queue
+import threading
+import time
+
+# Tiempo que se espera tras el último evento de un dispositivo antes de actuar
+DEFAULT_DEBOUNCE_S = 0.5
+
+class ScanToken:
+    """Identifica un escaneo en curso y permite cancelarlo."""
+
+    def __init__(self, device_key):
+        self.device_key = device_key
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+class UsbEventBus:
+    """Cola segura entre hilos para los eventos de USB.
+
+    Los eventos crudos de udev (add/remove) se agrupan por dispositivo: solo
+    se actúa sobre la última acción de cada dispositivo cuando pasan
+    `debounce` segundos sin eventos nuevos. Cada 'add' lanza scan_func en su
+    propio hilo; un 'remove' cancela el escaneo en curso de ese dispositivo,
+    de modo que sus resultados ya no llegan a la GUI.
+    """
+
+    def __init__(self, scan_func, wake=None, debounce=DEFAULT_DEBOUNCE_S):
+        self.scan_func = scan_func
+        self.wake = wake
+        self.debounce = debounce
+        self.ui_queue = queue.Queue()
+        self.lock = threading.Condition()
+        self.pending = {}  # clave del dispositivo -> (acción, dispositivo, momento límite)
+        self.scans = {}    # clave del dispositivo -> ScanToken del escaneo en curso
+        self.dispatcher = None
+
+    def start(self):
+        """Inicia el hilo que despacha los eventos agrupados."""
+        if self.dispatcher is None:
+            self.dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+            self.dispatcher.start()
+
+    def device_event(self, action, device):
+        """Registra un evento crudo de udev; reemplaza al anterior del mismo dispositivo."""
+        with self.lock:
+            self.pending[device.device_node] = (action, device, time.monotonic() + self.debounce)
+            self.lock.notify()
+
+    def post(self, event, token=None):
+        """Envía un evento a la GUI. Se descarta si el escaneo que lo generó fue cancelado."""
+        with self.lock:
+            if token is not None and token.is_cancelled():
+                return False
+            self.ui_queue.put(event)
+        if self.wake:
+            self.wake()
+        return True
+
+    def get_events(self):
+        """Regresa todos los eventos pendientes para la GUI sin bloquear."""
+        events = []
+        while True:
+            try:
+                events.append(self.ui_queue.get_nowait())
+            except queue.Empty:
+                return events
+
+    def qsize(self):
+        return self.ui_queue.qsize()
+
+    def _cancel_scan(self, device_key):
+        token = self.scans.pop(device_key, None)
+        if token is not None:
+            token.cancel()
+            print(f"Escaneo cancelado para {device_key}")
+
+    def _run_scan(self, device, token):
+        try:
+            self.scan_func(device, token)
+        finally:
+            with self.lock:
+                if self.scans.get(token.device_key) is token:
+                    del self.scans[token.device_key]
+
+    def _dispatch_loop(self):
+        while True:
+            with self.lock:
+                while True:
+                    now = time.monotonic()
+                    due = [key for key, (_, _, deadline) in self.pending.items() if deadline <= now]
+                    if due:
+                        break
+                    timeout = None
+                    if self.pending:
+                        timeout = min(deadline for _, _, deadline in self.pending.values()) - now
+                    self.lock.wait(timeout)
+
+                ready = []
+                for key in due:
+                    action, device, _ = self.pending.pop(key)
+                    # Cualquier acción nueva invalida el escaneo anterior del dispositivo;
+                    # se cancela dentro del candado para que no se cuele ningún lote más
+                    self._cancel_scan(key)
+                    if action == 'add':
+                        token = ScanToken(key)
+                        self.scans[key] = token
+                        ready.append((device, token))
+                    elif action == 'remove':
+                        self.ui_queue.put({'type': 'usb_removed', 'device': key})
+
+            for device, token in ready:
+                threading.Thread(target=self._run_scan, args=(device, token), daemon=True).start()
+            if due and self.wake:
+                self.wake()
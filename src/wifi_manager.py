@@ -0,0 +1,261 @@
+#--------------------------------------------------
+# Facultad de Ingenieria, UNAM
+# Materia: Fundamentos de Sistemas Embebidos
+# Autor: Jesús Vázquez Romero
+# Programa: Conexión Wi-Fi y búsqueda de redes en segundo plano (nmcli)
+# License: MIT
+#--------------------------------------------------
+
+import subprocess
+import threading
+import time
+
+CONNECT_TIMEOUT_S = 30
+NM_READY_TIMEOUT_S = 5
+SCAN_INTERVAL_S = 30
+SCAN_TIMEOUT_S = 15
+POLL_S = 0.2
+
+# Estados de un trabajo de conexión
+JOB_CONNECTING = 'connecting'
+JOB_CONNECTED = 'connected'
+JOB_FAILED = 'failed'
+JOB_CANCELLED = 'cancelled'
+
+def split_terse(line):
+    """Separa una línea de `nmcli -t`, donde ':' dentro de un campo viene como '\\:'."""
+    fields = []
+    current = []
+    escaped = False
+    for char in line:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == '\\':
+            escaped = True
+        elif char == ':':
+            fields.append(''.join(current))
+            current = []
+        else:
+            current.append(char)
+    fields.append(''.join(current))
+    return fields
+
+def parse_scan_output(text):
+    """Convierte la salida de `nmcli -t -f SSID,SIGNAL,SECURITY device wifi list` en una lista.
+
+    Cada SSID aparece una sola vez (el punto de acceso con mejor señal) y la
+    lista queda ordenada de mayor a menor señal. Las redes ocultas se omiten.
+    """
+    networks = {}
+    for line in text.splitlines():
+        fields = split_terse(line)
+        if len(fields) < 3 or not fields[0]:
+            continue
+        try:
+            signal = int(fields[1])
+        except ValueError:
+            signal = 0
+        ssid = fields[0]
+        if ssid not in networks or signal > networks[ssid]['signal']:
+            networks[ssid] = {'ssid': ssid, 'signal': signal, 'security': fields[2]}
+    return sorted(networks.values(), key=lambda network: -network['signal'])
+
+class WifiJob:
+    """Intento de conexión a una red; su estado lo actualiza el hilo de WifiManager."""
+
+    def __init__(self, ssid):
+        self.ssid = ssid
+        self.state = JOB_CONNECTING
+        self.message = f"Conectando a {ssid}..."
+        self.started = time.monotonic()
+        self.cancel_event = threading.Event()
+        self.process = None
+
+    def is_done(self):
+        return self.state != JOB_CONNECTING
+
+class WifiManager:
+    """Ejecuta las operaciones de nmcli en hilos para que la GUI nunca se bloquee.
+
+    on_update(tipo) se llama desde los hilos cuando hay algo nuevo: 'scan'
+    (lista de redes actualizada) o 'job' (cambió el trabajo de conexión).
+    """
+
+    def __init__(self, on_update=None, connect_timeout=CONNECT_TIMEOUT_S, scan_interval=SCAN_INTERVAL_S):
+        self.on_update = on_update
+        self.connect_timeout = connect_timeout
+        self.scan_interval = scan_interval
+        self.lock = threading.Condition()
+        self.job = None
+        self.networks = []
+        self.scanned_at = None
+        self.scan_error = None
+        self.scanning = False       # True mientras la pantalla de Wi-Fi está visible
+        self.scan_requested = False
+        self.scan_running = False
+        self.scan_thread = None
+
+    def _notify(self, kind):
+        if self.on_update:
+            self.on_update(kind)
+
+    # --- Búsqueda de redes ---
+    def set_scanning(self, active):
+        """Activa o pausa la búsqueda periódica; la lista en caché se conserva."""
+        with self.lock:
+            if active == self.scanning:
+                return
+            self.scanning = active
+            if active and self.scan_thread is None:
+                self.scan_thread = threading.Thread(target=self._scan_loop, daemon=True)
+                self.scan_thread.start()
+            self.lock.notify()
+
+    def request_scan(self):
+        """Pide una búsqueda inmediata sin esperar el intervalo."""
+        with self.lock:
+            self.scan_requested = True
+            self.lock.notify()
+
+    def _scan_due(self):
+        if not self.scanning:
+            return None
+        if self.scan_requested or self.scanned_at is None:
+            return 0
+        return max(0.0, self.scanned_at + self.scan_interval - time.monotonic())
+
+    def _scan_loop(self):
+        while True:
+            with self.lock:
+                while True:
+                    due = self._scan_due()
+                    if due == 0:
+                        break
+                    self.lock.wait(due)
+                self.scan_requested = False
+                self.scan_running = True
+            networks, error = self._run_scan()
+            with self.lock:
+                self.scan_running = False
+                self.scanned_at = time.monotonic()
+                self.scan_error = error
+                if error is None:
+                    self.networks = networks
+            self._notify('scan')
+
+    def _run_scan(self):
+        try:
+            result = subprocess.run(['nmcli', '-t', '-f', 'SSID,SIGNAL,SECURITY', 'device', 'wifi', 'list', '--rescan', 'auto'],
+                                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=SCAN_TIMEOUT_S)
+        except FileNotFoundError:
+            return None, "nmcli no encontrado"
+        except subprocess.TimeoutExpired:
+            return None, "La búsqueda de redes tardó demasiado"
+        if result.returncode != 0:
+            return None, result.stderr.strip() or "No se pudo buscar redes"
+        return parse_scan_output(result.stdout), None
+
+    # --- Conexión ---
+    def connect(self, ssid, password):
+        """Inicia la conexión en segundo plano y regresa el WifiJob; cancela el anterior."""
+        self.cancel()
+        job = WifiJob(ssid)
+        with self.lock:
+            self.job = job
+        threading.Thread(target=self._connect_job, args=(job, password), daemon=True).start()
+        self._notify('job')
+        return job
+
+    def cancel(self):
+        """Cancela el intento de conexión en curso, si lo hay."""
+        with self.lock:
+            job = self.job
+        if job is None or job.is_done():
+            return
+        job.cancel_event.set()
+        process = job.process
+        if process is not None and process.poll() is None:
+            try:
+                process.terminate()
+            except OSError:
+                pass # El hilo del trabajo lo detiene al ver la cancelación
+
+    def _finish(self, job, state, message):
+        with self.lock:
+            if job.is_done():
+                return
+            job.state = state
+            job.message = message
+        print(message)
+        self._notify('job')
+
+    def _run_step(self, job, command, deadline):
+        """Ejecuta un comando del trabajo revisando la cancelación y el tiempo límite.
+
+        Regresa (código de salida, salida de error), o None si se canceló o
+        se agotó el tiempo (en ese caso el trabajo ya quedó terminado).
+        """
+        try:
+            job.process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        except FileNotFoundError:
+            self._finish(job, JOB_FAILED, "Error: 'nmcli' o 'systemctl' no encontrado. Asegúrese de que NetworkManager esté instalado.")
+            return None
+        process = job.process
+        while True:
+            try:
+                _, stderr = process.communicate(timeout=POLL_S)
+                return process.returncode, stderr.strip()
+            except subprocess.TimeoutExpired:
+                pass
+            if job.cancel_event.is_set() or time.monotonic() > deadline:
+                try:
+                    process.kill()
+                    process.wait(timeout=2)
+                except (OSError, subprocess.TimeoutExpired):
+                    pass
+                if job.cancel_event.is_set():
+                    self._finish(job, JOB_CANCELLED, "Conexión Wi-Fi cancelada.")
+                else:
+                    self._finish(job, JOB_FAILED, f"Tiempo agotado al conectar a '{job.ssid}'.")
+                return None
+
+    def _wait_network_manager(self, job, deadline):
+        """Espera a que NetworkManager responda, en lugar de dormir un tiempo fijo."""
+        ready_deadline = min(deadline, time.monotonic() + NM_READY_TIMEOUT_S)
+        while time.monotonic() < ready_deadline and not job.cancel_event.is_set():
+            try:
+                result = subprocess.run(['nmcli', '-t', '-f', 'RUNNING', 'general'],
+                                        stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True, timeout=2)
+                if result.stdout.strip() == 'running':
+                    return
+            except (OSError, subprocess.TimeoutExpired):
+                return
+            job.cancel_event.wait(POLL_S)
+
+    def _connect_job(self, job, password):
+        deadline = job.started + self.connect_timeout
+        # Asegurar que NetworkManager esté activo
+        result = self._run_step(job, ['sudo', 'systemctl', 'start', 'NetworkManager'], deadline)
+        if result is None:
+            return
+        if result[0] != 0:
+            self._finish(job, JOB_FAILED, f"Error al iniciar NetworkManager: {result[1]}")
+            return
+        self._wait_network_manager(job, deadline)
+        if job.cancel_event.is_set():
+            self._finish(job, JOB_CANCELLED, "Conexión Wi-Fi cancelada.")
+            return
+
+        # nmcli también respeta su propio límite (--wait) por si este hilo no lo alcanza
+        remaining = max(1, int(deadline - time.monotonic()))
+        command = ['sudo', 'nmcli', '--wait', str(remaining), 'device', 'wifi', 'connect', job.ssid]
+        if password:
+            command += ['password', password]
+        result = self._run_step(job, command, deadline)
+        if result is None:
+            return
+        if result[0] == 0:
+            self._finish(job, JOB_CONNECTED, f"Conectado exitosamente a la red Wi-Fi '{job.ssid}'.")
+        else:
+            self._finish(job, JOB_FAILED, f"Error al conectar: {result[1]}")